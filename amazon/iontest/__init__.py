@@ -23,5 +23,11 @@ __version__ = '0.1.0'
 __all__ = [
     'ion_test_driver_util',
     'ion_test_driver_config',
+    'ion_test_driver_benchmark',
+    'ion_test_driver_compare',
+    'ion_test_driver_diff',
+    'ion_test_driver_python',
+    'ion_test_driver_fuzz',
+    'ion_test_driver_scaling',
     'ion_test_driver'
 ]
@@ -18,12 +18,74 @@ Usage:
     ion_test_driver.py [--implementation <description>]... [--ion-tests <description>] [--test <type>]...
                        [--local-only] [--cmake <path>] [--git <path>] [--maven <path>] [--java <path>] [--npm <path>]
                        [--node <path>] [--output-dir <dir>] [--results-file <file>] [--replace <description>]
+                       [--timeout <seconds>] [--max-stderr <bytes>] [--deadline <seconds>]
+                       [--perf [--warmups <count>] [--repetitions <count>]] [--isolate [--memory-limit <bytes>]]
+                       [--profile] [--trace <file>]
+                       [--metrics-file <file>] [--progress-file <file>] [--jobs <count>] [--shard <index/count>]
+                       [--history <file>] [--time-budget <seconds>] [--memory-budget <bytes>]
+                       [--prefilter <policy>] [--max-failures <count>] [--event-format <format>] [--plan]
+                       [--baseline <results_file>] [<test_file>]...
+    ion_test_driver.py --benchmark [--implementation <description>]... [--local-only] [--replace <description>]
+                       [--cmake <path>] [--git <path>] [--maven <path>] [--java <path>] [--npm <path>]
+                       [--node <path>] [--output-dir <dir>] [--results-file <file>] [--seed <seed>]
+                       [--corpus-size <bytes>] [--warmups <count>] [--repetitions <count>] [--timeout <seconds>]
+                       [--max-stderr <bytes>] [--trace <file>] [--isolate [--memory-limit <bytes>]]
+    ion_test_driver.py --fuzz [--implementation <description>]... [--ion-tests <description>] [--test <type>]...
+                       [--local-only] [--replace <description>] [--cmake <path>] [--git <path>] [--maven <path>]
+                       [--java <path>] [--npm <path>] [--node <path>] [--output-dir <dir>] [--results-file <file>]
+                       [--seed <seed>] [--traversals <count>] [--batch-size <count>] [--jobs <count>]
+                       [--fuzz-seeds <file>] [--timeout <seconds>] [--max-stderr <bytes>] [--deadline <seconds>]
+                       [--prefilter <policy>] [--event-format <format>] [--trace <file>] [--memory-budget <bytes>]
                        [<test_file>]...
+    ion_test_driver.py --bisect <first_description> <second_description> <diff_file> [--implementation <description>]...
+                       [--ion-tests <description>] [--local-only] [--replace <description>] [--cmake <path>]
+                       [--git <path>] [--maven <path>] [--java <path>] [--npm <path>] [--node <path>]
+                       [--output-dir <dir>] [--jobs <count>] [--timeout <seconds>] [--max-stderr <bytes>]
+                       [--memory-budget <bytes>]
+    ion_test_driver.py --watch <description> [--implementation <description>]... [--ion-tests <description>]
+                       [--test <type>]... [--local-only] [--replace <description>] [--cmake <path>] [--git <path>]
+                       [--maven <path>] [--java <path>] [--npm <path>] [--node <path>] [--output-dir <dir>]
+                       [--results-file <file>] [--history <file>] [--jobs <count>]
+                       [--timeout <seconds>] [--max-stderr <bytes>] [--max-failures <count>]
+                       [--event-format <format>] [--trace <file>] [--memory-budget <bytes>] [<test_file>]...
+    ion_test_driver.py --driver-benchmark [--output-dir <dir>] [--results-file <file>] [--vector-counts <counts>]
+                       [--stub-counts <counts>] [--stub-latency <seconds>] [--stub-error-rate <rate>]
+                       [--stub-disagreement-rate <rate>] [--seed <seed>] [--jobs <count>]
+    ion_test_driver.py --diff-events <first_stream> <second_stream> [--context <count>]
     ion_test_driver.py --results-diff <first_description> <second_description> <results_file> [--output-dir <dir>]
+                       [--perf-alpha <alpha>] [--perf-threshold <ratio>]
     ion_test_driver.py (--list)
     ion_test_driver.py (-h | --help)
 
 Options:
+    -b, --benchmark                     Generate large text and binary Ion corpora (deep nesting, wide structs, long
+                                        strings, many symbols, decimals and timestamps) from `--seed`, measure each
+                                        implementation's throughput reading them and re-writing them as text and as
+                                        binary, and write the MB/s and events/s, with 95% confidence intervals, to an
+                                        Ion results file. Corpora are cached under the `--output-dir` directory.
+
+    --baseline <results_file>           Reuse a stored run (its results file, with the artifacts that it wrote in the
+                                        same directory) in place of testing the implementations that it includes but
+                                        that aren't selected now, e.g. every implementation but the one changed by a
+                                        pull request (combine with `--local-only`). Only the selected implementations
+                                        are run: they read the files, re-write their own and the stored EventStreams,
+                                        and compare their outputs with the stored outputs. The stored implementations
+                                        keep their stored results, and are included in the results file, which may be
+                                        given to --results-diff. Can't be combined with --perf.
+
+    --batch-size <count>                In --fuzz mode, the number of traversals of a vector that each job runs at a
+                                        time. [default: 50]
+
+    --bisect                            Given the two implementation descriptions (of the form name,location,revision)
+                                        analyzed by --results-diff and its output file, find the first commit between
+                                        the two revisions at which the test files it reports regressed. Each step
+                                        builds one commit (reusing existing builds) and tests only those files, along
+                                        with the first revision and any other implementations selected as usual; the
+                                        results are compared as in --results-diff. Commits that fail to build are
+                                        skipped in favor of their neighbors, as with `git bisect skip`. Builds and
+                                        results are kept under `bisect` in the `--output-dir` directory and reused by
+                                        later bisections. Files reported only for performance changes are not bisected.
+
     --cmake <path>                      Path to the cmake executable.
 
     --git <path>                        Path to the git executable.
@@ -36,62 +98,286 @@ Options:
 
     --java <path>                       Path to the java executable.
 
+    --context <count>                   In --diff-events mode, the number of agreeing events shown around each
+                                        divergent region. [default: 3]
+
+    --corpus-size <bytes>               In --benchmark mode, the approximate size of each generated text corpus file.
+                                        [default: 4194304]
+
+    -d, --deadline <seconds>            Stop the run after the given number of seconds. Any invocation still in flight
+                                        is killed, the test file it belongs to is dropped, and the results gathered so
+                                        far are written as usual.
+
+    --diff-events                       Align the events of two Ion streams or EventStreams, e.g. the artifacts under
+                                        `read/data` or `write/*/data` whose disagreement a ComparisonReport describes,
+                                        and print the regions in which they diverge, with the depth of each event and
+                                        the containers (with their field names and annotations) that enclose each
+                                        region. The streams are read in-process, and aligned using a linear-space
+                                        minimal diff, so that streams of millions of events can be compared. Exits
+                                        with a non-zero status if the streams' events differ.
+
+    --driver-benchmark                  Measure the driver's own overhead and memory, and how they scale, by testing
+                                        synthetic ion-tests trees of each of `--vector-counts` vectors with each of
+                                        `--stub-counts` stub implementations. Stubs are shell scripts that honor the
+                                        `process` and `compare` commands without parsing Ion. Runs offline, and exits
+                                        with a non-zero status if the driver's CPU time grows superlinearly with the
+                                        number of vectors. Trees are cached under the `--output-dir` directory.
+
+    --event-format <format>             Encoding of the EventStreams that the implementations write when reading the
+                                        test files, which are re-read by the write and verify phases. With `binary`,
+                                        each implementation is first asked to write a binary EventStream for a small
+                                        input using `--output-format events-binary`; those that can't write text
+                                        EventStreams instead. Chosen from `text` and `binary`. [default: text]
+
+    -f, --fuzz                          Instead of testing each vector with a full traversal, read the selected good
+                                        vectors with `--traversals` random traversals each (streams of ReadInstructions
+                                        passed to `process --traverse`), generated from `--seed`, and verify that the
+                                        implementations agree on each traversal, whether or not it is valid. Each new
+                                        kind of failure is stored in the `--fuzz-seeds` file and replayed by later runs
+                                        until it passes. The failures and the number of traversals per second are
+                                        written to an Ion results file. Combine with `--prefilter` to compare agreeing
+                                        traversals in-process.
+
+    --fuzz-seeds <file>                 Location of the seeds of the traversals that have failed in --fuzz mode. By
+                                        default, this is `ion-test-driver-fuzz-seeds.ion` under the directory
+                                        specified by `--output-dir`.
+
     -h, --help                          Show this screen.
 
+    --history <file>                    Location of the history of each test file's cost and outcome, which is updated
+                                        by each run that is given it. Files that are new, changed, or failed last time
+                                        are tested first; within those and the rest, the most expensive files go first.
+                                        Files without history are estimated from their size. Without a history, the
+                                        files are tested in the order they are found and their costs aren't recorded.
+
     -i, --implementation <description>  Test an additional implementation specified by a description of the form
                                         name,location,revision. Name must match one of the names returned by `--list`.
                                         Location may be a local path or a URL. Revision is optional, may be either a
                                         branch name or commit hash, and defaults to the repository's default branch.
+                                        ion-python is only tested when selected this way. It runs in-process, using
+                                        the ion-python installed with this tool; its location is not used, its revision
+                                        may only be that version, and its `--perf` measurements omit memory usage.
 
     -I, --ion-tests <description>       Override the default ion-tests location by providing a description of the form
                                         location,revision. Location may be a local path or a URL. Revision is optional,
                                         may be either a branch name or commit hash, and defaults to the repository's
                                         default branch.
 
+    -j, --jobs <count>                  Number of test files to test concurrently. With more than one, the
+                                        implementations' invocations are queued rather than started while the memory
+                                        they would use doesn't fit within `--memory-budget`. Each implementation's
+                                        memory is the largest peak RSS of its invocations so far (until one completes,
+                                        its invocations run alone), unless configured in its build, which may
+                                        also limit the number of its concurrent invocations. [default: 1]
+
+    --isolate                           Isolate the implementations' processes for stable measurements: pin the driver
+                                        to one core and each process to a core that no other concurrent process uses,
+                                        so at most one process runs per remaining core, whatever `--jobs`. Where the
+                                        host's cgroup v2 hierarchy is delegated to the user, each core also gets a
+                                        cgroup for the run, which limits its processes to that core and to
+                                        `--memory-limit`. The isolation applied (and why anything couldn't be) is
+                                        written alongside the results, or into them in --benchmark mode.
+
     -l, --list                          List the implementations that can be built by this tool.
 
+    --max-failures <count>              Maximum number of comparison failures and errors that each implementation's
+                                        result for a test file includes from each of its ComparisonReports and
+                                        ErrorReports. The number omitted is recorded under the result's `omitted`
+                                        field. By default, all are included. A --results-diff of results with omitted
+                                        failures can't compare them, and reports them as changed.
+
+    --max-stderr <bytes>                Maximum number of bytes of stderr to capture from each invocation of an
+                                        implementation; the rest is discarded. [default: 65536]
+
     -L, --local-only                    Test using only local implementations specified by `--implementation`.
 
+    --memory-budget <bytes>             With more than one of `--jobs`, the number of bytes of memory that the
+                                        implementations' concurrent invocations may use in total. Defaults to 80% of
+                                        the memory available when the run starts.
+
+    --memory-limit <bytes>              With --isolate, the maximum memory that each process may use. Enforced only
+                                        where the run's cgroups can be created.
+
+    -m, --metrics-file <file>           Maintain live metrics about the run in the given file, in the Prometheus text
+                                        exposition format (e.g. for the node exporter's textfile collector). The file
+                                        is atomically rewritten after each test file and at most every 10 seconds
+                                        while one is in progress.
+
     -o, --output-dir <dir>              Root directory for all of this command's output. [default: .]
 
+    -p, --perf                          Instead of testing for consensus, measure each implementation's performance
+                                        reading the selected good vectors and re-writing them in each output format,
+                                        using `process --perf-report`. The collected PerformanceReports are added to
+                                        the results, and a per-vector throughput and memory table is written alongside.
+
+    --perf-alpha <alpha>                In --results-diff mode, the significance level of the rank tests that compare
+                                        the two revisions' timing and memory measurements. [default: 0.01]
+
+    --perf-threshold <ratio>            In --results-diff mode, the minimum relative change in a measurement that is
+                                        reported when significant, e.g. 0.1 for 10%. A significant slowdown beyond it
+                                        in the `--perf` measurements fails the analysis. The CPU time and memory
+                                        recorded for ordinary runs are noisier; a significant increase in them fails
+                                        the analysis only when this option is given, and is otherwise only reported
+                                        (at a threshold of 10%).
+
+    --plan                              Instead of running the tests, print what the run would do, without installing or
+                                        invoking the implementations: the number of test files of each type, the
+                                        invocations of the implementations and the artifacts (files and bytes) that
+                                        each phase would produce if every implementation passed, and the wall time
+                                        estimated from the `--history` and `--jobs`, in total and when split into
+                                        various numbers of shards. Only ion-tests is installed.
+
+    --prefilter <policy>                Before the implementations compare the streams that they read or wrote from a
+                                        good vector, check in-process whether the streams are all equivalent. If they
+                                        are, `skip` runs none of the basic comparisons and `reduce` runs them with only
+                                        the first implementation; any comparisons specific to the test type still run
+                                        with every implementation. Disagreements are always compared by every
+                                        implementation. Chosen from `off`, `reduce`, and `skip`. [default: off]
+
+    --progress-file <file>              Write a JSON object to the given file for each test file as it completes, with
+                                        the run's progress and estimated time remaining; one object per line.
+
+    -P, --profile                       Profile the driver's own work. Writes a cProfile statistics file (`.prof`) and
+                                        a summary of the time spent in each phase of the run, split into time waiting
+                                        on implementations and time spent in the driver, alongside the results.
+
+    --repetitions <count>               In --perf and --benchmark modes, the number of measured invocations per input,
+                                        implementation, and output format. [default: 5]
+
     -r, --results-file <file>           Path to the results output file. By default, this will be placed in a file named
-                                        `ion-test-driver-results.ion` under the directory specified by the
-                                        `--output-dir` option.
+                                        `ion-test-driver-results.ion` (or, in the --benchmark, --fuzz, and
+                                        the --driver-benchmark modes, `ion-test-driver-benchmark-<timestamp>.ion`,
+                                        `ion-test-driver-fuzz-<timestamp>.ion`, and
+                                        `ion-test-driver-scaling-<timestamp>.ion`) under the directory specified by
+                                        the `--output-dir` option.
 
     -R, --results-diff                  Given two implementation descriptions of the forms name,commit_hash or
                                         name,location,revision. Name is the implementation's name and revision is
                                         optional, may be either a branch name or commit hash. Analyze an existing
                                         results file to identify any differences between the two implementations.
                                         The order of two implementations matters and the analysis result is based on the
-                                        first implementation.
+                                        first implementation. Any timing and memory measurements in the results file
+                                        are compared as well; see `--perf-alpha` and `--perf-threshold`.
 
     --replace <description>             Replace a default implementation by the specific description.
 
+    --seed <seed>                       In --benchmark mode, the integer seed from which the corpora are generated. Runs
+                                        with the same seed and corpus size measure identical inputs. In --fuzz mode,
+                                        the integer seed from which the traversals are generated. In
+                                        `--driver-benchmark` mode, the integer seed from which the trees are
+                                        generated. [default: 0]
+
+    --stub-counts <counts>              In --driver-benchmark mode, the comma-separated numbers of stub implementations
+                                        to test each tree with. [default: 3,10]
+
+    --stub-disagreement-rate <rate>     In --driver-benchmark mode, the probability that a stub reports a comparison
+                                        failure for a good vector. [default: 0.01]
+
+    --stub-error-rate <rate>            In --driver-benchmark mode, the probability that a stub fails to read a good
+                                        vector, or reads a bad one. [default: 0.01]
+
+    --stub-latency <seconds>            In --driver-benchmark mode, the time that each invocation of a stub takes, in
+                                        addition to starting it. [default: 0]
+
+    --shard <index/count>               Test only one of `count` shards of the test files, numbered from 1. Shards are
+                                        balanced by estimated cost, so all shards must use the same `--history`, which
+                                        they don't update.
+
     -t, --test <type>                   Perform a particular test type or types, chosen from `good`, `bad`, `equivs`,
                                         `non-equivs`, and `all`. [default: all]
 
+    --trace <file>                      Write a timeline of the run to the given file in the Chrome trace event JSON
+                                        format, with a span for each install step and each invocation of an
+                                        implementation. Open it with chrome://tracing or https://ui.perfetto.dev.
+
+    --warmups <count>                   In --perf and --benchmark modes, the number of unmeasured invocations that
+                                        precede the measured ones. [default: 1]
+
+    --vector-counts <counts>            In --driver-benchmark mode, the comma-separated sizes of the synthetic trees, in
+                                        vectors. [default: 10000,100000]
+
+    -w, --watch <description>           Build the local implementation described by name,path in place (incrementally,
+                                        using its working tree as is) and test it, along with any implementations
+                                        selected as usual. Then, whenever a file under the path changes, rebuild it and
+                                        test it again, printing each test file's outcome as it completes. The given
+                                        <test_file> patterns select the files tested each time; without any, those
+                                        that failed or changed since the last run (per the `--history`), or else all
+                                        selected files, are tested. Runs until interrupted.
+
+    --time-budget <seconds>             Stop starting new test files after the given number of seconds. Test files in
+                                        progress are completed, and those not started are reported as SKIPPED.
+
+    --traversals <count>                In --fuzz mode, the number of random traversals of each vector. [default: 1000]
+
+    -T, --timeout <seconds>             Kill any invocation of an implementation (including any processes it spawned)
+                                        that runs longer than the given number of seconds, and record a TIMEOUT error
+                                        for it. [default: 600]
+
+Arguments:
+    <test_file>                         Test only the files whose paths within ion-tests end with one of the given
+                                        suffixes (e.g. good/blobs.ion) or with a match of one of the given glob
+                                        patterns (e.g. equivs/*.10n), in whole path components. Paths are relative to
+                                        ion-tests (e.g. iontestdata/good/blobs.ion), not absolute, and it is an error
+                                        for a pattern to match no files.
+                                        The ion-tests files are indexed once per ion-tests commit, in a manifest
+                                        alongside its build directory.
 
 """
+import bisect
+import cProfile
+import hashlib
+import heapq
+import math
 import os
+import pstats
 import shutil
+import statistics
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from fnmatch import fnmatchcase
 from io import FileIO
-from subprocess import check_call, check_output, Popen, PIPE
+from subprocess import check_call, check_output, CalledProcessError, DEVNULL
 import six
 from amazon.ion import simpleion
 from amazon.ion.core import IonType
 from amazon.ion.equivalence import ion_equals
+from amazon.ion.exceptions import IonException
 from amazon.ion.simple_types import IonPySymbol, IonPyList
 from amazon.ion.util import Enum
 from docopt import docopt
 
+from amazon.iontest.ion_test_driver_benchmark import run_benchmarks
+from amazon.iontest.ion_test_driver_scaling import run_scaling_benchmarks
+from amazon.iontest.ion_test_driver_diff import diff_event_streams
+from amazon.iontest.ion_test_driver_fuzz import FailingSeeds, Traversal, traversal_seed, vector_event_count
 from amazon.iontest.ion_test_driver_config import TOOL_DEPENDENCIES, ION_BUILDS, ION_IMPLEMENTATIONS, ION_TESTS_SOURCE, \
-    RESULTS_FILE_DEFAULT, TOOL_TEST_COMMAND, RETRY_ATTEMPTS
-from amazon.iontest.ion_test_driver_util import COMMAND_SHELL, log_call
+    RESULTS_FILE_DEFAULT, FUZZ_SEEDS_FILE_DEFAULT, COST_ESTIMATE_DEFAULTS, HISTORY_SMOOTHING, TOOL_TEST_COMMAND, \
+    RETRY_ATTEMPTS, EXECUTION_LIMITS, PERF_OUTPUT_FORMATS, PERF_ELAPSED_TIME_UNIT, PERF_REPORT_THRESHOLD, \
+    ISOLATION_CPUS_PER_PROCESS, MEMORY_BUDGET_FRACTION, COMPARE_PREFILTER, COMPARE_PREFILTER_POLICIES, REPORT_LIMITS, \
+    EVENT_STREAM_FORMATS, WATCH_POLL_INTERVAL, WATCH_IGNORED_DIRECTORIES, PLAN_OUTPUT_SIZE_RATIOS, PLAN_REPORT_BYTES, \
+    PLAN_SHARD_COUNTS, UNMEASURED_MEMORY_WEIGHT
+from amazon.iontest.ion_test_driver_compare import EVENT_STREAM_SYMBOL, ION_BINARY_VERSION_MARKER, read_values, \
+    streams_equivalent
+from amazon.iontest.ion_test_driver_util import COMMAND_SHELL, log_call, execute_process, execute_in_process, \
+    DeadlineExceeded, new_metrics_totals, add_invocation_metrics, merge_metrics_totals, METRICS_INVOCATIONS_FIELD, \
+    METRICS_WALL_TIME_FIELD, METRICS_USER_TIME_FIELD, METRICS_SYSTEM_TIME_FIELD, METRICS_MAX_RSS_FIELD, \
+    mann_whitney_greater, wilcoxon_signed_rank_greater, PHASE_TIMER, timed_iteration, TRACER, RUN_MONITOR, fit_line, \
+    ISOLATION, ADMISSION, available_memory
 
 
 ION_SUFFIX_TEXT = '.ion'
 ION_SUFFIX_BINARY = '.10n'
+EVENTS_OUTPUT_FORMAT_TEXT = 'events'
+EVENTS_OUTPUT_FORMAT_BINARY = 'events-binary'
+MANIFEST_SUFFIX = '_manifest.ion'
+GLOB_CHARACTERS = '*?['
+# Options that select a mode with a usage pattern of its own; see `parse_arguments`.
+MODE_OPTIONS = ('--benchmark', '--fuzz', '--bisect', '--watch', '--driver-benchmark', '--diff-events', '--results-diff',
+                '--list')
+BUILD_MARKER = '.ion-test-driver-built'
+WORKING_TREE_REVISION = 'working-tree'
 ION_TEST_DRIVER_PATH = os.path.abspath(__file__)
 
 
@@ -115,6 +401,165 @@ def check_tool_dependencies(args):
             no_output.close()
 
 
+def set_execution_limits(args):
+    """
+    Overrides the defaults declared by `EXECUTION_LIMITS` with any limits provided on the command line, and validates
+    the run's deadline (if any). The deadline's clock is started by `start_deadline`.
+    """
+    for name, convert in (('timeout', float), ('max-stderr', int)):
+        value = args['--' + name]
+        if value:
+            value = convert(value)
+            if value <= 0:
+                raise ValueError("--%s must be positive." % name)
+            EXECUTION_LIMITS[name] = value
+    if args['--deadline'] and float(args['--deadline']) <= 0:
+        raise ValueError("--deadline must be positive.")
+
+
+def start_deadline(args):
+    """
+    Starts the clock on the run's deadline, if --deadline is provided. Called once the implementations are installed,
+    since their builds are not bounded by the deadline.
+    """
+    if args['--deadline']:
+        EXECUTION_LIMITS['deadline'] = time.monotonic() + float(args['--deadline'])
+
+
+def set_process_isolation(args):
+    """
+    Configures `ISOLATION` if --isolate is provided. Called once the implementations are installed, so that their
+    builds aren't confined to the driver's core.
+    """
+    if not args['--isolate']:
+        return
+    memory_limit = None
+    if args['--memory-limit']:
+        memory_limit = int(args['--memory-limit'])
+        if memory_limit <= 0:
+            raise ValueError("--memory-limit must be positive.")
+    ISOLATION.configure(ISOLATION_CPUS_PER_PROCESS, memory_limit)
+    description = ISOLATION.description
+    if description['pinned']:
+        print('Pinned the driver to core %s and the implementations to %d slots of %d cores; cgroups: %s.'
+              % (description['driver_cpus'][0], len(description['slots']), ISOLATION_CPUS_PER_PROCESS,
+                 description['cgroup'] or 'none'))
+    for reason in description['unavailable']:
+        print('Isolation unavailable: %s' % reason)
+
+
+def set_admission_control(args, jobs):
+    """
+    Configures `ADMISSION` if test files are to be tested concurrently. A single job runs one invocation at a time.
+    """
+    if jobs == 1:
+        return
+    if args['--memory-budget']:
+        memory_budget = int(args['--memory-budget'])
+        if memory_budget <= 0:
+            raise ValueError("--memory-budget must be positive.")
+    else:
+        memory = available_memory()
+        memory_budget = None if memory is None else int(memory * MEMORY_BUDGET_FRACTION)
+    ADMISSION.configure(memory_budget, UNMEASURED_MEMORY_WEIGHT)
+    if memory_budget is None:
+        print('The available memory is unknown; invocations are limited only by their implementations\' builds.')
+    else:
+        print('Admitting concurrent invocations within a memory budget of %.1f MB.' % (memory_budget / 1e6))
+
+
+def set_compare_prefilter(args):
+    """
+    Configures `COMPARE_PREFILTER` using the --prefilter argument.
+    """
+    if args['--prefilter'] not in COMPARE_PREFILTER_POLICIES:
+        raise ValueError("--prefilter must be one of %s." % ', '.join(COMPARE_PREFILTER_POLICIES))
+    COMPARE_PREFILTER['policy'] = args['--prefilter']
+
+
+def set_report_limits(args):
+    """
+    Configures `REPORT_LIMITS` using the --max-failures argument, if given.
+    """
+    if args['--max-failures'] is not None:
+        max_failures = int(args['--max-failures'])
+        if max_failures < 0:
+            raise ValueError("--max-failures must not be negative.")
+        REPORT_LIMITS['max-failures'] = max_failures
+
+
+def resolve_location(args, option):
+    """
+    Installation changes the working directory, so locations given relative to it are resolved before installing.
+    :return: the absolute location given by `option`, or None if it wasn't given.
+    """
+    return os.path.abspath(args[option]) if args[option] else None
+
+
+def parse_test_types(args):
+    """
+    :return: the TestTypes selected by the --test arguments.
+    """
+    if 'all' in args['--test']:
+        return list(TestType.__iter__())
+    return [test_type_from_str(x) for x in args['--test']]
+
+
+def parse_jobs(args):
+    """
+    :return: the number of test files to be tested concurrently, given by --jobs.
+    """
+    jobs = int(args['--jobs'])
+    if jobs < 1:
+        raise ValueError("--jobs must be positive.")
+    return jobs
+
+
+def parse_perf(args):
+    """
+    :return: the (warmups, repetitions) given by --warmups and --repetitions if --perf was given; otherwise, None.
+    """
+    if not args['--perf']:
+        return None
+    perf = (int(args['--warmups']), int(args['--repetitions']))
+    if perf[0] < 0 or perf[1] < 1:
+        raise ValueError("--warmups must not be negative and --repetitions must be positive.")
+    if int(args['--jobs']) > 1:
+        # Concurrent invocations compete for cores, caches, and memory bandwidth, skewing each other's measurements.
+        raise ValueError("--perf measures one invocation at a time; it can't be combined with --jobs.")
+    return perf
+
+
+def parse_shard_argument(args, history_location):
+    """
+    :return: the (index, count) given by --shard (see `parse_shard`), or None if it wasn't given.
+    """
+    if not args['--shard']:
+        return None
+    if history_location is None:
+        raise ValueError("--shard requires the cost history given by --history, which all shards must share.")
+    return parse_shard(args['--shard'])
+
+
+def parse_event_format(args):
+    """
+    :return: the EventStream encoding given by --event-format; one of `EVENT_STREAM_FORMATS`.
+    """
+    if args['--event-format'] not in EVENT_STREAM_FORMATS:
+        raise ValueError("--event-format must be one of %s." % ', '.join(EVENT_STREAM_FORMATS))
+    return args['--event-format']
+
+
+def negotiate_event_formats(implementations, output_root):
+    """
+    Has each of the installed implementations write binary EventStreams if it supports them; see
+    `IonImplementation.negotiate_event_format`.
+    """
+    probe_root = os.path.join(output_root, 'build', 'event-format')
+    for implementation in implementations:
+        implementation.negotiate_event_format(probe_root)
+
+
 class IonResource:
     def __init__(self, output_root, name, location, revision):
         """
@@ -139,6 +584,10 @@ class IonResource:
         self.__location = location
         self.__revision = revision
 
+    @property
+    def name(self):
+        return self._name
+
     @property
     def identifier(self):
         if self.__identifier is None:
@@ -175,18 +624,80 @@ class IonResource:
         finally:
             shutil.rmtree(tmp_dir_root)
 
-    def install(self):
+    def __use_in_process(self):
+        # In-process implementations run the version of their library that the driver runs with; there is nothing to
+        # clone or build, so the location is not used.
+        version = self._build.in_process[0]
+        if self.__revision is not None and self.__revision != version:
+            raise ValueError('%s runs in-process at version %s; revision %s cannot be installed.'
+                             % (self._name, version, self.__revision))
+        self.__identifier = self._name + '_' + version
+        self._build_dir = os.path.abspath(os.path.join(self.__output_root, 'build', self.__identifier))
+        if not os.path.isdir(self._build_dir):
+            os.makedirs(self._build_dir)
+
+    def install(self, reuse_build=False):
+        """
+        Clones (if needed) and builds this resource.
+        :param reuse_build: If True, a build directory that was already built successfully is used without building
+            it again.
+        :return: the build directory.
+        """
         if self.__revision is None:
             print('Installing %s default branch.' % (self._name, ))
         else:
             print('Installing %s revision %s.' % (self._name, self.__revision))
-        self.__git_clone_revision()
-        os.chdir(self._build_dir)
-        self._build.install(self.__build_log)
-        os.chdir(self.__output_root)
+        with TRACER.span('install %s' % self._name, 'install', implementation=self._name,
+                         revision=self.__revision or 'default'):
+            with TRACER.context(implementation=self._name):
+                if self._build.in_process is not None:
+                    self.__use_in_process()
+                else:
+                    self.__git_clone_revision()
+                    os.chdir(self._build_dir)
+                    try:
+                        built_marker = os.path.join(self._build_dir, BUILD_MARKER)
+                        if reuse_build and os.path.isfile(built_marker):
+                            print('%s already built. Using existing build.' % self._build_dir)
+                        else:
+                            self._build.install(self.__build_log)
+                            open(built_marker, 'w').close()
+                    finally:
+                        os.chdir(self.__output_root)
         print('Done installing %s.' % self.identifier)
         return self._build_dir
 
+    def install_in_place(self):
+        """
+        Builds this resource in its location, which must be a local directory, instead of in a clone under the output
+        root. Rebuilds are incremental, and the working tree is used as is, including any uncommitted changes.
+        :return: the build directory.
+        """
+        if self._build.in_process is not None:
+            raise ValueError('%s runs in-process and cannot be built in place.' % self._name)
+        if not os.path.isdir(self.__location):
+            raise ValueError('%s is not a local directory; only local implementations can be built in place.'
+                             % self.__location)
+        self.__identifier = self._name + '_' + WORKING_TREE_REVISION
+        self._build_dir = os.path.abspath(self.__location)
+        logs_dir = os.path.abspath(os.path.join(self.__output_root, 'build', 'logs'))
+        if not os.path.isdir(logs_dir):
+            os.makedirs(logs_dir)
+        self.__build_log = os.path.join(logs_dir, self.__identifier + '.txt')
+        with TRACER.span('install %s' % self._name, 'install', implementation=self._name,
+                         revision=WORKING_TREE_REVISION):
+            with TRACER.context(implementation=self._name):
+                os.chdir(self._build_dir)
+                try:
+                    self._build.install(self.__build_log)
+                finally:
+                    os.chdir(self.__output_root)
+        return self._build_dir
+
+    @property
+    def build_log(self):
+        return self.__build_log
+
 
 class IonImplementation(IonResource):
     def __init__(self, output_root, name, location, revision):
@@ -194,22 +705,160 @@ class IonImplementation(IonResource):
         An executable `IonResource`; used to represent different Ion implementations.
         """
         super(IonImplementation, self).__init__(output_root, name, location, revision)
+        self.__event_output_format = EVENTS_OUTPUT_FORMAT_TEXT
+
+    @property
+    def event_output_format(self):
+        """
+        The `--output-format` with which this implementation writes EventStreams; see `negotiate_event_format`.
+        """
+        return self.__event_output_format
+
+    @property
+    def event_suffix(self):
+        return ION_SUFFIX_BINARY if self.__event_output_format == EVENTS_OUTPUT_FORMAT_BINARY else ION_SUFFIX_TEXT
+
+    def negotiate_event_format(self, probe_root):
+        """
+        Determines whether this implementation can write binary EventStreams (`--output-format events-binary`) by
+        asking it to write one for a small input. If it can't, it writes text EventStreams.
+        :param probe_root: Directory in which to write the probe's input and output.
+        """
+        if not os.path.isdir(probe_root):
+            os.makedirs(probe_root)
+        probe_input = os.path.join(probe_root, 'probe' + ION_SUFFIX_TEXT)
+        with open(probe_input, 'w') as probe_out:
+            probe_out.write('$ion_1_0 a::{b:[1, 2.0, "three"]}')
+        probe_output = os.path.join(probe_root, self.identifier + ION_SUFFIX_BINARY)
+        probe_errors = os.path.join(probe_root, self.identifier + '_errors' + ION_SUFFIX_TEXT)
+        self.__event_output_format = EVENTS_OUTPUT_FORMAT_TEXT
+        try:
+            result = self.execute('process', '--error-report', probe_errors, '--output', probe_output,
+                                  '--output-format', EVENTS_OUTPUT_FORMAT_BINARY, probe_input)
+        except DeadlineExceeded:
+            # The run itself stops at its first invocation, and writes the (empty) results as usual.
+            result = None
+        reason = None
+        if result is None:
+            reason = "the run's deadline passed"
+        elif result.timed_out:
+            reason = 'the probe timed out'
+        elif result.returncode != 0:
+            reason = 'the probe exited with status %d' % result.returncode
+        else:
+            try:
+                if not report_is_empty(probe_errors):
+                    reason = 'the probe reported errors in %s' % probe_errors
+                elif not is_binary_event_stream(probe_output):
+                    reason = 'the probe did not write a binary EventStream'
+            except (IonException, ValueError) as e:
+                reason = "the probe's output could not be read (%s: %s)" % (type(e).__name__, e)
+        if reason is None:
+            self.__event_output_format = EVENTS_OUTPUT_FORMAT_BINARY
+            print('%s writes EventStreams using --output-format %s.' % (self.identifier, self.__event_output_format))
+        else:
+            print('%s writes EventStreams using --output-format %s, since %s.'
+                  % (self.identifier, self.__event_output_format, reason))
 
     def execute(self, *args):
+        """
+        Invokes this implementation's CLI with the given arguments, subject to `EXECUTION_LIMITS`.
+        :return: a ProcessResult, which includes the invocation's stderr and the resources it consumed.
+        :raises DeadlineExceeded: if the run's deadline passes before the invocation completes.
+        """
         # TODO execute commands in 'interactive mode' to avoid creating a new short-lived process for each invocation.
         if self._build_dir is None:
             raise ValueError('Implementation %s has not been installed.' % self._name)
-        if self._executable is None:
-            if self._build.execute is None:
-                raise ValueError('Implementation %s is not executable.' % self._name)
-            self._executable = os.path.abspath(os.path.join(self._build_dir, self._build.execute))
-        if not os.path.isfile(self._executable):
-            raise ValueError('Executable for %s does not exist.' % self._name)
-        _, stderr = Popen((self._prefix + (self._executable,) + args), stderr=PIPE, shell=COMMAND_SHELL).communicate()
-        return stderr
+        if self._build.in_process is None:
+            if self._executable is None:
+                if self._build.execute is None:
+                    raise ValueError('Implementation %s is not executable.' % self._name)
+                self._executable = os.path.abspath(os.path.join(self._build_dir, self._build.execute))
+            if not os.path.isfile(self._executable):
+                raise ValueError('Executable for %s does not exist.' % self._name)
+        with TRACER.span('%s %s' % (self.identifier, args[0]), 'execute', implementation=self.identifier,
+                         command=' '.join(args)) as span_args:
+            # Waits while the host's memory is committed to other invocations; see AdmissionControl.
+            with ADMISSION.admit(self.identifier, self._build.max_concurrency, self._build.memory_weight,
+                                 EXECUTION_LIMITS['deadline']) as queued_seconds:
+                timeout = EXECUTION_LIMITS['timeout']
+                limited_by_deadline = False
+                if EXECUTION_LIMITS['deadline'] is not None:
+                    remaining = EXECUTION_LIMITS['deadline'] - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded()
+                    if timeout is None or remaining < timeout:
+                        timeout = remaining
+                        limited_by_deadline = True
+                with RUN_MONITOR.in_flight():
+                    if self._build.in_process is not None:
+                        result = execute_in_process(self._build.in_process[1], args, timeout,
+                                                    EXECUTION_LIMITS['max-stderr'])
+                    else:
+                        result = execute_process(self._prefix + (self._executable,) + args, timeout,
+                                                 EXECUTION_LIMITS['max-stderr'])
+                ADMISSION.record(self.identifier, result.metrics.max_rss)
+            span_args['exit_status'] = result.returncode
+            span_args['timed_out'] = result.timed_out
+            if queued_seconds:
+                span_args['queued_seconds'] = queued_seconds
+        if result.timed_out and limited_by_deadline:
+            raise DeadlineExceeded()
+        return result
+
+
+def load_report(location, limit=None):
+    """
+    Reads the Ion stream (e.g. an ErrorReport or ComparisonReport) at the given location one value at a time.
+    :param location: The report's location. A report that doesn't exist is empty.
+    :param limit: The maximum number of values to load, or None to load them all. Values beyond the limit are counted,
+        but not kept.
+    :return: a tuple (list of the loaded values, number of values omitted).
+    """
+    values = IonPyList.from_value(IonType.LIST, [])
+    omitted = 0
+    if os.path.isfile(location):
+        for value in read_values(location):
+            if limit is None or len(values) < limit:
+                values.append(value)
+            else:
+                omitted += 1
+    return values, omitted
+
+
+def is_binary_event_stream(location):
+    """
+    Determines whether the file at the given location is a binary Ion EventStream, reading only its first value.
+    """
+    if not os.path.isfile(location):
+        return False
+    with open(location, 'rb') as stream_in:
+        if stream_in.read(len(ION_BINARY_VERSION_MARKER)) != ION_BINARY_VERSION_MARKER:
+            return False
+    values = read_values(location)
+    try:
+        first = next(values, None)
+    finally:
+        values.close()
+    return isinstance(first, IonPySymbol) and first.text == EVENT_STREAM_SYMBOL and not first.ion_annotations
+
+
+def report_is_empty(location):
+    """
+    Determines whether the Ion stream at the given location contains no values, reading at most the first one.
+    """
+    if not os.path.isfile(location):
+        return True
+    values = read_values(location)
+    try:
+        return next(values, None) is None
+    finally:
+        values.close()
 
 
 class TestResult:
+    __slots__ = ('impl_id', 'output_location', 'error_location', '__has_errors')
+
     def __init__(self, impl_id, output_location, error_location):
         """
         Retrieves the ErrorReports generated by calls to any implementation's CLI.
@@ -221,96 +870,104 @@ class TestResult:
         self.impl_id = impl_id
         self.output_location = output_location
         self.error_location = error_location
-        self.__errors = None
-
-    @property
-    def errors(self):
-        if self.__errors is None:
-            if os.path.isfile(self.error_location):
-                errors_in = FileIO(self.error_location, mode='rb')
-                try:
-                    errors_stream = simpleion.load(errors_in, single_value=False)
-                finally:
-                    errors_in.close()
-                self.__errors = IonPyList.from_value(IonType.LIST, errors_stream)
-            else:
-                self.__errors = IonPyList.from_value(IonType.LIST, [])
-        return self.__errors
+        self.__has_errors = None
 
     @property
     def has_errors(self):
-        return len(self.errors) != 0
+        if self.__has_errors is None:
+            self.__has_errors = not report_is_empty(self.error_location)
+        return self.__has_errors
+
+    def reset(self):
+        # Force the error report to be re-read.
+        self.__has_errors = None
 
 
 class CompareResult(TestResult):
+    __slots__ = ('__has_comparison_failures',)
+
     def __init__(self, impl_id, report_location, error_location):
         """
         Retrieves the ComparisonReport generated by calls to any implementation's CLI.
         """
         super(CompareResult, self).__init__(impl_id, report_location, error_location)
-        self.__comparison_report = None
-
-    @property
-    def comparison_report(self):
-        if self.__comparison_report is None:
-            if os.path.isfile(self.output_location):
-                comparisons_in = FileIO(self.output_location, mode='rb')
-                try:
-                    comparison_failure_stream = simpleion.load(comparisons_in, single_value=False)
-                finally:
-                    comparisons_in.close()
-                self.__comparison_report = IonPyList.from_value(IonType.LIST, comparison_failure_stream)
-            else:
-                self.__comparison_report = IonPyList.from_value(IonType.LIST, [])
-        return self.__comparison_report
+        self.__has_comparison_failures = None
 
     @property
     def has_comparison_failures(self):
-        return len(self.comparison_report) != 0
+        if self.__has_comparison_failures is None:
+            self.__has_comparison_failures = not report_is_empty(self.output_location)
+        return self.__has_comparison_failures
 
     def reset(self):
         # Force the error and comparison reports to be re-read.
-        self.__errors = None
-        self.__comparison_report = None
+        super(CompareResult, self).reset()
+        self.__has_comparison_failures = None
 
 
-class TestReport(dict):
+class PerfResult(TestResult):
+    __slots__ = ('report_location', '__performance_report')
+
+    def __init__(self, impl_id, output_location, report_location, error_location):
+        """
+        Retrieves the PerformanceReport generated by a call to any implementation's CLI with `--perf-report`.
+        """
+        super(PerfResult, self).__init__(impl_id, output_location, error_location)
+        self.report_location = report_location
+        self.__performance_report = None
+
+    @property
+    def performance_report(self):
+        """
+        The PerformanceReport, or None if the implementation did not produce one.
+        """
+        if self.__performance_report is None:
+            reports, _ = load_report(self.report_location, limit=1)
+            if len(reports) != 0:
+                self.__performance_report = reports[0]
+        return self.__performance_report
+
+
+class TestReport:
     PASS = IonPySymbol.from_value(IonType.SYMBOL, 'PASS')
     FAIL = IonPySymbol.from_value(IonType.SYMBOL, 'FAIL')
+    SKIPPED = IonPySymbol.from_value(IonType.SYMBOL, 'SKIPPED')
     READ_ERROR = 'read_error'
     WRITE_ERROR = 'write_error'
     READ_COMPARE = 'read_compare'
     WRITE_COMPARE = 'write_compare'
+    PERF_ERROR = 'perf_error'
     ERROR_REPORT_ANNOTATION = (IonPySymbol.from_value(IonType.SYMBOL, 'ErrorReport'),)
     COMPARISON_REPORT_ANNOTATION = (IonPySymbol.from_value(IonType.SYMBOL, 'ComparisonReport'),)
+    PERFORMANCE_REPORT_ANNOTATION = (IonPySymbol.from_value(IonType.SYMBOL, 'PerformanceReport'),)
     RESULT_FIELD = 'result'
+    METRICS_FIELD = 'metrics'
+    PERFORMANCE_FIELD = 'performance'
+    PERFORMANCE_REPORT_FIELD = 'report'
+    INPUT_SIZE_FIELD = 'input_size'
     COMPARISON_FAILURES_FIELD = 'failures'
     ERRORS_FIELD = 'errors'
+    OMITTED_FIELD = 'omitted'
+
+    __slots__ = ('result', 'metrics', 'performance', '__failures')
 
     def __init__(self):
         """
         Collects any errors and comparison failures that occur in the read, read_verify, write, and write_verify phases
-        of a single test for a single implementation.
-        """
-        super(dict, self).__init__()
-        self[TestReport.RESULT_FIELD] = TestReport.PASS
-
-    def __set_read_write_error(self, key, error_report):
-        error_report.ion_annotations = TestReport.ERROR_REPORT_ANNOTATION
-        self[key] = error_report
-        self[TestReport.RESULT_FIELD] = TestReport.FAIL
-
-    def __set_comparison_failure(self, key, comparison_report, error_report):
-        if comparison_report is None and error_report is None:
-            raise ValueError('Failed a comparison for %s for no apparent reason.' % key)
-        self[key] = {}
-        if comparison_report is not None:
-            comparison_report.ion_annotations = TestReport.COMPARISON_REPORT_ANNOTATION
-            self[key][TestReport.COMPARISON_FAILURES_FIELD] = comparison_report
-        if error_report is not None:
-            error_report.ion_annotations = TestReport.ERROR_REPORT_ANNOTATION
-            self[key][TestReport.ERRORS_FIELD] = error_report
-        self[TestReport.RESULT_FIELD] = TestReport.FAIL
+        of a single test for a single implementation. Failures are kept as the locations of the ErrorReports and
+        ComparisonReports that describe them, which are only loaded when the report is serialized (see `to_ion`), so
+        that the driver's memory doesn't grow with the number and size of the failures in a run.
+        """
+        self.result = TestReport.PASS
+        self.metrics = None
+        self.performance = None
+        self.__failures = None
+
+    def __set_failure(self, key, locations):
+        if self.__failures is None:
+            self.__failures = {}
+        self.__failures[key] = locations
+        self.result = TestReport.FAIL
 
     def error(self, result, is_read):
         """
@@ -319,7 +976,7 @@ class TestReport(dict):
         :param is_read: True if and only if this error occurred in the read phase.
         """
         field = TestReport.READ_ERROR if is_read else TestReport.WRITE_ERROR
-        self.__set_read_write_error(field, result.errors)
+        self.__set_failure(field, (None, result.error_location))
 
     def fail_compare(self, compare_result, is_read):
         """
@@ -328,15 +985,174 @@ class TestReport(dict):
         :param is_read: True if and only if this error occurred in the read verification phase.
         """
         field = TestReport.READ_COMPARE if is_read else TestReport.WRITE_COMPARE
-        self.__set_comparison_failure(
-            field,
-            compare_result.comparison_report if compare_result.has_comparison_failures else None,
-            compare_result.errors if compare_result.has_errors else None
-        )
+        comparison_location = compare_result.output_location if compare_result.has_comparison_failures else None
+        error_location = compare_result.error_location if compare_result.has_errors else None
+        if comparison_location is None and error_location is None:
+            raise ValueError('Failed a comparison for %s for no apparent reason.' % field)
+        self.__set_failure(field, (comparison_location, error_location))
+
+    def perf_error(self, result):
+        """
+        Adds the given PerfResult as an error.
+        :param result: A PerfResult for which result.has_errors is True.
+        """
+        self.__set_failure(TestReport.PERF_ERROR, (None, result.error_location))
+
+    def add_performance_sample(self, output_format, perf_result, metrics, input_size):
+        """
+        Records one measured invocation from the --perf mode.
+        :param output_format: The output format the implementation wrote.
+        :param perf_result: The invocation's PerfResult.
+        :param metrics: The invocation's InvocationMetrics, as measured by the driver.
+        :param input_size: The size of the vector, in bytes.
+        """
+        sample = {METRICS_WALL_TIME_FIELD: metrics.wall_time, TestReport.INPUT_SIZE_FIELD: input_size}
+        if metrics.max_rss is not None:
+            sample[METRICS_MAX_RSS_FIELD] = metrics.max_rss
+        performance_report = perf_result.performance_report
+        if performance_report is not None:
+            performance_report.ion_annotations = TestReport.PERFORMANCE_REPORT_ANNOTATION
+            sample[TestReport.PERFORMANCE_REPORT_FIELD] = performance_report
+        if self.performance is None:
+            self.performance = {}
+        self.performance.setdefault(output_format, []).append(sample)
+
+    def skip(self):
+        """
+        Marks the test as not having been run, e.g. because the run's time budget was exhausted.
+        """
+        self.result = TestReport.SKIPPED
+
+    def add_metrics(self, phase, metrics):
+        """
+        Accumulates the resources consumed by one invocation into this report's totals for the given phase.
+        :param phase: The phase in which the invocation occurred (e.g. TestFile.READ_PHASE).
+        :param metrics: The invocation's InvocationMetrics.
+        """
+        if self.metrics is None:
+            self.metrics = {}
+        add_invocation_metrics(self.metrics.setdefault(phase, new_metrics_totals()), metrics)
 
     @property
     def has_failure(self):
-        return self[TestReport.RESULT_FIELD] == TestReport.FAIL
+        return self.result == TestReport.FAIL
+
+    @property
+    def failure_fields(self):
+        """
+        The fields (e.g. read_error) under which this report's failures are recorded.
+        """
+        return sorted(self.__failures or ())
+
+    def to_ion(self):
+        """
+        Builds this report in the form written to the results file (see `write_results`), loading the reports that
+        describe its failures.
+        """
+        report = {TestReport.RESULT_FIELD: self.result}
+        if self.metrics is not None:
+            report[TestReport.METRICS_FIELD] = self.metrics
+        if self.performance is not None:
+            report[TestReport.PERFORMANCE_FIELD] = self.performance
+        # Each failure embeds at most REPORT_LIMITS['max-failures'] values from each of its reports; the number of
+        # values omitted from each is recorded under the `omitted` field, which mirrors the failures' structure.
+        limit = REPORT_LIMITS['max-failures']
+        omitted = {}
+        for field, (comparison_location, error_location) in six.iteritems(self.__failures or {}):
+            if field in (TestReport.READ_COMPARE, TestReport.WRITE_COMPARE):
+                failure = {}
+                failure_omitted = {}
+                for name, location, annotation in (
+                        (TestReport.COMPARISON_FAILURES_FIELD, comparison_location,
+                         TestReport.COMPARISON_REPORT_ANNOTATION),
+                        (TestReport.ERRORS_FIELD, error_location, TestReport.ERROR_REPORT_ANNOTATION)):
+                    if location is not None:
+                        failure[name], count = load_report(location, limit)
+                        failure[name].ion_annotations = annotation
+                        if count:
+                            failure_omitted[name] = count
+                report[field] = failure
+                if failure_omitted:
+                    omitted[field] = failure_omitted
+            else:
+                report[field], count = load_report(error_location, limit)
+                report[field].ion_annotations = TestReport.ERROR_REPORT_ANNOTATION
+                if count:
+                    omitted[field] = count
+        if omitted:
+            report[TestReport.OMITTED_FIELD] = omitted
+        return report
+
+
+class CachedReport:
+    __slots__ = ('report',)
+
+    # Resources and performance belong to the run that produced the report; they aren't summarized with this run's.
+    metrics = None
+    performance = None
+
+    def __init__(self, report):
+        """
+        A report loaded from a Baseline, which is written to the results unchanged (see `TestReport.to_ion`).
+        :param report: The report, as loaded from the baseline's results file.
+        """
+        self.report = report
+
+    @property
+    def result(self):
+        return self.report[TestReport.RESULT_FIELD]
+
+    def to_ion(self):
+        return self.report
+
+
+class Baseline:
+    def __init__(self, location, ion_implementations):
+        """
+        A stored run of the default mode whose results stand in for the implementations that it tested but that aren't
+        being tested now, its peers (see --baseline). The run's artifacts are expected in the directory that contains
+        its results file, where they were written; see `TestFile` for their layout.
+        :param location: The stored run's results file.
+        :param ion_implementations: The implementations being tested.
+        """
+        self.results_root = os.path.dirname(location)
+        self.__results = self.__load(location)
+        identifiers = set(impl.identifier for impl in ion_implementations)
+        peers = set()
+        for test_files in six.itervalues(self.__results):
+            for reports in six.itervalues(test_files):
+                peers.update(impl_id for impl_id in reports if impl_id not in identifiers)
+        self.peers = sorted(peers)
+
+    @staticmethod
+    def __load(location):
+        results_in = FileIO(location, mode='rb')
+        try:
+            values = simpleion.load(results_in, single_value=False)
+        finally:
+            results_in.close()
+        if len(values) == 0:
+            return {}
+        return {six.text_type(test_type): {
+            six.text_type(test_file): {six.text_type(impl_id): report for impl_id, report in six.iteritems(reports)}
+            for test_file, reports in six.iteritems(test_files)
+        } for test_type, test_files in six.iteritems(values[0])}
+
+    def reports(self, test_type, short_path):
+        """
+        The peers' reports for the given test file. Peers that didn't test the file (e.g. because it was added to
+        ion-tests since) are reported as SKIPPED.
+        :return: A dict of the form {impl_id: CachedReport or TestReport}.
+        """
+        stored = self.__results.get(str(test_type), {}).get(short_path, {})
+        reports = {}
+        for peer in self.peers:
+            if peer in stored:
+                reports[peer] = CachedReport(stored[peer])
+            else:
+                reports[peer] = TestReport()
+                reports[peer].skip()
+        return reports
 
 
 class TestType(Enum):
@@ -386,11 +1202,30 @@ def test_dir_from_version(version):
     raise ValueError("Unknown Ion version: %s" % version)
 
 
+def prefilter_applies(test_type, input_count):
+    """
+    Determines whether a verify phase runs the compare pre-filter (see `COMPARE_PREFILTER`) over its inputs before any
+    implementation compares them. Bad files aren't pre-filtered, because their inputs are partial outputs.
+    :param input_count: The number of streams to be compared, including the original file, if it is one of them.
+    """
+    return COMPARE_PREFILTER['policy'] != 'off' and not test_type.is_bad and input_count > 1
+
+
+def compares_basic(index, agreed):
+    """
+    Determines whether the implementation at `index` (in the order that they are given) runs a basic comparison in a
+    verify phase. Every implementation that compares also runs the test type's comparison, unless it's basic.
+    :param agreed: Whether the pre-filter found the inputs equivalent; see `prefilter_applies`.
+    """
+    return not agreed or (COMPARE_PREFILTER['policy'] == 'reduce' and index == 0)
+
+
 class TestFile:
     ERROR_TYPE_FIELD = 'error_type'
     ERROR_MESSAGE_FIELD = 'message'
     ERROR_LOCATION_FIELD = 'location'
     ERROR_TYPE_STATE_SYMBOL = IonPySymbol.from_value(IonType.SYMBOL, 'STATE')
+    ERROR_TYPE_TIMEOUT_SYMBOL = IonPySymbol.from_value(IonType.SYMBOL, 'TIMEOUT')
     DATA_DIR = 'data'
     ERRORS_DIR = 'errors'
     REPORT_DIR = 'report'
@@ -399,41 +1234,90 @@ class TestFile:
     WRITE_DIR = 'write'
     READ_VERIFY_DIR = 'read_verify'
     WRITE_VERIFY_DIR = 'write_verify'
-
-    def __init__(self, test_type, path, output_root, ion_implementations):
+    PERF_DIR = 'perf'
+    FUZZ_DIR = 'fuzz'
+    READ_PHASE = 'read'
+    READ_VERIFY_PHASE = READ_VERIFY_DIR
+    WRITE_PHASE = WRITE_DIR
+    WRITE_VERIFY_PHASE = WRITE_VERIFY_DIR
+    PERF_PHASE = PERF_DIR
+
+    def __init__(self, test_type, path, output_root, ion_implementations, size=None, digest=None, traversal=None,
+                 baseline=None):
         """
         Provides the test logic and collects the results for testing a single test file against all implementations.
         :param path: Path to the test file.
         :param test_type: The test file's TestType.
         :param output_root: The root directory in which to write the test results for this test file.
         :param ion_implementations: The implementations for which to test this file.
+        :param size: The test file's size in bytes, if already known (e.g. from the TestManifest).
+        :param digest: The `file_digest` of the test file, if already known.
+        :param traversal: If provided, the Traversal (see ion_test_driver_fuzz) with which the implementations read the
+            file. The read EventStreams are only verified to agree with each other, and the write phases are skipped.
+        :param baseline: If provided, the Baseline whose stored outputs for this file are verified along with those of
+            `ion_implementations`, and whose reports are added to the results. Can't be combined with `traversal`.
         """
         self.path = path
+        self.__size = size
+        self.__digest = digest
         self.short_path = os.path.split(self.path)[-1]
         self.__read_results = []
         self.__write_results = []
         self.__type = test_type
+        self.__traversal = traversal
+        # Traversals emit only the events they reach, so their EventStreams are only compared as streams.
+        self.__compare_type = test_type.compare_type if traversal is None else 'basic'
         self.__results_root = os.path.join(output_root, str(test_type), self.short_path)
+        if traversal is not None:
+            self.__results_root = os.path.join(self.__results_root, TestFile.FUZZ_DIR, traversal.name)
         self.__report = {impl.identifier: TestReport() for impl in ion_implementations}  # Initializes PASS results
         self.__ion_implementations = ion_implementations
-
-    def __execute_with(self, ion_implementation, error_location, args):
-        stderr = ion_implementation.execute(*args)
-        if len(stderr) != 0:
+        self.__baseline = baseline
+        self.__peer_reports = {} if baseline is None else baseline.reports(test_type, self.short_path)
+
+    def __execute_with(self, ion_implementation, error_location, phase, args):
+        with TRACER.context(phase=phase, test_file=self.path):
+            process_result = ion_implementation.execute(*args)
+        self.__report[ion_implementation.identifier].add_metrics(phase, process_result.metrics)
+        if RUN_MONITOR.enabled:
+            output_bytes = 0
+            if '--output' in args:
+                output = args[args.index('--output') + 1]
+                if os.path.isfile(output):
+                    output_bytes = os.path.getsize(output)
+            RUN_MONITOR.record_invocation(ion_implementation.identifier, phase, process_result.metrics.wall_time,
+                                          output_bytes)
+        stderr = process_result.stderr.decode('utf-8', 'replace')
+        if process_result.stderr_discarded:
+            stderr += '... (%d more bytes discarded)' % process_result.stderr_discarded
+        if process_result.timed_out:
+            # Whatever the implementation managed to write before it was killed is incomplete; replace it.
+            error_type = TestFile.ERROR_TYPE_TIMEOUT_SYMBOL
+            message = 'Implementation %s timed out after %.1f seconds for command %r.' % (
+                ion_implementation.identifier, process_result.metrics.wall_time, args
+            )
+            if len(stderr) != 0:
+                message += ' Its stderr output was "%s".' % stderr
+        elif len(stderr) != 0:
             # Any output to stderr is likely caused by an uncaught error in the implementation under test. This forces a
             # failure to avoid false negatives.
-            error_file = FileIO(error_location, 'wb')
-            try:
-                error = {
-                    TestFile.ERROR_TYPE_FIELD: TestFile.ERROR_TYPE_STATE_SYMBOL,
-                    TestFile.ERROR_MESSAGE_FIELD: 'Implementation %s produced stderr output "%s" for command %r.' % (
-                        ion_implementation.identifier, stderr.decode(), args
-                    ),
-                    TestFile.ERROR_LOCATION_FIELD: self.path
-                }
-                simpleion.dump(error, error_file, binary=False)
-            finally:
-                error_file.close()
+            error_type = TestFile.ERROR_TYPE_STATE_SYMBOL
+            message = 'Implementation %s produced stderr output "%s" for command %r.' % (
+                ion_implementation.identifier, stderr, args
+            )
+        else:
+            return process_result
+        error_file = FileIO(error_location, 'wb')
+        try:
+            error = {
+                TestFile.ERROR_TYPE_FIELD: error_type,
+                TestFile.ERROR_MESSAGE_FIELD: message,
+                TestFile.ERROR_LOCATION_FIELD: self.path
+            }
+            simpleion.dump(error, error_file, binary=False)
+        finally:
+            error_file.close()
+        return process_result
 
     def __new_results_file(self, short_name, *dirs):
         results_dir = os.path.join(self.__results_root, *dirs)
@@ -442,23 +1326,29 @@ class TestFile:
         return os.path.join(results_dir, short_name)
 
     def __read_with(self, ion_implementation):
-        read_output = self.__new_results_file(ion_implementation.identifier + ION_SUFFIX_TEXT, TestFile.READ_DATA_DIR)
+        # The EventStream is binary if the implementation supports it (see IonImplementation.negotiate_event_format);
+        # every implementation can read either encoding in the phases that follow.
+        read_output = self.__new_results_file(ion_implementation.identifier + ion_implementation.event_suffix,
+                                              TestFile.READ_DATA_DIR)
         read_errors = self.__new_results_file(ion_implementation.identifier + ION_SUFFIX_TEXT, TestFile.READ_ERRORS_DIR)
-        self.__execute_with(ion_implementation, read_errors,
-                            ('process', '--error-report', read_errors, '--output', read_output, '--output-format',
-                             'events', self.path))
+        args = ('process', '--error-report', read_errors, '--output', read_output, '--output-format',
+                ion_implementation.event_output_format)
+        if self.__traversal is not None:
+            args += ('--traverse', self.__traversal.location)
+        self.__execute_with(ion_implementation, read_errors, TestFile.READ_PHASE, args + (self.path,))
         result = TestResult(ion_implementation.identifier, read_output, read_errors)
         self.__read_results.append(result)
         return result
 
     def __compare(self, ion_implementation, compare_type, compare_result, inputs, is_read, is_sets=False):
-        self.__execute_with(ion_implementation, compare_result.error_location,
+        phase = TestFile.READ_VERIFY_PHASE if is_read else TestFile.WRITE_VERIFY_PHASE
+        self.__execute_with(ion_implementation, compare_result.error_location, phase,
                             ('compare', '--error-report', compare_result.error_location, '--output',
                              compare_result.output_location, '--comparison-type', compare_type, *inputs))
         if not compare_result.has_errors and not compare_result.has_comparison_failures:
-            if not is_sets and self.__type.compare_type != 'basic':
+            if not is_sets and self.__compare_type != 'basic':
                 compare_result.reset()
-                self.__compare(ion_implementation, self.__type.compare_type, compare_result, inputs,
+                self.__compare(ion_implementation, self.__compare_type, compare_result, inputs,
                                is_read, is_sets=True)
         if compare_result.has_errors or compare_result.has_comparison_failures:
             try:
@@ -473,7 +1363,12 @@ class TestFile:
         else:
             error_results = list(filter(lambda res: res.has_errors, results))
             success_results = list(filter(lambda res: not res.has_errors, results))
+            if self.__traversal is not None and len(success_results) == 0:
+                # Every implementation rejected the traversal; they agree.
+                return
         for error_result in error_results:
+            if error_result.impl_id in self.__peer_reports:
+                continue  # Peers keep their stored results.
             try:
                 self.__report[error_result.impl_id].error(error_result, is_read)
             except KeyError:
@@ -483,17 +1378,26 @@ class TestFile:
             return
         verify_dir = TestFile.READ_VERIFY_DIR if is_read else TestFile.WRITE_VERIFY_DIR
         outputs = [x.output_location for x in success_results]
-        if not self.__type.is_bad:
+        if not self.__type.is_bad and self.__traversal is None:
             # For bad inputs, reading the original input again would cause a failure before the comparison begins.
             outputs.append(self.path)
-        for ion_implementation in self.__ion_implementations:
+        agreed = False
+        if prefilter_applies(self.__type, len(outputs)):
+            with TRACER.span('prefilter', 'compare', test_file=self.path, inputs=len(outputs)) as span_args:
+                agreed = streams_equivalent(outputs) is True
+                span_args['agreed'] = agreed
+        for i, ion_implementation in enumerate(self.__ion_implementations):
             compare_output = self.__new_results_file(ion_implementation.identifier + ION_SUFFIX_TEXT, verify_dir,
                                                      TestFile.REPORT_DIR)
             compare_errors = self.__new_results_file(ion_implementation.identifier + ION_SUFFIX_TEXT, verify_dir,
                                                      TestFile.ERRORS_DIR)
-            self.__compare(ion_implementation, 'basic',
-                           CompareResult(ion_implementation.identifier, compare_output, compare_errors),
-                           outputs, is_read)
+            compare_result = CompareResult(ion_implementation.identifier, compare_output, compare_errors)
+            if compares_basic(i, agreed):
+                self.__compare(ion_implementation, 'basic', compare_result, outputs, is_read)
+            elif self.__compare_type != 'basic':
+                # The pre-filter only establishes basic equivalence.
+                self.__compare(ion_implementation, self.__compare_type, compare_result, outputs, is_read,
+                               is_sets=True)
 
     def __write_with(self, ion_implementation):
         if self.__type.is_bad:
@@ -510,18 +1414,100 @@ class TestFile:
                                                            encoding, TestFile.DATA_DIR)
                     write_errors = self.__new_results_file(read_result.impl_id + ION_SUFFIX_TEXT, write_output_root,
                                                            encoding, TestFile.ERRORS_DIR)
-                    self.__execute_with(ion_implementation, write_errors,
+                    self.__execute_with(ion_implementation, write_errors, TestFile.WRITE_PHASE,
                                         ('process', '--error-report', write_errors, '--output', write_output,
                                          '--output-format', encoding, read_result.output_location))
                     self.__write_results.append(TestResult(ion_implementation.identifier, write_output, write_errors))
 
+    @property
+    def __stored_peers(self):
+        # The peers that tested this file in the baseline, and so have stored outputs for it.
+        return [peer for peer, report in sorted(six.iteritems(self.__peer_reports))
+                if report.result.text != TestReport.SKIPPED.text]
+
+    def __stored_reads(self):
+        stored_root = os.path.join(self.__baseline.results_root, str(self.__type), self.short_path)
+        results = []
+        for peer in self.__stored_peers:
+            read_output = os.path.join(stored_root, TestFile.READ_DATA_DIR, peer + ION_SUFFIX_BINARY)
+            if not os.path.isfile(read_output):
+                read_output = os.path.join(stored_root, TestFile.READ_DATA_DIR, peer + ION_SUFFIX_TEXT)
+            read_errors = os.path.join(stored_root, TestFile.READ_ERRORS_DIR, peer + ION_SUFFIX_TEXT)
+            if not os.path.isfile(read_output) and not os.path.isfile(read_errors):
+                raise ValueError("The baseline has no outputs of %s for %s; its artifacts must be kept alongside its "
+                                 "results file." % (peer, self.key))
+            results.append(TestResult(peer, read_output, read_errors))
+        return results
+
+    def __stored_writes(self):
+        stored_root = os.path.join(self.__baseline.results_root, str(self.__type), self.short_path)
+        peers = self.__stored_peers
+        results = []
+        for peer in peers:
+            for encoding in ('text', 'binary'):
+                suffix = ION_SUFFIX_TEXT if encoding == 'text' else ION_SUFFIX_BINARY
+                write_root = os.path.join(stored_root, TestFile.WRITE_DIR, peer, encoding)
+                written = set()
+                for results_dir in (TestFile.DATA_DIR, TestFile.ERRORS_DIR):
+                    if os.path.isdir(os.path.join(write_root, results_dir)):
+                        written.update(os.path.splitext(name)[0]
+                                       for name in os.listdir(os.path.join(write_root, results_dir)))
+                # Only the peers' EventStreams were re-written by the peers; the selected implementations' weren't.
+                for reader in sorted(written.intersection(peers)):
+                    results.append(TestResult(peer, os.path.join(write_root, TestFile.DATA_DIR, reader + suffix),
+                                              os.path.join(write_root, TestFile.ERRORS_DIR, reader + ION_SUFFIX_TEXT)))
+        return results
+
+    def __perf_with(self, ion_implementation, output_format, warmups, repetitions):
+        perf_root = os.path.join(TestFile.PERF_DIR, ion_implementation.identifier, output_format)
+        suffix = ION_SUFFIX_BINARY if output_format == 'binary' else ION_SUFFIX_TEXT
+        output = self.__new_results_file(ion_implementation.identifier + suffix, perf_root, TestFile.DATA_DIR)
+        report = self.__report[ion_implementation.identifier]
+        for n in range(warmups + repetitions):
+            short_name = '%d%s' % (n, ION_SUFFIX_TEXT)
+            errors = self.__new_results_file(short_name, perf_root, TestFile.ERRORS_DIR)
+            perf_report = self.__new_results_file(short_name, perf_root, TestFile.REPORT_DIR)
+            args = ('process', '--error-report', errors, '--output-format', output_format)
+            if output_format != 'none':
+                args += ('--output', output)
+            if n >= warmups:
+                args += ('--perf-report', perf_report)
+            process_result = self.__execute_with(ion_implementation, errors, TestFile.PERF_PHASE, args + (self.path,))
+            result = PerfResult(ion_implementation.identifier, output, perf_report, errors)
+            if result.has_errors:
+                # The vector can't be measured with this implementation; don't waste any more time on it.
+                report.perf_error(result)
+                return
+            if n >= warmups:
+                report.add_performance_sample(output_format, result, process_result.metrics,
+                                              self.size)
+
+    def perf(self, warmups, repetitions):
+        """
+        Measures the performance of each implementation reading this file and re-writing it in each of the
+        PERF_OUTPUT_FORMATS. The results are stored in, for example,
+        results/good/one.ion/perf/ion-c_abcd123/binary/report/3.ion, results/good/one.ion/perf/ion-c_abcd123/binary/
+        errors/3.ion, and results/good/one.ion/perf/ion-c_abcd123/binary/data/ion-c_abcd123.10n, where 3 is the index of
+        the invocation (including warmups).
+        """
+        if self.__type.is_bad:  # bad files can't be processed successfully, so there's nothing to measure.
+            return
+        for ion_implementation in self.__ion_implementations:
+            for output_format in PERF_OUTPUT_FORMATS:
+                self.__perf_with(ion_implementation, output_format, warmups, repetitions)
+                if self.__report[ion_implementation.identifier].has_failure:
+                    break
+
     def read(self):
         """
         Uses all implementations to read this file as an EventStream. The results are stored in, for example,
         results/good/one.ion/read/data/ion-c_abcd123.ion and results/good/one.ion/read/errors/ion-c_abcd123.ion.
+        With a baseline, the peers' stored EventStreams are added to those read.
         """
         for ion_implementation in self.__ion_implementations:
             self.__read_with(ion_implementation)
+        if self.__baseline is not None:
+            self.__read_results.extend(self.__stored_reads())
 
     def verify_reads(self):
         """
@@ -540,12 +1526,15 @@ class TestFile:
         results/good/one.ion/write/ion-c_abcd123/binary/data/ion-java_def4567.10n and
         results/good/one.ion/write/ion-c_abcd123/binary/errors/ion-java_def4567.ion (where ion-c_abcd123 is the
         implementation that performed the write, and ion-java_def4567 is the implementation that produced the initial
-        EventStream).
+        EventStream). With a baseline, the streams that the peers stored when re-writing each other's EventStreams are
+        added to those written.
         """
-        if self.__type.is_bad:  # bad files skip this phase.
+        if self.__type.is_bad or self.__traversal is not None:  # bad files and traversals skip this phase.
             return
         for ion_implementation in self.__ion_implementations:
             self.__write_with(ion_implementation)
+        if self.__baseline is not None:
+            self.__write_results.extend(self.__stored_writes())
 
     def verify_writes(self):
         """
@@ -555,65 +1544,281 @@ class TestFile:
         stored in, for example, results/good/one.ion/write_verify/report/ion-c_abcd123.ion and
         results/good/one.ion/write_verify/errors/ion-c_abcd123.ion.
         """
-        if self.__type.is_bad:  # bad files skip this phase.
-            return
-        self.__verify(self.__write_results, is_read=False)
+        if not self.__type.is_bad and self.__traversal is None:  # bad files and traversals skip this phase.
+            self.__verify(self.__write_results, is_read=False)
+        # The results have been recorded in the report; don't hold on to them (or their ErrorReports) until the run
+        # ends.
+        self.__read_results = []
+        self.__write_results = []
+
+    @property
+    def key(self):
+        """
+        Identifies this test file across runs, in the form used by the results: <test type>/<file name>.
+        """
+        return '%s/%s' % (self.__type, self.short_path)
+
+    @property
+    def test_type(self):
+        return self.__type
+
+    @property
+    def size(self):
+        if self.__size is None:
+            self.__size = os.path.getsize(self.path)
+        return self.__size
+
+    @property
+    def digest(self):
+        if self.__digest is None:
+            self.__digest = file_digest(self.path)
+        return self.__digest
+
+    @property
+    def invocation_seconds(self):
+        """
+        The total wall time of all of each implementation's invocations for this file. Key: implementation identifier,
+        value: seconds.
+        """
+        seconds = {}
+        for impl_id, report in six.iteritems(self.__report):
+            phases = report.metrics or {}
+            seconds[impl_id] = sum(totals[METRICS_WALL_TIME_FIELD] for totals in six.itervalues(phases))
+        return seconds
+
+    def skip(self):
+        """
+        Marks this file's tests as not having been run by any implementation.
+        """
+        for report in six.itervalues(self.__report):
+            report.skip()
+
+    @property
+    def failed_implementations(self):
+        """
+        The identifiers of the implementations for which this file's tests have failed.
+        """
+        return [impl_id for impl_id, report in six.iteritems(self.__report) if report.has_failure]
+
+    @property
+    def failures(self):
+        """
+        The fields under which the failures of each implementation that failed are recorded. Key: implementation
+        identifier, value: list of fields (e.g. read_error).
+        """
+        return {impl_id: report.failure_fields for impl_id, report in six.iteritems(self.__report)
+                if report.has_failure}
+
+    def discard_results(self):
+        """
+        Deletes the files written while testing this file, e.g. once a passing traversal has been counted.
+        """
+        shutil.rmtree(self.__results_root, ignore_errors=True)
 
     def add_results_to(self, results):
         """
-        Adds this TestFile's report to a master report that tracks results for all TestTypes.
+        Adds this TestFile's report, along with any peers' stored reports, to a master report that tracks results for
+        all TestTypes.
         """
-        results.setdefault(str(self.__type), {})[self.short_path] = self.__report
+        reports = self.__report
+        if self.__peer_reports:
+            reports = dict(self.__report)
+            reports.update(self.__peer_reports)
+        results.setdefault(str(self.__type), {})[self.short_path] = reports
 
 
-def generate_test_files(tests_dir, test_types, test_file_filter, results_root, ion_implementations):
+class TestManifest:
+    def __init__(self, tests_dir):
+        """
+        Index of the test vectors in an ion-tests directory: each vector's path relative to the directory for Ion 1.0,
+        the TestType of the directory that contains it, its size, and its `file_digest`. Installed ion-tests
+        directories are named for their commit (see `IonResource`), so the index is cached as Ion in a sibling file
+        named `<directory>_manifest.ion` and reused by later runs with the same commit instead of walking the tree.
+        Entries are in the form {path: "good/equivs/ints.ion", type: "equivs", size: 1234, digest: "ab12..."}.
+        """
+        version_test_dir = test_dir_from_version("1.0")
+        self.root = os.path.abspath(os.path.join(tests_dir, version_test_dir))
+        if not os.path.exists(self.root):
+            raise ValueError("Invalid ion-tests directory. Could not find test files.")
+        self.__location = os.path.abspath(tests_dir).rstrip(os.sep) + MANIFEST_SUFFIX
+        self.entries = self.__load()
+        if self.entries is None:
+            self.entries = self.__scan(version_test_dir)
+            self.__save()
+
+    def __load(self):
+        if not os.path.isfile(self.__location):
+            return None
+        manifest_in = FileIO(self.__location, mode='rb')
+        try:
+            values = simpleion.load(manifest_in, single_value=False)
+        except Exception:
+            return None  # e.g. truncated by an interrupted run; it is rebuilt.
+        finally:
+            manifest_in.close()
+        if len(values) == 0:
+            return None
+        return [{
+            'path': six.text_type(entry['path']),
+            'type': test_type_from_str(six.text_type(entry['type'])),
+            'size': int(entry['size']),
+            'digest': six.text_type(entry['digest'])
+        } for entry in values[0]]
+
+    def __scan(self, version_test_dir):
+        # Directories are classified by their path, most specific type first; see `generate_test_files`.
+        entries = []
+        for root, dirs, files in os.walk(self.root):
+            relative_root = os.path.relpath(root, self.root)
+            versioned_root = os.path.join(version_test_dir, relative_root)
+            if os.path.join(version_test_dir, str(TestType.GOOD)) in versioned_root:
+                if os.path.join(str(TestType.GOOD), str(TestType.EQUIVS)) in versioned_root:
+                    test_type = TestType.EQUIVS
+                elif os.path.join(str(TestType.GOOD), str(TestType.NON_EQUIVS)) in versioned_root:
+                    test_type = TestType.NON_EQUIVS
+                elif os.path.join(str(TestType.GOOD), 'timestamp', 'equivTimeline') in versioned_root:
+                    test_type = TestType.EQUIV_TIMELINE
+                else:
+                    test_type = TestType.GOOD
+            elif os.path.join(version_test_dir, str(TestType.BAD)) in versioned_root:
+                test_type = TestType.BAD
+            else:
+                continue
+            for test_file in files:
+                if not (test_file.endswith(ION_SUFFIX_TEXT) or test_file.endswith(ION_SUFFIX_BINARY)):
+                    continue
+                path = os.path.join(root, test_file)
+                entries.append({
+                    'path': os.path.relpath(path, self.root),
+                    'type': test_type,
+                    'size': os.path.getsize(path),
+                    'digest': file_digest(path)
+                })
+        return entries
+
+    def __save(self):
+        temp_location = self.__location + '.tmp'
+        manifest_out = FileIO(temp_location, mode='wb')
+        try:
+            simpleion.dump([dict(entry, type=str(entry['type'])) for entry in self.entries], manifest_out,
+                           binary=False)
+        finally:
+            manifest_out.close()
+        os.replace(temp_location, self.__location)
+
+
+class TestFileFilter:
+    def __init__(self, patterns):
+        """
+        Selects test files by path. A pattern that contains any of `*?[` is a glob that the end of a selected path
+        must match (e.g. equivs/*.10n; as with fnmatch, `*` matches across `/`); any other pattern is a suffix that a
+        selected path must end with (e.g. good/blobs.ion). Either must match whole path components, so one.ion doesn't
+        select good/bone.ion. No patterns selects all paths.
+        """
+        self.__patterns = list(patterns)
+        self.__suffixes = [pattern for pattern in patterns if not any(c in GLOB_CHARACTERS for c in pattern)]
+        self.__globs = [pattern for pattern in patterns if any(c in GLOB_CHARACTERS for c in pattern)]
+
+    def select(self, paths):
+        """
+        Returns the set of the given paths that are selected. Suffixes are resolved using the paths sorted by their
+        reversed characters (a flattened suffix trie), in which the paths ending with any given suffix are contiguous,
+        so each costs a binary search rather than a comparison with every path.
+        """
+        if not self.__suffixes and not self.__globs:
+            return set(paths)
+        reversed_paths = sorted(path[::-1] for path in paths)
+        selected = set()
+        for suffix in self.__suffixes:
+            reversed_suffix = suffix[::-1]
+            i = bisect.bisect_left(reversed_paths, reversed_suffix)
+            while i < len(reversed_paths) and reversed_paths[i].startswith(reversed_suffix):
+                if len(reversed_paths[i]) == len(suffix) or reversed_paths[i][len(suffix)] == os.sep:
+                    selected.add(reversed_paths[i][::-1])
+                i += 1
+        if self.__globs:
+            for path in paths:
+                if path not in selected and any(fnmatchcase(path, glob) or fnmatchcase(path, '*' + os.sep + glob)
+                                                for glob in self.__globs):
+                    selected.add(path)
+        return selected
+
+    def unmatched(self, paths):
+        """
+        Returns the patterns that select none of the given paths, in the order they were given.
+        """
+        return [pattern for pattern in self.__patterns if not TestFileFilter([pattern]).select(paths)]
+
+
+def generate_test_files(tests_dir, test_types, test_file_filter, results_root, ion_implementations, baseline=None):
     """
-    Walks the given `tests_dir`, classifying and filtering the files therein based on the directory structure.
+    Classifies and filters the files in the given `tests_dir` based on the directory structure, using its
+    TestManifest. Files in the equivs, non-equivs, and equivTimeline directories are tested as good files when their
+    own type isn't selected but `good` is.
     :param tests_dir: Root of the ion-tests directory.
     :param test_types: Collection of TestType to filter the files on.
-    :param test_file_filter: Collection of filename suffixes (e.g. good/blobs.ion) to whitelist.
+    :param test_file_filter: Collection of filename suffixes (e.g. good/blobs.ion) or glob patterns (e.g.
+        good/equivs/*.10n) to whitelist; see `TestFileFilter`.
     :param results_root: Root of the results to be generated by the tests.
     :param ion_implementations: Collection of implementations to test
-    :return: Each TestFile as it is found.
+    :param baseline: If provided, the Baseline whose peers are verified along with the implementations.
+    :return: Each TestFile, in the order the files were found.
+    """
+    manifest = TestManifest(tests_dir)
+    # Filters apply to paths within ion-tests, so that globs can't match the directory it was installed in.
+    version_test_dir = os.path.basename(manifest.root)
+    paths = [os.path.join(version_test_dir, entry['path']) for entry in manifest.entries]
+    test_file_filter = TestFileFilter(test_file_filter)
+    selected = test_file_filter.select(paths)
+    unmatched = test_file_filter.unmatched(selected)
+    if unmatched:
+        raise ValueError("No test files match %s. Patterns are matched against paths within ion-tests, such as %s."
+                         % (', '.join(unmatched), os.path.join(version_test_dir, 'good', 'blobs.ion')))
+    for entry, path in zip(manifest.entries, paths):
+        if path not in selected:
+            continue
+        path = os.path.join(manifest.root, entry['path'])
+        test_type = entry['type']
+        if test_type.is_good and test_type not in test_types:
+            test_type = TestType.GOOD
+        if test_type in test_types:
+            yield TestFile(test_type, path, results_root, ion_implementations, entry['size'], entry['digest'],
+                           baseline=baseline)
+
+
+def results_file_sibling(results_file, suffix):
+    """
+    Derives the path of an auxiliary Ion file that accompanies the given results file, e.g. `results_raw.ion` for
+    `results.ion` and the suffix `_raw`.
+    """
+    if '.' in results_file:
+        return results_file[0:results_file.rfind('.')] + suffix + ION_SUFFIX_TEXT
+    return results_file + suffix + ION_SUFFIX_TEXT
+
+
+def dump_text(value):
+    """
+    Serializes the given value as Ion text, without a version marker, so that it may be embedded in a larger stream.
+    """
+    text = simpleion.dumps(value, binary=False, omit_version_marker=True)
+    return text if isinstance(text, bytes) else text.encode('utf-8')
+
+
+def dump_results(results, results_out):
     """
-    def filter_files(test_type):
-        for test_file in files:
-            if not (test_file.endswith(ION_SUFFIX_TEXT) or test_file.endswith(ION_SUFFIX_BINARY)):
-                continue
-            full_test_file = os.path.join(root, test_file)
-            if len(test_file_filter) != 0:
-                found = False
-                for filter_matcher in test_file_filter:
-                    if full_test_file.endswith(filter_matcher):
-                        found = True
-                        break
-                if not found:
-                    continue
-            yield TestFile(test_type, full_test_file, results_root, ion_implementations)
-
-    version_test_dir = test_dir_from_version("1.0")
-    test_file_root = os.path.abspath(os.path.join(tests_dir, version_test_dir))
-    if not os.path.exists(test_file_root):
-        raise ValueError("Invalid ion-tests directory. Could not find test files.")
-    for root, dirs, files in os.walk(test_file_root):
-        if os.path.join(version_test_dir, str(TestType.GOOD)) in root:
-            if os.path.join(str(TestType.GOOD), str(TestType.EQUIVS)) in root and TestType.EQUIVS in test_types:
-                for equivs_file in filter_files(TestType.EQUIVS):
-                    yield equivs_file
-            elif os.path.join(str(TestType.GOOD), str(TestType.NON_EQUIVS)) in root \
-                    and TestType.NON_EQUIVS in test_types:
-                for nonequivs_file in filter_files(TestType.NON_EQUIVS):
-                    yield nonequivs_file
-            elif os.path.join(str(TestType.GOOD), 'timestamp', 'equivTimeline') in root \
-                    and TestType.EQUIV_TIMELINE in test_types:
-                for equiv_timeline_file in filter_files(TestType.EQUIV_TIMELINE):
-                    yield equiv_timeline_file
-            elif TestType.GOOD in test_types:
-                for good_file in filter_files(TestType.GOOD):
-                    yield good_file
-        elif os.path.join(version_test_dir, str(TestType.BAD)) in root and TestType.BAD in test_types:
-            for bad_file in filter_files(TestType.BAD):
-                yield bad_file
+    Writes the given results (see `write_results`) as Ion text, building only one test file's reports at a time.
+    """
+    def field_name(name):
+        return dump_text(IonPySymbol.from_value(IonType.SYMBOL, name)) + b':'
+
+    results_out.write(b'$ion_1_0 {')
+    for i, (test_type, test_files) in enumerate(six.iteritems(results)):
+        results_out.write((b',' if i else b'') + field_name(test_type) + b'{')
+        for j, (test_file, reports) in enumerate(six.iteritems(test_files)):
+            reports = {impl_id: report.to_ion() for impl_id, report in six.iteritems(reports)}
+            results_out.write((b',' if j else b'') + field_name(test_file) + dump_text(reports))
+        results_out.write(b'}')
+    results_out.write(b'}')
 
 
 def write_results(results, results_file, impls):
@@ -632,6 +1837,12 @@ def write_results(results, results_file, impls):
             'test_file_2.ion': {
                 'ion-c_abcd123': {
                     result: FAIL,
+                    metrics: {
+                        read: {invocations: 1, wall_time: 0.012, user_time: 0.004, system_time: 0.002,
+                               max_rss: 4321280},
+                        read_verify: {invocations: 1, wall_time: 0.015, user_time: 0.006, system_time: 0.002,
+                                      max_rss: 4734976}
+                    },
                     read_error: ErrorReport::[{
                         error_type: READ,
                         message: "ion_reader_text.c:999 Line 1 index 3: Repeated underscore in numeric value.",
@@ -699,39 +1910,951 @@ def write_results(results, results_file, impls):
             }
         }
     }
+    In --perf mode, each implementation's report instead contains a `performance` field that maps each output format to
+    the measured samples, e.g.
+        performance: {
+            binary: [{wall_time: 0.05, max_rss: 4321280, input_size: 1234, report: PerformanceReport::{...}}]
+        }
+    and failures to process the vector are reported in a `perf_error` field.
+    Test files that weren't tested because the run's time budget was exhausted have the result SKIPPED for every
+    implementation.
     """
     # NOTE: A lot of this is a hack necessitated by the fact that ion-python does not yet support pretty-printing Ion
     # text. Once it does, the only thing this method needs to do is 'dump' to results_file with pretty-printing enabled.
-    if '.' in results_file:
-        results_file_raw = results_file[0:results_file.rfind('.')] + '_raw.ion'
-    else:
-        results_file_raw = results_file + '_raw.ion'
+    results_file_raw = results_file_sibling(results_file, '_raw')
     results_out = FileIO(results_file_raw, mode='wb')
     try:
-        simpleion.dump(results, results_out, binary=False)
+        dump_results(results, results_out)
     finally:
         results_out.close()
-    ionc = list(filter(lambda x: 'ion-c' in x.identifier, impls))[0]
-    ionc.execute('process', '--output', results_file, results_file_raw)
+    ionc = list(filter(lambda x: 'ion-c' in x.identifier, impls))
+    if ionc:
+        ionc[0].execute('process', '--output', results_file, results_file_raw)
+    else:
+        shutil.copyfile(results_file_raw, results_file)  # There's no implementation to pretty-print with.
+
+
+PHASES = (TestFile.READ_PHASE, TestFile.READ_VERIFY_PHASE, TestFile.WRITE_PHASE, TestFile.WRITE_VERIFY_PHASE,
+          TestFile.PERF_PHASE)
+
+# Driver phases that don't invoke the implementations on test files, timed only by --profile.
+DISCOVER_PHASE = 'discover'
+RESULTS_PHASE = 'results'
+PROFILE_PHASES = (DISCOVER_PHASE,) + PHASES + (RESULTS_PHASE,)
+PROFILE_SUFFIX = '.prof'
+PROFILE_FUNCTIONS_SHOWN = 25
+
+
+def summarize_metrics(results):
+    """
+    Aggregates the per-phase resource totals recorded in each TestReport by implementation and phase.
+    :param results: The master report populated by `TestFile.add_results_to`.
+    :return: A dict of the form {impl_id: {phase: totals}}.
+    """
+    summary = {}
+    for test_files in six.itervalues(results):
+        for reports in six.itervalues(test_files):
+            for impl_id, report in six.iteritems(reports):
+                for phase, totals in six.iteritems(report.metrics or {}):
+                    impl_summary = summary.setdefault(impl_id, {})
+                    merge_metrics_totals(impl_summary.setdefault(phase, new_metrics_totals()), totals)
+    return summary
+
+
+def write_metrics_summary(summary, metrics_file):
+    """
+    Writes the output of `summarize_metrics` to `metrics_file` and prints it as a table.
+    """
+    metrics_out = FileIO(metrics_file, mode='wb')
+    try:
+        simpleion.dump(summary, metrics_out, binary=False)
+    finally:
+        metrics_out.close()
+
+    def fmt(value, scale=1.0):
+        return '-' if value is None else '%.2f' % (value / scale)
+
+    print('%-24s %-13s %11s %10s %10s %10s %13s' % ('implementation', 'phase', 'invocations', 'wall (s)', 'user (s)',
+                                                    'system (s)', 'max rss (MB)'))
+    for impl_id in sorted(summary.keys()):
+        for phase in PHASES:
+            totals = summary[impl_id].get(phase)
+            if totals is None:
+                continue
+            print('%-24s %-13s %11d %10s %10s %10s %13s' % (
+                impl_id, phase, totals[METRICS_INVOCATIONS_FIELD], fmt(totals[METRICS_WALL_TIME_FIELD]),
+                fmt(totals.get(METRICS_USER_TIME_FIELD)), fmt(totals.get(METRICS_SYSTEM_TIME_FIELD)),
+                fmt(totals.get(METRICS_MAX_RSS_FIELD), 1024 * 1024)
+            ))
+
+
+def summarize_performance(results):
+    """
+    Condenses the PerformanceReports recorded by the --perf mode into one row per vector, implementation, and output
+    format. Each row holds the medians over the measured repetitions. Throughput is computed from the
+    implementation-reported elapsed time when available, and from the driver-measured wall time (which includes process
+    startup) otherwise.
+    :param results: The master report populated by `TestFile.add_results_to`.
+    :return: A list of rows, each a dict suitable for serialization as an Ion struct.
+    """
+    rows = []
+    for test_type in sorted(results.keys()):
+        for test_file in sorted(results[test_type].keys()):
+            for impl_id, report in sorted(six.iteritems(results[test_type][test_file])):
+                performance = report.performance or {}
+                for output_format in PERF_OUTPUT_FORMATS:
+                    samples = performance.get(output_format)
+                    if not samples:
+                        continue
+                    row = {
+                        'vector': os.path.join(test_type, test_file),
+                        'implementation': impl_id,
+                        'output_format': output_format,
+                        'repetitions': len(samples),
+                        METRICS_WALL_TIME_FIELD: statistics.median([s[METRICS_WALL_TIME_FIELD] for s in samples])
+                    }
+                    max_rss = [s[METRICS_MAX_RSS_FIELD] for s in samples if METRICS_MAX_RSS_FIELD in s]
+                    if max_rss:
+                        row[METRICS_MAX_RSS_FIELD] = int(statistics.median(max_rss))
+                    elapsed = row[METRICS_WALL_TIME_FIELD]
+                    reports = [s[TestReport.PERFORMANCE_REPORT_FIELD] for s in samples
+                               if TestReport.PERFORMANCE_REPORT_FIELD in s]
+                    row[TestReport.INPUT_SIZE_FIELD] = samples[0][TestReport.INPUT_SIZE_FIELD]
+                    # Every field of a PerformanceReport is optional; summarize only those that were reported.
+                    output_sizes = [r['output'].get('size') for r in reports if r.get('output') is not None]
+                    output_sizes = [size for size in output_sizes if size is not None]
+                    if output_sizes:
+                        row['output_size'] = output_sizes[0]
+                    elapsed_times = [r['elapsed_time'] for r in reports if r.get('elapsed_time') is not None]
+                    if elapsed_times:
+                        row['elapsed_time'] = statistics.median(elapsed_times)
+                        elapsed = row['elapsed_time'] * PERF_ELAPSED_TIME_UNIT
+                    memory_usages = [r['memory_usage'] for r in reports if r.get('memory_usage') is not None]
+                    if memory_usages:
+                        row['memory_usage'] = int(statistics.median(memory_usages))
+                    if elapsed > 0:
+                        row['throughput'] = row[TestReport.INPUT_SIZE_FIELD] / elapsed / (1024 * 1024)
+                    rows.append(row)
+    return rows
+
+
+def write_performance_table(rows, perf_file):
+    """
+    Writes the output of `summarize_performance` to `perf_file` and prints the aggregate throughput of each
+    implementation for each output format.
+    """
+    perf_out = FileIO(perf_file, mode='wb')
+    try:
+        simpleion.dump(rows, perf_out, binary=False, sequence_as_stream=True)
+    finally:
+        perf_out.close()
+    totals = {}
+    for row in rows:
+        total = totals.setdefault((row['implementation'], row['output_format']), [0, 0.0, 0])
+        if 'throughput' in row:
+            total[0] += row[TestReport.INPUT_SIZE_FIELD]
+            total[1] += row[TestReport.INPUT_SIZE_FIELD] / row['throughput'] / (1024 * 1024)
+        total[2] = max(total[2], row.get('memory_usage', row.get(METRICS_MAX_RSS_FIELD, 0)))
+    print('%-24s %-13s %17s %13s' % ('implementation', 'output format', 'throughput (MB/s)', 'peak (MB)'))
+    for (impl_id, output_format), (size, elapsed, peak) in sorted(six.iteritems(totals)):
+        throughput = '-' if elapsed == 0 else '%.2f' % (size / elapsed / (1024 * 1024))
+        print('%-24s %-13s %17s %13.2f' % (impl_id, output_format, throughput, peak / (1024 * 1024)))
+
+
+class CostHistory:
+    def __init__(self, location):
+        """
+        The cost of testing each test file with each implementation, as recorded by previous runs, which is used to
+        schedule the test files. Stored as Ion at `location`, in the form
+        {'good/blobs.ion': {size: 1234, digest: "ab12", costs: {'ion-c': 0.21, 'ion-java': 1.75}, failed: ['ion-c']}},
+        where each cost is the smoothed total wall time, in seconds, of the implementation's invocations for the file,
+        digest is the SHA-1 of the file's contents, and failed lists the implementations that failed the file the last
+        time it was tested. Implementations are identified by name rather than revision, since costs rarely change much
+        between revisions.
+        """
+        self.__location = location
+        self.__entries = self.__load()
+        self.__updates = {}
+        self.__fits = {}
+
+    def __load(self):
+        if not os.path.isfile(self.__location):
+            return {}
+        history_in = FileIO(self.__location, mode='rb')
+        try:
+            values = simpleion.load(history_in, single_value=False)
+        finally:
+            history_in.close()
+        if len(values) == 0:
+            return {}
+        return {six.text_type(key): {
+            'size': int(entry['size']),
+            'digest': six.text_type(entry.get('digest', '')),
+            'costs': {six.text_type(name): float(cost) for name, cost in six.iteritems(entry['costs'])},
+            'failed': [six.text_type(name) for name in entry.get('failed', [])]
+        } for key, entry in six.iteritems(values[0])}
+
+    def __fit(self, impl_name):
+        # Fits the cost of files without history to their size, using the files that do have history.
+        if impl_name not in self.__fits:
+            points = [(entry['size'], entry['costs'][impl_name]) for entry in six.itervalues(self.__entries)
+                      if impl_name in entry['costs']]
+            fit = fit_line(points)
+            if fit is None:
+                fit = (COST_ESTIMATE_DEFAULTS['per_file'], COST_ESTIMATE_DEFAULTS['per_byte'])
+            self.__fits[impl_name] = (max(fit[0], 0.0), max(fit[1], 0.0))
+        return self.__fits[impl_name]
+
+    def is_priority(self, test_file):
+        """
+        Determines whether the given test file should be tested before the others: because it is new or has changed
+        since it was last tested, or because any implementation failed it the last time.
+        """
+        entry = self.__entries.get(test_file.key)
+        return entry is None or len(entry['failed']) != 0 or entry['digest'] != test_file.digest
+
+    def covers(self, test_file, ion_implementations):
+        """
+        Determines whether a cost has been recorded for testing the given file with each of the given implementations.
+        """
+        entry = self.__entries.get(test_file.key)
+        return entry is not None and all(impl.name in entry['costs'] for impl in ion_implementations)
+
+    def estimate(self, test_file, ion_implementations):
+        """
+        Estimates the number of seconds that the given implementations will spend testing the given file.
+        """
+        entry = self.__entries.get(test_file.key)
+        size = test_file.size
+        estimate = 0.0
+        for ion_implementation in ion_implementations:
+            if entry is not None and ion_implementation.name in entry['costs']:
+                estimate += entry['costs'][ion_implementation.name]
+            else:
+                per_file, per_byte = self.__fit(ion_implementation.name)
+                estimate += per_file + per_byte * size
+        return estimate
+
+    def record(self, test_file, ion_implementations):
+        """
+        Records the costs measured for a completed test file.
+        """
+        previous = self.__entries.get(test_file.key, {'costs': {}})['costs']
+        costs = dict(self.__updates.get(test_file.key, {'costs': {}})['costs'])
+        measured = test_file.invocation_seconds
+        for ion_implementation in ion_implementations:
+            seconds = measured.get(ion_implementation.identifier)
+            if not seconds:
+                continue
+            name = ion_implementation.name
+            if name in previous:
+                seconds = HISTORY_SMOOTHING * seconds + (1 - HISTORY_SMOOTHING) * previous[name]
+            costs[name] = seconds
+        failed = test_file.failed_implementations
+        self.__updates[test_file.key] = {
+            'size': test_file.size,
+            'digest': test_file.digest,
+            'costs': costs,
+            'failed': sorted(i.name for i in ion_implementations if i.identifier in failed)
+        }
+
+    def save(self):
+        """
+        Writes the recorded costs. Entries written by other runs since this history was loaded (e.g. by other shards)
+        are preserved unless this run has also recorded them.
+        """
+        if not self.__updates:
+            return
+        entries = self.__load()
+        for key, update in six.iteritems(self.__updates):
+            entry = entries.setdefault(key, {'costs': {}})
+            entry['size'] = update['size']
+            entry['digest'] = update['digest']
+            entry['costs'].update(update['costs'])
+            entry['failed'] = update['failed']
+        temp_location = self.__location + '.tmp'
+        history_out = FileIO(temp_location, mode='wb')
+        try:
+            simpleion.dump(entries, history_out, binary=False)
+        finally:
+            history_out.close()
+        os.replace(temp_location, self.__location)
+
+
+def file_digest(path):
+    """
+    Computes the SHA-1 digest of the given file's contents, as a hex string.
+    """
+    digest = hashlib.sha1()
+    digest_in = FileIO(path, mode='rb')
+    try:
+        digest.update(digest_in.read())
+    finally:
+        digest_in.close()
+    return digest.hexdigest()
+
+
+def schedule_test_files(test_files, history, ion_implementations):
+    """
+    Orders the given test files so that those that failed last time or have changed since (see
+    `CostHistory.is_priority`) go first, for the fastest feedback. Within each group, the files are ordered by
+    estimated cost, most expensive first, so that the files that would otherwise make up the tail of the run are
+    started as early as possible.
+    :return: a list of tuples (test_file, estimated seconds).
+    """
+    estimates = [(test_file, history.estimate(test_file, ion_implementations), history.is_priority(test_file))
+                 for test_file in test_files]
+    estimates.sort(key=lambda estimate: (not estimate[2], -estimate[1], estimate[0].key))
+    return [(test_file, estimate) for test_file, estimate, _ in estimates]
+
+
+def select_shard(scheduled, index, count):
+    """
+    Partitions scheduled test files into `count` shards of approximately equal estimated cost by assigning each file,
+    most expensive first, to the shard with the least cost so far.
+    :param scheduled: The output of `schedule_test_files`.
+    :param index: The 1-based index of the shard to select.
+    :return: the selected shard's part of `scheduled`, in the same order.
+    """
+    loads = [0.0] * count
+    selected = []
+    for test_file, estimate in scheduled:
+        shard = loads.index(min(loads))
+        loads[shard] += estimate
+        if shard == index - 1:
+            selected.append((test_file, estimate))
+    return selected
+
+
+def parse_shard(description):
+    """
+    Parses a shard description of the form <index>/<count>, where index is between 1 and count.
+    :return: a tuple (index, count).
+    """
+    try:
+        index, count = [int(component) for component in description.split('/')]
+    except ValueError:
+        raise ValueError('Invalid shard %s; expected <index>/<count>.' % description)
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError('Invalid shard %s; index must be between 1 and count.' % description)
+    return index, count
+
+
+def run_test_file(test_file, perf):
+    """
+    Runs every phase of testing (or, if `perf` is provided, measuring) the given test file.
+    :return: the test file.
+    """
+    if perf is not None:
+        with PHASE_TIMER.phase(TestFile.PERF_PHASE):
+            test_file.perf(*perf)
+    else:
+        with PHASE_TIMER.phase(TestFile.READ_PHASE):
+            test_file.read()
+        with PHASE_TIMER.phase(TestFile.READ_VERIFY_PHASE):
+            test_file.verify_reads()
+        with PHASE_TIMER.phase(TestFile.WRITE_PHASE):
+            test_file.write()
+        with PHASE_TIMER.phase(TestFile.WRITE_VERIFY_PHASE):
+            test_file.verify_writes()
+    return test_file
+
+
+def run_test_files(test_files, perf, jobs, budget_end=None, run=run_test_file):
+    """
+    Runs the given test files, in order, `jobs` at a time.
+    :param budget_end: If provided, the monotonic time after which no more test files are started. Those in progress
+        run to completion.
+    :param run: The function that runs each test file (given the file and `perf`) and returns it. The workers are
+        reused for every file.
+    :return: an iterator over the test files as they complete. If the run's deadline passes, the files that were in
+        progress (and any that hadn't started) are left out, and DeadlineExceeded is raised once the iterator is
+        exhausted.
+    """
+    if jobs == 1:
+        for test_file in test_files:
+            if budget_end is not None and time.monotonic() >= budget_end:
+                return
+            yield run(test_file, perf)
+        return
+    deadline_exceeded = False
+    pending = iter(test_files)
+    running = set()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            while True:
+                # Files are submitted only as workers free up so that the time budget can stop the schedule.
+                while len(running) < jobs and not deadline_exceeded and \
+                        (budget_end is None or time.monotonic() < budget_end):
+                    test_file = next(pending, None)
+                    if test_file is None:
+                        break
+                    running.add(executor.submit(run, test_file, perf))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        test_file = future.result()
+                    except DeadlineExceeded:
+                        deadline_exceeded = True
+                        continue
+                    yield test_file
+        finally:
+            for future in running:
+                future.cancel()
+    if deadline_exceeded:
+        raise DeadlineExceeded()
 
 
-def test_all(impls, tests_dir, test_types, test_file_filter, results_root, results_file):
+def write_profile(profiler, profile_location, summary_location):
+    """
+    Writes the --profile artifacts: the cProfile statistics, which can be opened with `pstats` or any viewer that reads
+    its format (e.g. snakeviz), and an Ion summary of the driver's time in each phase, split into time spent waiting on
+    implementations and time spent in the driver itself. Both are also printed as tables.
+    """
+    profiler.dump_stats(profile_location)
+    summary = []
+    phases = PHASE_TIMER.phases
+    for phase in PROFILE_PHASES:
+        if phase in phases:
+            totals = phases[phase]
+            summary.append({
+                'phase': phase,
+                'entries': totals['entries'],
+                'elapsed': totals['elapsed'],
+                'child_wait': totals['child_wait'],
+                'driver': max(totals['elapsed'] - totals['child_wait'], 0.0)
+            })
+    summary_out = FileIO(summary_location, mode='wb')
+    try:
+        simpleion.dump(summary, summary_out, binary=False, sequence_as_stream=True)
+    finally:
+        summary_out.close()
+    print('%-13s %8s %12s %15s %11s %8s' % ('phase', 'entries', 'elapsed (s)', 'child wait (s)', 'driver (s)',
+                                           'driver %'))
+    for row in summary:
+        print('%-13s %8d %12.3f %15.3f %11.3f %7.1f%%' % (
+            row['phase'], row['entries'], row['elapsed'], row['child_wait'], row['driver'],
+            100.0 * row['driver'] / row['elapsed'] if row['elapsed'] > 0 else 0.0
+        ))
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('tottime').print_stats(PROFILE_FUNCTIONS_SHOWN)
+
+
+def test_all(impls, tests_dir, test_types, test_file_filter, results_root, results_file, perf=None, profile=False,
+             history_location=None, jobs=1, shard=None, time_budget=None, baseline=None):
     """
     Locates all ion-tests files in the given location that match the given types and filter, tests them with all of the
     given implementations, and writes the test results in the location described by results_root/results_file.
+    :param perf: If provided, a tuple (warmups, repetitions). Instead of testing for consensus, the files are used to
+        measure the implementations' performance (see `TestFile.perf`).
+    :param profile: If True, the driver profiles itself and writes the artifacts described by `write_profile` alongside
+        the results.
+    :param history_location: The CostHistory used to order the test files longest-first, which is updated with the
+        costs measured by this run. If None, the test files are run in the order they are found.
+    :param jobs: The number of test files to test concurrently.
+    :param shard: If provided, a tuple (index, count). Only the index-th of count shards of the test files, balanced
+        by estimated cost, is tested. All shards must share the same history to partition the files consistently, so
+        the history isn't updated.
+    :param time_budget: If provided, the number of seconds after which no more test files are started. Files that
+        weren't started are reported as SKIPPED.
+    :param baseline: If provided, the Baseline whose stored outputs are verified along with those of the
+        implementations, and whose reports are included in the results (see --baseline).
     """
+    profiler = None
+    if profile:
+        PHASE_TIMER.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
     print('Running tests.', end='', flush=True)
     results = {}
-    for test_file in generate_test_files(tests_dir, test_types, test_file_filter, results_root, impls):
-        test_file.read()
-        test_file.verify_reads()
-        test_file.write()
-        test_file.verify_writes()
-        test_file.add_results_to(results)
-        print('.', end='', flush=True)
+    tested = 0
+    history = None
+    test_files = []
+    tested_files = set()
+    try:
+        test_files = list(timed_iteration(generate_test_files(tests_dir, test_types, test_file_filter, results_root,
+                                                              impls, baseline), DISCOVER_PHASE))
+        if history_location is not None:
+            history = CostHistory(history_location)
+            scheduled = schedule_test_files(test_files, history, impls)
+            if shard is not None:
+                scheduled = select_shard(scheduled, *shard)
+            test_files = [test_file for test_file, _ in scheduled]
+        RUN_MONITOR.begin(len(test_files))
+        budget_end = None if time_budget is None else time.monotonic() + time_budget
+        tested_files = set()
+        for test_file in run_test_files(test_files, perf, jobs, budget_end):
+            tested_files.add(test_file.path)
+            with PHASE_TIMER.phase(RESULTS_PHASE):
+                test_file.add_results_to(results)
+                if history is not None and perf is None and shard is None:
+                    history.record(test_file, impls)
+            tested += 1
+            RUN_MONITOR.file_finished(test_file.path, test_file.failed_implementations)
+            print('.', end='', flush=True)
+        complete = True
+    except DeadlineExceeded:
+        # The test file in progress is incomplete and is left out of the results.
+        complete = False
+        EXECUTION_LIMITS['deadline'] = None  # Allow the results to be written.
+    skipped = 0
+    if complete:
+        for test_file in test_files:
+            if test_file.path not in tested_files:
+                test_file.skip()
+                test_file.add_results_to(results)
+                skipped += 1
+    RUN_MONITOR.end(complete and skipped == 0)
+    if history is not None:
+        history.save()
+    results_location = os.path.join(results_root, results_file)
+    with PHASE_TIMER.phase(RESULTS_PHASE):
+        write_results(results, results_location, impls)
+        if complete and skipped != 0:
+            print('\nTime budget exhausted after %d test files; %d skipped. Results written to %s.'
+                  % (tested, skipped, results_location))
+        elif complete:
+            print('\nTests complete. Results written to %s.' % results_location)
+        else:
+            print('\nDeadline reached after %d test files. Partial results written to %s.'
+                  % (tested, results_location))
+        metrics_location = results_file_sibling(results_location, '_metrics')
+        write_metrics_summary(summarize_metrics(results), metrics_location)
+        print('Resource usage summary written to %s.' % metrics_location)
+        if ISOLATION.description:
+            isolation_location = results_file_sibling(results_location, '_isolation')
+            isolation_out = FileIO(isolation_location, mode='wb')
+            try:
+                simpleion.dump(ISOLATION.description, isolation_out, binary=False)
+            finally:
+                isolation_out.close()
+            print('Process isolation applied to the run written to %s.' % isolation_location)
+        if perf is not None:
+            perf_location = results_file_sibling(results_location, '_perf')
+            write_performance_table(summarize_performance(results), perf_location)
+            print('Performance table written to %s.' % perf_location)
+    if profiler is not None:
+        profiler.disable()
+        PHASE_TIMER.stop()
+        summary_location = results_file_sibling(results_location, '_profile')
+        profile_location = summary_location[0:summary_location.rfind('.')] + PROFILE_SUFFIX
+        write_profile(profiler, profile_location, summary_location)
+        print('Driver profile written to %s; per-phase summary written to %s.' % (profile_location, summary_location))
+
+
+def plan_test_file(test_file, impl_count, perf=None, event_output_format=EVENTS_OUTPUT_FORMAT_TEXT):
+    """
+    Determines what testing the given file would do if every implementation passed it: the invocations of the
+    implementations in each phase, and the artifacts that they would write. Sizes are estimated using
+    `PLAN_OUTPUT_SIZE_RATIOS`. Failures change the plan: failing reads skip the write phases, and errors and
+    disagreements write ErrorReports and non-empty ComparisonReports.
+    :param impl_count: The number of implementations to be tested.
+    :param perf: If provided, a tuple (warmups, repetitions); see `TestFile.perf`.
+    :param event_output_format: The `--output-format` with which the implementations write EventStreams.
+    :return: a dict. Key: phase, value: a list [invocations, artifacts, bytes].
+    """
+    plan = {}
+    test_type = test_file.test_type
+
+    def verify(input_count):
+        # As in TestFile.__verify, given that the pre-filter (if any) finds the inputs equivalent.
+        agreed = prefilter_applies(test_type, input_count)
+        basic = sum(1 for i in range(impl_count) if compares_basic(i, agreed))
+        typed = 0 if test_type.compare_type == 'basic' else impl_count
+        # Each comparing implementation writes an (empty) ComparisonReport.
+        return [basic + typed, impl_count if typed else basic, 0]
+
+    if test_type.is_bad:
+        # Every implementation should fail to read the file; the partial EventStreams that they write before failing
+        # are compared, but nothing is written or measured.
+        if perf is None:
+            plan[TestFile.READ_PHASE] = [impl_count, impl_count, impl_count * PLAN_REPORT_BYTES]
+            plan[TestFile.READ_VERIFY_PHASE] = verify(impl_count)
+        return plan
+    _, suffix = os.path.splitext(test_file.path)
+    ratios = PLAN_OUTPUT_SIZE_RATIOS.get(suffix, PLAN_OUTPUT_SIZE_RATIOS[ION_SUFFIX_TEXT])
+    if perf is not None:
+        warmups, repetitions = perf
+        invocations = artifacts = size = 0
+        for output_format in PERF_OUTPUT_FORMATS:
+            invocations += warmups + repetitions
+            artifacts += repetitions
+            size += repetitions * PLAN_REPORT_BYTES
+            if output_format != 'none':
+                artifacts += 1  # Overwritten by each invocation.
+                size += test_file.size * ratios[output_format]
+        plan[TestFile.PERF_PHASE] = [impl_count * invocations, impl_count * artifacts, impl_count * size]
+        return plan
+    plan[TestFile.READ_PHASE] = [impl_count, impl_count, impl_count * test_file.size * ratios[event_output_format]]
+    # The original file is compared along with the EventStreams.
+    plan[TestFile.READ_VERIFY_PHASE] = verify(impl_count + 1)
+    # Each implementation re-writes each implementation's EventStream as text and as binary.
+    writes = impl_count * impl_count
+    plan[TestFile.WRITE_PHASE] = [2 * writes, 2 * writes, writes * test_file.size * (ratios['text'] + ratios['binary'])]
+    plan[TestFile.WRITE_VERIFY_PHASE] = verify(2 * writes + 1)
+    return plan
+
+
+def estimate_wall_time(estimates, jobs):
+    """
+    Simulates running test files with the given estimated costs, in order, `jobs` at a time, as `run_test_files` does.
+    :param estimates: The estimated seconds of each test file, in the order that they would be started.
+    :return: the estimated number of seconds until the last test file completes.
+    """
+    workers = [0.0] * min(jobs, max(len(estimates), 1))
+    for estimate in estimates:
+        heapq.heappush(workers, heapq.heappop(workers) + estimate)
+    return max(workers)
+
+
+def plan_all(impls, tests_dir, test_types, test_file_filter, results_root, history_location=None, jobs=1, shard=None,
+             perf=None, event_output_format=EVENTS_OUTPUT_FORMAT_TEXT):
+    """
+    Prints what `test_all` would do with the same arguments, without installing or invoking the implementations: the
+    test files, the invocations and artifacts of each phase (see `plan_test_file`), and the estimated wall time, given
+    the recorded costs in the history and `jobs`. The wall time is also estimated for each of `PLAN_SHARD_COUNTS`
+    shards, to help choose a shard count.
+    :param impls: The IonImplementations to be tested, which needn't be installed.
+    """
+    history = CostHistory(history_location) if history_location is not None else CostHistory(os.devnull)
+    test_files = list(generate_test_files(tests_dir, test_types, test_file_filter, results_root, []))
+    scheduled = schedule_test_files(test_files, history, impls)
+    if history_location is None:
+        # Run in the order found.
+        order = {test_file.key: i for i, test_file in enumerate(test_files)}
+        scheduled.sort(key=lambda item: order[item[0].key])
+    shards = {count: [select_shard(scheduled, index, count) for index in range(1, count + 1)]
+              for count in PLAN_SHARD_COUNTS if count <= max(len(scheduled), 1)}
+    if shard is not None:
+        scheduled = select_shard(scheduled, *shard)
+    phases = [TestFile.PERF_PHASE] if perf is not None else \
+        [TestFile.READ_PHASE, TestFile.READ_VERIFY_PHASE, TestFile.WRITE_PHASE, TestFile.WRITE_VERIFY_PHASE]
+    totals = {phase: [0, 0, 0] for phase in phases}
+    # Recorded costs are of correctness runs; --perf invokes the implementations a different number of times.
+    cost_scales = {}
+    counts = {}
+    covered = 0
+    for test_file, _ in scheduled:
+        counts[str(test_file.test_type)] = counts.get(str(test_file.test_type), 0) + 1
+        if history.covers(test_file, impls):
+            covered += 1
+        plan = plan_test_file(test_file, len(impls), perf, event_output_format)
+        for phase, planned in six.iteritems(plan):
+            for i in range(3):
+                totals[phase][i] += planned[i]
+        if perf is not None:
+            correctness = sum(planned[0] for planned in six.itervalues(plan_test_file(test_file, len(impls))))
+            cost_scales[test_file.key] = sum(planned[0] for planned in six.itervalues(plan)) / correctness
+
+    def scaled(item):
+        test_file, estimate = item
+        return estimate * cost_scales.get(test_file.key, 1.0)
+
+    wall_time = estimate_wall_time([scaled(item) for item in scheduled], jobs)
+    print('Plan: %d test files (%s) with %d implementations (%s), %d at a time%s.'
+          % (len(scheduled), ', '.join('%s: %d' % item for item in sorted(six.iteritems(counts))), len(impls),
+             ', '.join(impl.name for impl in impls), jobs,
+             '' if shard is None else ', shard %d of %d' % shard))
+    print('%-13s %12s %12s %14s' % ('phase', 'invocations', 'artifacts', 'bytes'))
+    for phase in phases + ['total']:
+        row = totals[phase] if phase != 'total' else [sum(totals[p][i] for p in phases) for i in range(3)]
+        print('%-13s %12d %12d %14d' % (phase, row[0], row[1], row[2]))
+    print('Estimated wall time: %.1f seconds. %d of %d test files have recorded costs for every implementation; the '
+          'rest are estimated from their size.' % (wall_time, covered, len(scheduled)))
+    if shard is None and len(shards) > 1:
+        print('%-7s %15s' % ('shards', 'wall time (s)'))
+        for count, parts in sorted(six.iteritems(shards)):
+            print('%-7d %15.1f' % (count, max(estimate_wall_time([scaled(item) for item in part], jobs)
+                                               for part in parts)))
+
+
+class TraversalBatch:
+    def __init__(self, key, traversals):
+        """
+        Traversals of one vector that are run together by a single worker; see `run_traversal_batch`.
+        :param key: The vector's TestFile key.
+        :param traversals: A list of (TestFile, Traversal) pairs, where each TestFile reads the vector with its
+            Traversal.
+        """
+        self.key = key
+        self.traversals = traversals
+        self.elapsed = 0.0
+
+
+def run_traversal_batch(batch, perf=None):
+    """
+    Generates each of the batch's traversals, then has every implementation read the vector with it and verifies that
+    they agree. The files written for traversals that pass are deleted as soon as they have been verified.
+    :return: the batch.
+    """
+    start = time.monotonic()
+    for test_file, traversal in batch.traversals:
+        traversal.write()
+        with PHASE_TIMER.phase(TestFile.READ_PHASE):
+            test_file.read()
+        with PHASE_TIMER.phase(TestFile.READ_VERIFY_PHASE):
+            test_file.verify_reads()
+            test_file.verify_writes()  # Releases the read results.
+        if not test_file.failed_implementations:
+            test_file.discard_results()
+    batch.elapsed = time.monotonic() - start
+    return batch
+
+
+def fuzz_all(impls, tests_dir, test_types, test_file_filter, results_root, results_location, seeds_location, seed,
+             traversals, batch_size, jobs):
+    """
+    Fuzzes the implementations' readers with `traversals` randomly generated traversals of each of the selected good
+    vectors (see ion_test_driver_fuzz), verifying that the implementations agree on each one. Failures seen in earlier
+    runs are replayed first. Each new kind of failure is recorded in the FailingSeeds at `seeds_location` and described
+    in the results, which are written to `results_location` along with the number of traversals run per second.
+    :param seed: The seed from which every traversal of the run is derived.
+    :param batch_size: The number of traversals of a vector that each worker runs at a time.
+    :param jobs: The number of batches to run concurrently.
+    """
+    failing_seeds = FailingSeeds(seeds_location)
+    names = {impl.identifier: impl.name for impl in impls}
+    good_types = [test_type for test_type in test_types if not test_type.is_bad]
+    vectors = {}
+    for vector in generate_test_files(tests_dir, good_types, test_file_filter, results_root, impls):
+        replayed = failing_seeds.seeds(vector.key, vector.digest)
+        vectors[vector.key] = {'vector': vector, 'traversals': 0, 'replayed': replayed, 'failed': 0, 'elapsed': 0.0}
+
+    def generate_batches():
+        # Batches are generated as workers free up, so that only those in progress are held in memory.
+        for vector in (entry['vector'] for entry in six.itervalues(vectors)):
+            event_count = vector_event_count(vector.path)
+            seeds = vectors[vector.key]['replayed'] + [traversal_seed(seed, vector.digest, i)
+                                                       for i in range(traversals)]
+            for i in range(0, len(seeds), batch_size):
+                pairs = []
+                for traversal_seed_value in seeds[i:i + batch_size]:
+                    traversal_location = os.path.join(results_root, str(vector.test_type), vector.short_path,
+                                                      TestFile.FUZZ_DIR, '%d' % traversal_seed_value,
+                                                      'traversal' + ION_SUFFIX_TEXT)
+                    traversal = Traversal(traversal_seed_value, traversal_location, event_count)
+                    pairs.append((TestFile(vector.test_type, vector.path, results_root, impls, vector.size,
+                                           vector.digest, traversal), traversal))
+                yield TraversalBatch(vector.key, pairs)
+
+    print('Fuzzing %d vectors with %d traversals each.' % (len(vectors), traversals), end='', flush=True)
+    failures = []
+    start = time.monotonic()
+    complete = True
+    try:
+        for batch in run_test_files(generate_batches(), None, jobs, run=run_traversal_batch):
+            vector = vectors[batch.key]
+            vector['elapsed'] += batch.elapsed
+            for test_file, traversal in batch.traversals:
+                vector['traversals'] += 1
+                failed = test_file.failures
+                if not failed:
+                    if traversal.seed in vector['replayed']:
+                        failing_seeds.remove(batch.key, traversal.seed)  # Fixed since it was found.
+                    continue
+                vector['failed'] += 1
+                signature = ['%s:%s' % (names[impl_id], field) for impl_id, fields in six.iteritems(failed)
+                             for field in fields]
+                if failing_seeds.add(batch.key, test_file.digest, traversal.seed, signature):
+                    results = {}
+                    test_file.add_results_to(results)
+                    reports = results[str(test_file.test_type)][test_file.short_path]
+                    failures.append({
+                        'vector': batch.key,
+                        'seed': traversal.seed,
+                        'traversal': traversal.location,
+                        'signature': sorted(signature),
+                        'results': {impl_id: report.to_ion() for impl_id, report in six.iteritems(reports)}
+                    })
+            print('.', end='', flush=True)
+    except DeadlineExceeded:
+        complete = False
+        EXECUTION_LIMITS['deadline'] = None  # Allow the results to be written.
+    elapsed = time.monotonic() - start
+    failing_seeds.save()
+    total = sum(vector['traversals'] for vector in six.itervalues(vectors))
+    summary = {
+        'seed': seed,
+        'traversals_per_vector': traversals,
+        'batch_size': batch_size,
+        'date': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'complete': complete,
+        'traversals': total,
+        'elapsed': elapsed,
+        'traversals_per_second': total / elapsed if elapsed > 0 else 0.0,
+        'vectors': {key: {
+            'traversals': vector['traversals'],
+            'replayed': len(vector['replayed']),
+            'failed': vector['failed'],
+            'traversals_per_second': vector['traversals'] / vector['elapsed'] if vector['elapsed'] > 0 else 0.0
+        } for key, vector in six.iteritems(vectors)},
+        'failures': failures
+    }
+    results_out = FileIO(results_location, mode='wb')
+    try:
+        simpleion.dump(summary, results_out, binary=False, indent=' ')
+    finally:
+        results_out.close()
+    print('\n%s %d traversals in %.1f seconds (%.1f traversals/s); %d new failures. Results written to %s.'
+          % ('Fuzzed' if complete else 'Deadline reached after', total, elapsed, summary['traversals_per_second'],
+             len(failures), results_location))
+    print('%-40s %10s %8s %8s %14s' % ('vector', 'traversals', 'replayed', 'failed', 'traversals/s'))
+    for key, vector in sorted(six.iteritems(summary['vectors'])):
+        print('%-40s %10d %8d %8d %14.1f' % (key, vector['traversals'], vector['replayed'], vector['failed'],
+                                             vector['traversals_per_second']))
+
+
+def source_files(root, excluded):
+    """
+    Lists the source files under `root`, outside the `excluded` directory (e.g. the output root, if it is inside
+    `root`). If `root` is in a git working tree, these are the files that git tracks or would track, which leaves out
+    build outputs and anything else that the repository ignores. Otherwise, every file is listed except those under
+    version control metadata, installed dependencies, and build outputs (see `WATCH_IGNORED_DIRECTORIES`).
+    :return: a list of file paths.
+    """
+    try:
+        listed = check_output((TOOL_DEPENDENCIES['git'], '-C', root, 'ls-files', '-z', '--cached', '--others',
+                               '--exclude-standard'), stderr=DEVNULL).decode()
+        paths = [os.path.join(root, name) for name in listed.split('\0') if name]
+        return [path for path in paths if not path.startswith(excluded + os.sep)]
+    except (CalledProcessError, OSError):
+        pass  # Not a git working tree, or git is unavailable.
+    paths = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = [subdirectory for subdirectory in subdirectories
+                             if subdirectory not in WATCH_IGNORED_DIRECTORIES and
+                             os.path.join(directory, subdirectory) != excluded]
+        paths.extend(os.path.join(directory, name) for name in files)
+    return paths
+
+
+def source_snapshot(root, excluded):
+    """
+    Records the modification time and size of every file under `root` that `source_files` lists. Two snapshots differ
+    if any file was added, removed, or modified between them.
+    :return: a dict. Key: file path, value: (modification time in nanoseconds, size).
+    """
+    snapshot = {}
+    for path in source_files(root, excluded):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # Removed since it was listed, e.g. by an editor replacing the file.
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def wait_for_changes(root, excluded, snapshot, poll_interval):
+    """
+    Polls the files under `root` every `poll_interval` seconds until they differ from `snapshot`, then until they stop
+    changing, so that a save touching several files (or a checkout) triggers one rebuild.
+    :return: the snapshot of the changed files.
+    """
+    while True:
+        time.sleep(poll_interval)
+        current = source_snapshot(root, excluded)
+        if current != snapshot:
+            break
+    while True:
+        time.sleep(poll_interval)
+        settled = source_snapshot(root, excluded)
+        if settled == current:
+            return settled
+        current = settled
+
+
+def watch_implementation(implementation, references, tests_dir, test_types, test_file_filter, output_root,
+                         results_root, results_file, history_location, jobs, poll_interval,
+                         negotiate_event_format=None):
+    """
+    Rebuilds the given local implementation in place whenever its source changes, then tests the watched files with it
+    and the reference implementations, printing each file's outcome as it completes and rewriting the results. The
+    watched files are those selected by `test_file_filter` if any patterns are given; otherwise, those that the
+    history says failed (or changed) last time, or all of the selected files if there is no history. Runs until
+    interrupted.
+    :param implementation: The IonImplementation to build with `install_in_place`.
+    :param references: The other installed IonImplementations with which to test the watched files.
+    :param output_root: Root directory of the run's output, which is not watched even if it is inside the
+        implementation's source.
+    :param history_location: The CostHistory that selects the watched files when no patterns are given, and that
+        records the outcome of each iteration. If None, all of the selected files are watched.
+    :param poll_interval: The number of seconds between checks of the implementation's source for changes.
+    :param negotiate_event_format: If provided, a function called with each implementation once it is first built; see
+        `IonImplementation.negotiate_event_format`.
+    """
+    source_root = os.path.abspath(implementation.install_in_place())
+    impls = [implementation] + references
+    if negotiate_event_format is not None:
+        for impl in impls:
+            negotiate_event_format(impl)
+    history = None if history_location is None else CostHistory(history_location)
+    watched = list(generate_test_files(tests_dir, test_types, test_file_filter, results_root, impls))
+    if not test_file_filter and history is not None:
+        failed_last_time = [test_file for test_file in watched if history.is_priority(test_file)]
+        if failed_last_time:
+            watched = failed_last_time
+        else:
+            print('No test files failed last time; watching all %d selected files.' % len(watched))
+    if not watched:
+        raise ValueError('No test files selected to watch.')
+    watched = [(test_file.test_type, test_file.path, test_file.size, test_file.digest) for test_file in watched]
     results_location = os.path.join(results_root, results_file)
-    write_results(results, results_location, impls)
-    print('\nTests complete. Results written to %s.' % results_location)
+    excluded = os.path.abspath(output_root)
+    print('Watching %s for changes to %s; testing %d files. Press Ctrl-C to stop.'
+          % (source_root, implementation.name, len(watched)))
+    snapshot = source_snapshot(source_root, excluded)
+    previous_failures = {}
+    iteration = 0
+    built = True
+    build_seconds = 0.0
+    try:
+        while True:
+            if built:
+                iteration += 1
+                start = time.monotonic()
+                results = {}
+                failures = {}
+                test_files = [TestFile(test_type, path, results_root, impls, size, digest)
+                              for test_type, path, size, digest in watched]
+                for test_file in test_files:
+                    test_file.discard_results()  # Don't let the previous iteration's reports outlive a crash.
+                for test_file in run_test_files(test_files, None, jobs):
+                    test_file.add_results_to(results)
+                    if history is not None:
+                        history.record(test_file, impls)
+                    failed = sorted(test_file.failed_implementations)
+                    if failed:
+                        failures[test_file.key] = failed
+                    if failed != previous_failures.get(test_file.key, []) or iteration == 1:
+                        change = ''
+                        if iteration > 1:
+                            change = ' (newly failing)' if failed and test_file.key not in previous_failures else \
+                                ' (fixed)' if not failed else ' (changed)'
+                        print('%s %s%s%s' % ('FAIL' if failed else 'PASS', test_file.key,
+                                             ': ' + ', '.join(failed) if failed else '', change), flush=True)
+                write_results(results, results_location, impls)
+                if history is not None:
+                    history.save()
+                print('Iteration %d: %d of %d files failed (build %.1fs, tests %.1fs). Results written to %s.'
+                      % (iteration, len(failures), len(watched), build_seconds, time.monotonic() - start,
+                         results_location))
+                previous_failures = failures
+            print('Waiting for changes.', flush=True)
+            snapshot = wait_for_changes(source_root, excluded, snapshot, poll_interval)
+            print('Change detected; rebuilding %s.' % implementation.name, flush=True)
+            start = time.monotonic()
+            try:
+                implementation.install_in_place()
+                built = True
+            except CalledProcessError as e:
+                built = False
+                print('Build failed (exit status %d); see %s.' % (e.returncode, implementation.build_log))
+            build_seconds = time.monotonic() - start
+            # The build may write into the source tree; only later changes trigger the next rebuild.
+            snapshot = source_snapshot(source_root, excluded)
+    except KeyboardInterrupt:
+        print('\nStopped watching %s after %d iterations.' % (implementation.name, iteration))
 
 
 def tokenize_description(description, has_name):
@@ -965,21 +3088,164 @@ def replace_impl_name_for_obj(errors, first_impl, second_impl):
         replace_impl_name_for_message(error, first_impl, second_impl)
 
 
-def analyze_results(first_implementation, second_implementation, results_file, output_root):
+def performance_sample_seconds(sample):
+    """
+    Returns the duration of one --perf sample, preferring the time reported by the implementation over the wall time
+    measured by the driver, which includes process startup.
+    """
+    report = sample.get(TestReport.PERFORMANCE_REPORT_FIELD)
+    if report is not None and report.get('elapsed_time'):
+        return report['elapsed_time'] * PERF_ELAPSED_TIME_UNIT
+    return sample[METRICS_WALL_TIME_FIELD]
+
+
+def report_resource_totals(report):
+    """
+    Sums the per-phase metrics recorded in the given TestReport.
+    :return: a dict with `cpu_time` (falling back to wall time where CPU time is unavailable) and, if recorded,
+        `max_rss` fields, or None if the report has no metrics.
+    """
+    phases = report.get(TestReport.METRICS_FIELD)
+    if not phases:
+        return None
+    totals = new_metrics_totals()
+    for phase_totals in six.itervalues(phases):
+        merge_metrics_totals(totals, phase_totals)
+    resources = {}
+    if totals.get(METRICS_USER_TIME_FIELD) is not None and totals.get(METRICS_SYSTEM_TIME_FIELD) is not None:
+        resources['cpu_time'] = totals[METRICS_USER_TIME_FIELD] + totals[METRICS_SYSTEM_TIME_FIELD]
+    else:
+        resources['cpu_time'] = totals[METRICS_WALL_TIME_FIELD]
+    if totals.get(METRICS_MAX_RSS_FIELD):
+        resources[METRICS_MAX_RSS_FIELD] = totals[METRICS_MAX_RSS_FIELD]
+    return resources
+
+
+def classify_performance_change(ratio, p_slower, p_faster, alpha, threshold):
+    """
+    Decides whether a change in a measurement between two revisions is significant.
+    :param ratio: The new revision's measurement divided by the old revision's.
+    :param p_slower: The p-value of the test for an increase.
+    :param p_faster: The p-value of the test for a decrease.
+    :param alpha: The significance level.
+    :param threshold: The minimum relative change to report.
+    :return: a tuple (message, p_value, regressed), or None if the change is not significant.
+    """
+    if p_slower < alpha and ratio > 1 + threshold:
+        return 'Performance: new commit is significantly slower.', p_slower, True
+    if p_faster < alpha and ratio < 1 / (1 + threshold):
+        return 'Performance: new commit is significantly faster.', p_faster, False
+    return None
+
+
+def analyze_performance_samples(first_report, second_report, first_impl, second_impl, alpha, threshold):
+    """
+    Compares the --perf samples that two revisions recorded for one test file, using a one-sided Mann-Whitney U test
+    in each direction for each output format.
+    :return: a tuple (report, regressed). The report describes each output format whose time changed significantly;
+        regressed is True if any of those changes is a slowdown.
+    """
+    report = {}
+    regressed = False
+    first_performance = first_report.get(TestReport.PERFORMANCE_FIELD, {})
+    second_performance = second_report.get(TestReport.PERFORMANCE_FIELD, {})
+    for output_format in PERF_OUTPUT_FORMATS:
+        first_seconds = [performance_sample_seconds(s) for s in first_performance.get(output_format, [])]
+        second_seconds = [performance_sample_seconds(s) for s in second_performance.get(output_format, [])]
+        if not first_seconds or not second_seconds:
+            continue
+        first_median = statistics.median(first_seconds)
+        second_median = statistics.median(second_seconds)
+        if first_median <= 0:
+            continue
+        ratio = second_median / first_median
+        change = classify_performance_change(ratio, mann_whitney_greater(first_seconds, second_seconds),
+                                             mann_whitney_greater(second_seconds, first_seconds), alpha, threshold)
+        if change is None:
+            continue
+        message, p_value, slower = change
+        regressed = regressed or slower
+        report[output_format] = {
+            TestFile.ERROR_MESSAGE_FIELD: message,
+            'median_seconds': {first_impl: first_median, second_impl: second_median},
+            'ratio': ratio,
+            'p_value': p_value
+        }
+    return report, regressed
+
+
+def analyze_resource_pairs(pairs, alpha, threshold):
+    """
+    Compares the per-file resource totals of two revisions across all test files, using a one-sided Wilcoxon
+    signed-rank test in each direction over the per-file log ratios.
+    :param pairs: A dict of the form {resource: [(first_total, second_total)]}, paired by test file.
+    :return: a tuple (report, regressed). The report describes each resource whose consumption changed significantly;
+        regressed is True if any of those changes is an increase.
+    """
+    report = {}
+    regressed = False
+    for resource in sorted(pairs.keys()):
+        log_ratios = [math.log(second / first) for first, second in pairs[resource] if first > 0 and second > 0]
+        if not log_ratios:
+            continue
+        ratio = math.exp(statistics.median(log_ratios))
+        change = classify_performance_change(ratio, wilcoxon_signed_rank_greater(log_ratios),
+                                             wilcoxon_signed_rank_greater([-r for r in log_ratios]), alpha,
+                                             threshold)
+        if change is None:
+            continue
+        message, p_value, increased = change
+        regressed = regressed or increased
+        report[resource] = {
+            TestFile.ERROR_MESSAGE_FIELD: message,
+            'files': len(log_ratios),
+            'median_ratio': ratio,
+            'p_value': p_value
+        }
+    return report, regressed
+
+
+def analyze_results(first_implementation, second_implementation, results_file, output_root, perf_alpha=0.01,
+                    perf_threshold=None):
+    first_impl = parse_des_for_res_diff(first_implementation)
+    second_impl = parse_des_for_res_diff(second_implementation)
+    data = simpleion.load(FileIO(results_file))
+    final_result, return_val = diff_results(first_impl, second_impl, data, perf_alpha, perf_threshold)
+
+    if '.' in output_root:
+        output_root = output_root[0:output_root.rfind('.')] + '.ion'
+    else:
+        output_root = output_root + '.ion'
+    simpleion.dump(final_result, FileIO(output_root, mode='wb'), binary=False, indent=' ')
+    print('Analysis complete with status \'%d\'. Results written to %s.' % (return_val, output_root))
+    sys.exit(return_val)
+
+
+def diff_results(first_impl, second_impl, data, perf_alpha=0.01, perf_threshold=None):
+    """
+    Identifies the differences between two revisions of an implementation in a set of results (see `analyze_results`).
+    :param first_impl: The identifier of the first (older) revision, e.g. ion-c_abcd123.
+    :param second_impl: The identifier of the second (newer) revision.
+    :param data: The results, as loaded from a results file.
+    :param perf_threshold: The minimum relative change in a measurement that is reported when significant. If None,
+        PERF_REPORT_THRESHOLD is used, and changes in the recorded resource totals don't count as regressions.
+    :return: a tuple (the analysis, keyed by test file name; 1 if the second revision regressed, otherwise 0).
+    """
+    gate_resources = perf_threshold is not None
+    if perf_threshold is None:
+        perf_threshold = PERF_REPORT_THRESHOLD
     return_val = 0
     return_err = 1
     result_field = 'result'
     disagree_lists = 'disagree_lists'
     no_longer_agrees_with = 'no_longer_agrees_with'
     now_agrees_with = 'now_agrees_with'
-
-    first_impl = parse_des_for_res_diff(first_implementation)
-    second_impl = parse_des_for_res_diff(second_implementation)
+    performance_summary = 'performance_summary'
+    resource_pairs = {}
 
     if first_impl.split('_')[0] != second_impl.split('_')[0]:
         raise ValueError("We only support analyzing two different revisions of the same implementation for now.")
     final_result = {}
-    data = simpleion.load(FileIO(results_file))
 
     for test_type in data:
         files = data[test_type]
@@ -1000,12 +3266,51 @@ def analyze_results(first_implementation, second_implementation, results_file, o
             elif second_report is None:
                 raise ValueError("Didn't find the second implementation for file: '" + test_file + "'.")
 
+            # A file that either revision didn't test (e.g. because its time budget ran out) can't be compared.
+            if ion_equals(first_report.get(result_field), TestReport.SKIPPED) or \
+                    ion_equals(second_report.get(result_field), TestReport.SKIPPED):
+                continue
+
             # Step one analyze result field
             result_report = {}
             validate_results(first_report, result_field, TestReport.READ_ERROR, TestReport.READ_COMPARE,
                              TestReport.WRITE_ERROR, TestReport.WRITE_COMPARE, first_impl, test_file)
             validate_results(second_report, result_field, TestReport.READ_ERROR, TestReport.READ_COMPARE,
                              TestReport.WRITE_ERROR, TestReport.WRITE_COMPARE, second_impl, test_file)
+
+            # Performance is compared regardless of the results, and a regression doesn't preclude the correctness
+            # analysis below.
+            performance_report, regressed = analyze_performance_samples(first_report, second_report, first_impl,
+                                                                        second_impl, perf_alpha, perf_threshold)
+            if performance_report:
+                write_to_report(cur_result, final_result, performance_report, test_file, TestReport.PERFORMANCE_FIELD)
+                if regressed:
+                    return_val = return_err
+            first_resources = report_resource_totals(first_report)
+            second_resources = report_resource_totals(second_report)
+            if first_resources is not None and second_resources is not None:
+                for resource in first_resources:
+                    if resource in second_resources:
+                        resource_pairs.setdefault(resource, []).append((first_resources[resource],
+                                                                        second_resources[resource]))
+
+            # Failures left out of the results (see --max-failures) can't be compared, so they may have changed. That
+            # matters only if the second revision still fails; if it passes, whatever the first revision omitted is
+            # fixed. Omissions from the first revision alone are reported, but can't be shown to be regressions.
+            truncated = [impl for impl, report in ((first_impl, first_report), (second_impl, second_report))
+                         if report.get(TestReport.OMITTED_FIELD) is not None]
+            if truncated and not ion_equals(second_report[result_field], TestReport.PASS):
+                omitted_report = {
+                    TestFile.ERROR_MESSAGE_FIELD: "Failures were omitted from the results of %s (see --max-failures), "
+                                                  "so they can't be compared." % ' and '.join(truncated),
+                    first_impl: first_report.get(TestReport.OMITTED_FIELD),
+                    second_impl: second_report.get(TestReport.OMITTED_FIELD)
+                }
+                write_to_report(cur_result, final_result, omitted_report, test_file, TestReport.OMITTED_FIELD)
+                if second_impl in truncated:
+                    return_val = return_err
+                continue
+
             if ion_equals(first_report[result_field], TestReport.PASS) and \
                     ion_equals(second_report[result_field], TestReport.PASS):
                 continue
@@ -1184,13 +3489,364 @@ def analyze_results(first_implementation, second_implementation, results_file, o
                 write_to_report(cur_result, final_result, write_compare_report, test_file, TestReport.WRITE_COMPARE)
                 continue
 
-    if '.' in output_root:
-        output_root = output_root[0:output_root.rfind('.')] + '.ion'
+    resource_report, regressed = analyze_resource_pairs(resource_pairs, perf_alpha, perf_threshold)
+    if resource_report:
+        final_result[performance_summary] = resource_report
+        if regressed and gate_resources:
+            return_val = return_err
+    return final_result, return_val
+
+
+def select_implementations(arguments, output_root):
+    """
+    Selects the implementations given by the `--implementation`, `--replace`, and `--local-only` arguments, without
+    installing them.
+    :return: the selected IonImplementations.
+    """
+    if not os.path.exists(output_root):
+        os.makedirs(output_root)
+    descriptions = list(arguments['--implementation'])
+    if arguments['--replace']:
+        replace_default_impl(arguments['--replace'])
+    if not arguments['--local-only']:
+        descriptions += ION_IMPLEMENTATIONS
+    return parse_implementations(descriptions, output_root)
+
+
+def install_ion_tests(arguments, output_root):
+    """
+    Installs the ion-tests given by the `--ion-tests` argument, or the default ion-tests.
+    :return: the ion-tests directory.
+    """
+    ion_tests_source = arguments['--ion-tests']
+    if not ion_tests_source:
+        ion_tests_source = ION_TESTS_SOURCE
+    return IonResource(output_root, 'ion-tests', *tokenize_description(ion_tests_source, has_name=False)).install()
+
+
+def install_implementations(arguments, output_root):
+    """
+    Installs the implementations selected by the `--implementation`, `--replace`, and `--local-only` arguments (see
+    `select_implementations`) after verifying the tool dependencies and applying the execution limits. The run's
+    deadline starts once the installation completes.
+    :return: the installed IonImplementations.
+    """
+    implementations = select_implementations(arguments, output_root)
+    check_tool_dependencies(arguments)
+    set_execution_limits(arguments)
+    for n in range(RETRY_ATTEMPTS):
+        try:
+            for implementation in implementations:
+                implementation.install()
+            break
+        except Exception as e:
+            if n < RETRY_ATTEMPTS - 1:
+                print('Retry installation, attempts: %d.' % (n + 1))
+                continue
+            else:
+                raise e
+    start_deadline(arguments)
+    return implementations
+
+
+def run_benchmarks_command(arguments):
+    """
+    Runs the --benchmark mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    implementations = install_implementations(arguments, output_root)
+    set_process_isolation(arguments)
+    results_root = os.path.join(output_root, 'results')
+    if not os.path.exists(results_root):
+        os.makedirs(results_root)
+    results_file = arguments['--results-file']
+    if not results_file:
+        results_file = 'ion-test-driver-benchmark-%s.ion' % datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    warmups, repetitions, size = int(arguments['--warmups']), int(arguments['--repetitions']), \
+        int(arguments['--corpus-size'])
+    if warmups < 0 or repetitions < 1 or size < 1:
+        raise ValueError("--warmups must not be negative and --repetitions and --corpus-size must be positive.")
+    run_benchmarks(implementations, output_root, os.path.join(results_root, results_file),
+                   int(arguments['--seed']), size, warmups, repetitions)
+
+
+def bisect_regression(name, location, good_revision, bad_revision, references, ion_tests_dir, test_file_filter,
+                      bisect_root, output_root, jobs=1):
+    """
+    Finds the first commit between two revisions of an implementation at which the given test files regress, by
+    binary search over the commits that are descendants of `good_revision` and ancestors of `bad_revision`. Each
+    candidate is built (reusing any existing build of the same commit) and tested on only the given files, alongside the
+    good revision and the reference implementations, and its results are compared with the good revision's using
+    `diff_results`. Each candidate's results are kept under `bisect_root`, and are reused instead of testing it again.
+    :param references: The other installed IonImplementations to test alongside each candidate, e.g. those of the run
+        that was analyzed; consensus failures are relative to them.
+    :param test_file_filter: The test files that regressed; see `TestFileFilter`.
+    :return: the full hashes of the commits that may be the first bad one, oldest first. This is only the first bad
+        commit, unless commits that fail to build are skipped (like `git bisect skip`) and leave it ambiguous.
+    """
+    repository = os.path.join(bisect_root, 'repository')
+    if not os.path.isdir(repository):
+        log_call(os.path.join(bisect_root, 'clone_log.txt'), (TOOL_DEPENDENCIES['git'], 'clone', location, repository))
     else:
-        output_root = output_root + '.ion'
-    simpleion.dump(final_result, FileIO(output_root, mode='wb'), binary=False, indent=' ')
-    print('Analysis complete with status \'%d\'. Results written to %s.' % (return_val, output_root))
-    sys.exit(return_val)
+        log_call(os.path.join(bisect_root, 'clone_log.txt'), (TOOL_DEPENDENCIES['git'], '-C', repository, 'fetch',
+                                                              '--all'))
+
+    def resolve(revision):
+        # Branch names may only exist as remote-tracking branches in the clone.
+        for ref in (revision, 'origin/' + revision):
+            try:
+                return check_output((TOOL_DEPENDENCIES['git'], '-C', repository, 'rev-parse', '--verify', '-q',
+                                     ref + '^{commit}')).strip().decode()
+            except CalledProcessError:
+                continue
+        raise ValueError('Revision %s not found in %s.' % (revision, location))
+
+    good_commit, bad_commit = resolve(good_revision), resolve(bad_revision)
+    # Oldest first; the last commit is the bad revision itself.
+    commits = check_output((TOOL_DEPENDENCIES['git'], '-C', repository, 'rev-list', '--reverse', '--ancestry-path',
+                            '%s..%s' % (good_commit, bad_commit))).decode().split()
+    if not commits:
+        raise ValueError('%s is not an ancestor of %s.' % (good_revision, bad_revision))
+    good = IonImplementation(output_root, name, repository, good_commit)
+    good.install(reuse_build=True)
+    runs_root = os.path.join(bisect_root, 'runs')
+    print('Bisecting %d commits between %s and %s (about %d steps).'
+          % (len(commits), good_commit[:7], bad_commit[:7], int(math.ceil(math.log(len(commits), 2)))))
+
+    def regressed(commit):
+        """
+        :return: True if `commit` is bad, False if it is good, or None if it could not be built.
+        """
+        candidate = IonImplementation(output_root, name, repository, commit)
+        try:
+            candidate.install(reuse_build=True)
+        except CalledProcessError as e:
+            print('%s failed to build (exit status %d; see %s); skipping it.'
+                  % (candidate.identifier, e.returncode, candidate.build_log))
+            return None
+        results_root = os.path.join(runs_root, candidate.identifier)
+        results_location = os.path.join(results_root, RESULTS_FILE_DEFAULT)
+        if os.path.isfile(results_location):
+            print('Reusing the results for %s.' % candidate.identifier)
+        else:
+            test_all([good, candidate] + references, ion_tests_dir, list(TestType.__iter__()), test_file_filter,
+                     results_root, RESULTS_FILE_DEFAULT, jobs=jobs)
+        data = simpleion.load(FileIO(results_location))
+        _, return_val = diff_results(good.identifier, candidate.identifier, data)
+        print('%s is %s.' % (candidate.identifier, 'bad' if return_val != 0 else 'good'))
+        return return_val != 0
+
+    low, high = -1, len(commits) - 1  # commits[low] (or the good revision) is good; commits[high] is bad.
+    skipped = set()
+    while True:
+        untested = [index for index in range(low + 1, high) if index not in skipped]
+        if not untested:
+            break
+        # The commit nearest the middle, so that skipped commits cost as little of the search as possible.
+        middle = (low + high) // 2
+        index = min(untested, key=lambda candidate: (abs(candidate - middle), candidate))
+        verdict = regressed(commits[index])
+        if verdict is None:
+            skipped.add(index)
+        elif verdict:
+            high = index
+        else:
+            low = index
+    return commits[low + 1:high + 1]
+
+
+def run_driver_benchmark_command(arguments):
+    """
+    Runs the --driver-benchmark mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    results_root = os.path.join(output_root, 'results')
+    if not os.path.exists(results_root):
+        os.makedirs(results_root)
+    results_file = arguments['--results-file']
+    if not results_file:
+        results_file = 'ion-test-driver-scaling-%s.ion' % datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    try:
+        vector_counts = [int(count) for count in arguments['--vector-counts'].split(',')]
+        stub_counts = [int(count) for count in arguments['--stub-counts'].split(',')]
+    except ValueError:
+        raise ValueError("--vector-counts and --stub-counts must be comma-separated integers.")
+    if min(vector_counts) < 1 or min(stub_counts) < 1:
+        raise ValueError("--vector-counts and --stub-counts must be positive.")
+    latency, error_rate, disagreement_rate = float(arguments['--stub-latency']), \
+        float(arguments['--stub-error-rate']), float(arguments['--stub-disagreement-rate'])
+    if latency < 0 or not 0 <= error_rate <= 1 or not 0 <= disagreement_rate <= 1:
+        raise ValueError("--stub-latency must not be negative, and --stub-error-rate and --stub-disagreement-rate "
+                         "must be between 0 and 1.")
+    jobs = parse_jobs(arguments)
+    if not run_scaling_benchmarks(output_root, os.path.join(results_root, results_file), vector_counts, stub_counts,
+                                  latency, error_rate, disagreement_rate, int(arguments['--seed']), jobs):
+        sys.exit(1)
+
+
+def run_bisect_command(arguments):
+    """
+    Runs the --bisect mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    diff_location = os.path.abspath(arguments['<diff_file>'])
+    name, location, good_revision = tokenize_description(arguments['<first_description>'], has_name=True)
+    bad_name, bad_location, bad_revision = tokenize_description(arguments['<second_description>'], has_name=True)
+    if name != bad_name or location != bad_location or good_revision is None or bad_revision is None:
+        raise ValueError("--bisect requires two descriptions of the form name,location,revision that differ only in "
+                         "their revisions.")
+    diff = simpleion.load(FileIO(diff_location))
+    # Performance changes alone can't be reproduced by a correctness run, so files with nothing else are left out.
+    test_files = sorted(six.text_type(test_file) for test_file, analysis in six.iteritems(diff)
+                        if test_file != 'performance_summary' and
+                        any(field != TestReport.PERFORMANCE_FIELD for field in analysis))
+    if not test_files:
+        print('%s reports no regressed test files to bisect.' % diff_location)
+        return
+    references = install_implementations(arguments, output_root)
+    ion_tests_dir = install_ion_tests(arguments, output_root)
+    jobs = parse_jobs(arguments)
+    set_admission_control(arguments, jobs)
+    bisect_root = os.path.join(output_root, 'bisect', name)
+    if not os.path.isdir(bisect_root):
+        os.makedirs(bisect_root)
+    # The analysis identifies files by name alone, which TestFileFilter matches as whole names.
+    test_file_filter = list(test_files)
+    first_bad = bisect_regression(name, location, good_revision, bad_revision, references, ion_tests_dir,
+                                  test_file_filter, bisect_root, output_root, jobs)
+    if len(first_bad) == 1:
+        print('First bad commit of %s for %s: %s.' % (name, ', '.join(test_files), first_bad[0]))
+    else:
+        print('Only commits that failed to build are left; the first bad commit of %s for %s is one of: %s.'
+              % (name, ', '.join(test_files), ', '.join(first_bad)))
+
+
+def run_fuzz_command(arguments):
+    """
+    Runs the --fuzz mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    seeds_location = os.path.join(output_root, FUZZ_SEEDS_FILE_DEFAULT)
+    if arguments['--fuzz-seeds']:
+        seeds_location = os.path.abspath(arguments['--fuzz-seeds'])
+    implementations = install_implementations(arguments, output_root)
+    ion_tests_dir = install_ion_tests(arguments, output_root)
+    results_root = os.path.join(output_root, 'results')
+    if not os.path.exists(results_root):
+        os.makedirs(results_root)
+    results_file = arguments['--results-file']
+    if not results_file:
+        results_file = 'ion-test-driver-fuzz-%s.ion' % datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    test_types = parse_test_types(arguments)
+    traversals, batch_size = int(arguments['--traversals']), int(arguments['--batch-size'])
+    if traversals < 1 or batch_size < 1:
+        raise ValueError("--traversals and --batch-size must be positive.")
+    jobs = parse_jobs(arguments)
+    set_compare_prefilter(arguments)
+    if parse_event_format(arguments) == 'binary':
+        negotiate_event_formats(implementations, output_root)
+    set_admission_control(arguments, jobs)
+    fuzz_all(implementations, ion_tests_dir, test_types, arguments['<test_file>'], results_root,
+             os.path.join(results_root, results_file), seeds_location, int(arguments['--seed']), traversals,
+             batch_size, jobs)
+
+
+def run_watch_command(arguments):
+    """
+    Runs the --watch mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    name, location, revision = tokenize_description(arguments['--watch'], has_name=True)
+    if revision is not None:
+        raise ValueError("--watch builds the working tree of a local implementation; its description may not include "
+                         "a revision.")
+    watched = IonImplementation(output_root, name, os.path.abspath(location), None)
+    # Installation changes the working directory, so relative locations are resolved first.
+    history_location = resolve_location(arguments, '--history')
+    references = install_implementations(arguments, output_root)
+    ion_tests_dir = install_ion_tests(arguments, output_root)
+    results_root = os.path.join(output_root, 'results')
+    results_file = arguments['--results-file']
+    if not results_file:
+        results_file = RESULTS_FILE_DEFAULT
+    test_types = parse_test_types(arguments)
+    jobs = parse_jobs(arguments)
+    set_report_limits(arguments)
+    negotiate_event_format = None
+    if parse_event_format(arguments) == 'binary':
+
+        def negotiate_event_format(implementation):
+            negotiate_event_formats([implementation], output_root)
+    set_admission_control(arguments, jobs)
+    watch_implementation(watched, references, ion_tests_dir, test_types, arguments['<test_file>'], output_root,
+                         results_root, results_file, history_location, jobs, WATCH_POLL_INTERVAL,
+                         negotiate_event_format)
+
+
+def run_plan_command(arguments):
+    """
+    Runs the --plan mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    history_location = resolve_location(arguments, '--history')
+    if arguments['--git']:
+        TOOL_DEPENDENCIES['git'] = arguments['--git']
+    # The implementations aren't installed; their names are all that the plan needs.
+    implementations = select_implementations(arguments, output_root)
+    ion_tests_dir = install_ion_tests(arguments, output_root)
+    test_types = parse_test_types(arguments)
+    perf = parse_perf(arguments)
+    jobs = parse_jobs(arguments)
+    shard = parse_shard_argument(arguments, history_location)
+    set_compare_prefilter(arguments)
+    event_output_format = EVENTS_OUTPUT_FORMAT_BINARY if parse_event_format(arguments) == 'binary' \
+        else EVENTS_OUTPUT_FORMAT_TEXT
+    plan_all(implementations, ion_tests_dir, test_types, arguments['<test_file>'],
+             os.path.join(output_root, 'results'), history_location, jobs, shard, perf, event_output_format)
+
+
+def run_tests_command(arguments):
+    """
+    Runs the default (testing) mode of the CLI.
+    """
+    output_root = os.path.abspath(arguments['--output-dir'])
+    # Installation changes the working directory, so relative locations are resolved first.
+    RUN_MONITOR.configure(resolve_location(arguments, '--metrics-file'), resolve_location(arguments, '--progress-file'))
+    baseline_location = resolve_location(arguments, '--baseline')
+    history_location = resolve_location(arguments, '--history')
+    implementations = install_implementations(arguments, output_root)
+    ion_tests_dir = install_ion_tests(arguments, output_root)
+    results_root = os.path.join(output_root, 'results')
+    results_file = arguments['--results-file']
+    if not results_file:
+        results_file = RESULTS_FILE_DEFAULT
+    test_types = parse_test_types(arguments)
+    test_file_filter = arguments['<test_file>']
+    perf = parse_perf(arguments)
+    jobs = parse_jobs(arguments)
+    shard = parse_shard_argument(arguments, history_location)
+    set_compare_prefilter(arguments)
+    set_report_limits(arguments)
+    if parse_event_format(arguments) == 'binary' and not perf:
+        negotiate_event_formats(implementations, output_root)
+    time_budget = None
+    if arguments['--time-budget']:
+        time_budget = float(arguments['--time-budget'])
+        if time_budget <= 0:
+            raise ValueError("--time-budget must be positive.")
+    baseline = None
+    if arguments['--baseline']:
+        if perf:
+            raise ValueError("--baseline can't be combined with --perf.")
+        if baseline_location == os.path.join(results_root, results_file):
+            raise ValueError("--baseline must not be the results file that the run writes.")
+        baseline = Baseline(baseline_location, implementations)
+        print('Reusing the stored results of %s from %s.' % (', '.join(baseline.peers) or 'no implementations',
+                                                           baseline_location))
+    set_process_isolation(arguments)
+    set_admission_control(arguments, jobs)
+    test_all(implementations, ion_tests_dir, test_types, test_file_filter, results_root, results_file, perf,
+             arguments['--profile'], history_location, jobs, shard, time_budget, baseline)
 
 
 def ion_test_driver(arguments):
@@ -1200,6 +3856,12 @@ def ion_test_driver(arguments):
         for impl_name in ION_BUILDS.keys():
             if impl_name != 'ion-tests':
                 print(impl_name)
+    elif arguments['--diff-events']:
+        context = int(arguments['--context'])
+        if context < 0:
+            raise ValueError("--context must not be negative.")
+        if diff_event_streams(arguments['<first_stream>'], arguments['<second_stream>'], context):
+            sys.exit(1)
     elif arguments['--results-diff']:
         output_root = os.path.abspath(arguments['--output-dir'])
         if arguments['--output-dir'] == '.':
@@ -1207,46 +3869,70 @@ def ion_test_driver(arguments):
         first_implementation = arguments['<first_description>']
         second_implementation = arguments['<second_description>']
         results_file = os.path.abspath(arguments['<results_file>'])
-        return analyze_results(first_implementation, second_implementation, results_file, output_root)
+        perf_alpha = float(arguments['--perf-alpha'])
+        perf_threshold = float(arguments['--perf-threshold']) if arguments['--perf-threshold'] is not None else None
+        if not 0 < perf_alpha < 1 or (perf_threshold is not None and perf_threshold < 0):
+            raise ValueError("--perf-alpha must be between 0 and 1 and --perf-threshold must not be negative.")
+        return analyze_results(first_implementation, second_implementation, results_file, output_root, perf_alpha,
+                               perf_threshold)
     else:
-        output_root = os.path.abspath(arguments['--output-dir'])
-        if not os.path.exists(output_root):
-            os.makedirs(output_root)
-        implementations = parse_implementations(arguments['--implementation'], output_root)
-        if arguments['--replace']:
-            replace_default_impl(arguments['--replace'])
-        if not arguments['--local-only']:
-            implementations += parse_implementations(ION_IMPLEMENTATIONS, output_root)
-        check_tool_dependencies(arguments)
-        for n in range(RETRY_ATTEMPTS):
-            try:
-                for implementation in implementations:
-                    implementation.install()
+        trace_location = arguments['--trace']
+        if trace_location:
+            trace_location = os.path.abspath(trace_location)  # Installation changes the working directory.
+            TRACER.start()
+        try:
+            if arguments['--benchmark']:
+                run_benchmarks_command(arguments)
+            elif arguments['--driver-benchmark']:
+                run_driver_benchmark_command(arguments)
+            elif arguments['--fuzz']:
+                run_fuzz_command(arguments)
+            elif arguments['--bisect']:
+                run_bisect_command(arguments)
+            elif arguments['--watch']:
+                run_watch_command(arguments)
+            elif arguments['--plan']:
+                run_plan_command(arguments)
+            else:
+                run_tests_command(arguments)
+        finally:
+            ISOLATION.close()
+            if ADMISSION.enabled:
+                admission = ADMISSION.description
+                print('Admission control queued %d invocations for %.1f seconds in total; at most %.1f MB was '
+                      'committed at once.' % (admission['queued_invocations'], admission['queued_seconds'],
+                                              admission['peak_weight'] / 1e6))
+            if trace_location:
+                TRACER.write(trace_location)
+                print('Trace written to %s.' % trace_location)
+
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line (by default, `sys.argv`). docopt matches the command line against every usage pattern, and
+    the options it parses are shared between the attempts, so each repetition of an option (e.g. --implementation)
+    matched by the default pattern would be counted again by the pattern of the selected mode. The command line is
+    therefore parsed again against the selected mode's pattern alone, which determines the repeated options' values.
+    :return: the arguments, as returned by docopt.
+    """
+    arguments = docopt(__doc__, argv)
+    mode = next((option for option in MODE_OPTIONS if arguments[option]), None)
+    usage, options = __doc__.split('\nOptions:', 1)
+    header, patterns = usage.split('Usage:\n', 1)
+    pattern = []
+    selected = False
+    for line in patterns.splitlines(True):
+        if line.lstrip().startswith('ion_test_driver.py'):
+            if pattern:
                 break
-            except Exception as e:
-                if n < RETRY_ATTEMPTS - 1:
-                    print('Retry installation, attempts: %d.' % (n + 1))
-                    continue
-                else:
-                    raise e
-        ion_tests_source = arguments['--ion-tests']
-        if not ion_tests_source:
-            ion_tests_source = ION_TESTS_SOURCE
-        ion_tests_dir = IonResource(
-            output_root, 'ion-tests', *tokenize_description(ion_tests_source, has_name=False)
-        ).install()
-        results_root = os.path.join(output_root, 'results')
-        results_file = arguments['--results-file']
-        if not results_file:
-            results_file = RESULTS_FILE_DEFAULT
-        test_type_strs = arguments['--test']
-        if 'all' in test_type_strs:
-            test_types = list(TestType.__iter__())
-        else:
-            test_types = [test_type_from_str(x) for x in test_type_strs]
-        test_file_filter = arguments['<test_file>']
-        test_all(implementations, ion_tests_dir, test_types, test_file_filter, results_root, results_file)
+            # Each mode's pattern starts with its option; the default mode's starts with an optional element.
+            selector = line.split()[1]
+            selected = selector.strip('()') == mode if mode is not None else selector.startswith('[')
+        if selected:
+            pattern.append(line)
+    arguments.update(docopt('%sUsage:\n%s\nOptions:%s' % (header, ''.join(pattern), options), argv))
+    return arguments
 
 
 if __name__ == '__main__':
-    ion_test_driver(docopt(__doc__))
+    ion_test_driver(parse_arguments())
@@ -0,0 +1,349 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+
+"""
+Throughput benchmarks for Ion implementations over large, deterministically generated Ion corpora.
+"""
+
+import base64
+import os
+import random
+from datetime import datetime
+from decimal import Decimal
+from io import FileIO
+
+import six
+from amazon.ion import simpleion
+from amazon.ion.core import IonType, TimestampPrecision, timestamp
+from amazon.ion.simple_types import IonPySymbol
+
+from amazon.iontest.ion_test_driver_config import PERF_ELAPSED_TIME_UNIT
+from amazon.iontest.ion_test_driver_util import mean_confidence_interval, TRACER, ISOLATION
+
+CORPUS_SHAPES = ('nested', 'wide_structs', 'long_strings', 'symbols', 'decimals', 'timestamps')
+CORPUS_ENCODINGS = (('text', '.ion'), ('binary', '.10n'))
+CORPUS_MANIFEST = 'manifest.ion'
+
+# Benchmark modes. Key: name, value: the `process --output-format` that exercises it.
+BENCHMARK_MODES = (
+    ('read', 'none'),
+    ('text-write', 'text'),
+    ('binary-write', 'binary')
+)
+
+# Maximum number of top-level values and events serialized per call to simpleion.dump. Each call begins a new stream
+# (and, in binary, a new local symbol table), which mirrors the periodic flushes of a long-running writer.
+VALUES_PER_CHUNK = 64
+EVENTS_PER_CHUNK = 10000
+
+SYMBOL_VOCABULARY_SIZE = 100000
+FIELD_VOCABULARY_SIZE = 2000
+MAX_NESTING_DEPTH = 24
+MAX_NESTED_NODES = 256
+
+
+class CorpusGenerator:
+    def __init__(self, seed):
+        """
+        Generates Ion values of each of the CORPUS_SHAPES. The sequence of values is fully determined by `seed`.
+        """
+        self.__random = random.Random(seed)
+        self.__nodes_remaining = 0
+
+    def __scalar(self):
+        choice = self.__random.randrange(5)
+        if choice == 0:
+            return self.__random.randrange(-2 ** 70, 2 ** 70)
+        if choice == 1:
+            return self.__random.uniform(-1e6, 1e6)
+        if choice == 2:
+            return self.__decimal()
+        if choice == 3:
+            return self.__string(self.__random.randrange(1, 32))
+        return self.__symbol()
+
+    def __string(self, length):
+        raw = self.__random.getrandbits(length * 6).to_bytes((length * 6 + 7) // 8, 'little')
+        text = base64.b64encode(raw).decode('ascii')[:length]
+        if length > 16 and self.__random.random() < 0.25:
+            text += u'é中\U0001f600'  # Exercise multi-byte UTF-8.
+        return text
+
+    def __symbol(self):
+        return IonPySymbol.from_value(IonType.SYMBOL, 'sym_%x' % self.__random.randrange(SYMBOL_VOCABULARY_SIZE))
+
+    def __field_name(self):
+        return 'field_%d' % self.__random.randrange(FIELD_VOCABULARY_SIZE)
+
+    def __decimal(self):
+        digits = tuple(self.__random.randrange(10) for _ in range(self.__random.randrange(1, 35)))
+        return Decimal((self.__random.randrange(2), digits, self.__random.randrange(-40, 20)))
+
+    def __timestamp(self):
+        precision = self.__random.choice((TimestampPrecision.YEAR, TimestampPrecision.MONTH, TimestampPrecision.DAY,
+                                          TimestampPrecision.MINUTE, TimestampPrecision.SECOND))
+        year = self.__random.randrange(1, 10000)
+        month = self.__random.randrange(1, 13)
+        day = self.__random.randrange(1, 29)
+        if not precision.includes_minute:
+            return timestamp(year, month if precision.includes_month else 1, day if precision.includes_day else 1,
+                             precision=precision)
+        offset = self.__random.randrange(-23 * 60, 24 * 60)
+        fractional_precision = None
+        microsecond = None
+        if precision is TimestampPrecision.SECOND and self.__random.random() < 0.5:
+            fractional_precision = self.__random.randrange(1, 7)
+            microsecond = self.__random.randrange(10 ** fractional_precision) * 10 ** (6 - fractional_precision)
+        return timestamp(year, month, day, self.__random.randrange(24), self.__random.randrange(60),
+                         self.__random.randrange(60), microsecond, off_hours=int(offset / 60),
+                         off_minutes=int(offset % 60) if offset >= 0 else -int(-offset % 60), precision=precision,
+                         fractional_precision=fractional_precision)
+
+    def __nested(self, depth):
+        if depth == 0:
+            return self.__scalar()
+        # Branch only while the value's node budget lasts so that growth with depth stays linear.
+        width = self.__random.randrange(1, 4) if self.__nodes_remaining > 0 else 1
+        self.__nodes_remaining -= width
+        if self.__random.random() < 0.5:
+            return [self.__nested(depth - 1) for _ in range(width)]
+        return {self.__field_name(): self.__nested(depth - 1) for _ in range(width)}
+
+    def value(self, shape):
+        """
+        Generates a single top-level value of the given shape.
+        """
+        if shape == 'nested':
+            self.__nodes_remaining = self.__random.randrange(MAX_NESTED_NODES // 4, MAX_NESTED_NODES)
+            return self.__nested(self.__random.randrange(MAX_NESTING_DEPTH // 2, MAX_NESTING_DEPTH + 1))
+        if shape == 'wide_structs':
+            return {self.__field_name(): self.__scalar() for _ in range(self.__random.randrange(200, 1000))}
+        if shape == 'long_strings':
+            return self.__string(self.__random.randrange(1024, 16 * 1024))
+        if shape == 'symbols':
+            return [self.__symbol() for _ in range(self.__random.randrange(100, 500))]
+        if shape == 'decimals':
+            return [self.__decimal() for _ in range(self.__random.randrange(100, 500))]
+        if shape == 'timestamps':
+            return [self.__timestamp() for _ in range(self.__random.randrange(100, 500))]
+        raise ValueError('Unknown corpus shape %s.' % shape)
+
+
+def count_events(value):
+    """
+    Counts the value events (CONTAINER_START, SCALAR, and CONTAINER_END) that an EventStream representing `value`
+    contains.
+    """
+    if isinstance(value, dict):
+        return 2 + sum(count_events(child) for child in six.itervalues(value))
+    if isinstance(value, list):
+        return 2 + sum(count_events(child) for child in value)
+    return 1
+
+
+def generate_benchmark_corpus(corpus_root, seed, size):
+    """
+    Generates (or reuses, if it has already been generated) the corpus for the given seed and size. For each of the
+    CORPUS_SHAPES, the same values are written as both a text and a binary Ion stream, with the text stream growing
+    to approximately `size` bytes.
+    :param corpus_root: The directory under which all corpora are stored.
+    :param seed: Seed for the generated values.
+    :param size: Approximate size, in bytes, of each text stream.
+    :return: The corpus manifest: a list of dicts with `name`, `shape`, `encoding`, `size`, `values` and `events`
+        fields, whose names are relative to the returned corpus directory. Returned as a tuple (directory, manifest).
+    """
+    corpus_dir = os.path.join(corpus_root, '%d_%d' % (seed, size))
+    manifest_location = os.path.join(corpus_dir, CORPUS_MANIFEST)
+    if os.path.isfile(manifest_location):
+        manifest_in = FileIO(manifest_location, mode='rb')
+        try:
+            return corpus_dir, simpleion.load(manifest_in, single_value=False)
+        finally:
+            manifest_in.close()
+    if not os.path.isdir(corpus_dir):
+        os.makedirs(corpus_dir)
+    print('Generating %d-byte benchmark corpus with seed %d.' % (size, seed))
+    manifest = []
+    for shape in CORPUS_SHAPES:
+        # Each shape gets its own generator so that adding a shape doesn't change the values of the others.
+        generator = CorpusGenerator('%d/%s' % (seed, shape))
+        outputs = [(encoding, shape + suffix, FileIO(os.path.join(corpus_dir, shape + suffix), mode='wb'))
+                   for encoding, suffix in CORPUS_ENCODINGS]
+        values = 0
+        events = 0
+        try:
+            text_out = outputs[0][2]
+            while text_out.tell() < size:
+                chunk = []
+                chunk_events = 0
+                while len(chunk) < VALUES_PER_CHUNK and chunk_events < EVENTS_PER_CHUNK:
+                    value = generator.value(shape)
+                    chunk.append(value)
+                    chunk_events += count_events(value)
+                for encoding, _, out in outputs:
+                    simpleion.dump(chunk, out, binary=encoding == 'binary', sequence_as_stream=True)
+                values += len(chunk)
+                events += chunk_events
+        finally:
+            for _, _, out in outputs:
+                out.close()
+        for encoding, name, _ in outputs:
+            manifest.append({
+                'name': name,
+                'shape': shape,
+                'encoding': encoding,
+                'size': os.path.getsize(os.path.join(corpus_dir, name)),
+                'values': values,
+                'events': events
+            })
+    # The manifest is written last; its presence marks the corpus as complete.
+    manifest_out = FileIO(manifest_location, mode='wb')
+    try:
+        simpleion.dump(manifest, manifest_out, binary=False, sequence_as_stream=True)
+    finally:
+        manifest_out.close()
+    return corpus_dir, manifest
+
+
+def load_first_value(location):
+    """
+    Loads the first top-level value from the given Ion file, or returns None if the file is missing or empty.
+    """
+    if not os.path.isfile(location):
+        return None
+    data_in = FileIO(location, mode='rb')
+    try:
+        values = simpleion.load(data_in, single_value=False)
+    finally:
+        data_in.close()
+    return values[0] if len(values) != 0 else None
+
+
+def benchmark_error(process_result, error_location):
+    """
+    Determines whether a benchmark invocation failed.
+    :return: a message describing the failure, or None if it succeeded.
+    """
+    if process_result.timed_out:
+        return 'Timed out after %.1f seconds.' % process_result.metrics.wall_time
+    if len(process_result.stderr) != 0:
+        return 'Produced stderr output "%s".' % process_result.stderr.decode('utf-8', 'replace')
+    if load_first_value(error_location) is not None:
+        return 'Produced an ErrorReport at %s.' % error_location
+    return None
+
+
+def benchmark_implementation(ion_implementation, corpus_dir, entry, mode, output_format, warmups, repetitions,
+                             output_root):
+    """
+    Runs `process` with the given implementation over one corpus file in one mode.
+    :return: a dict summarizing the measured repetitions, suitable for serialization as an Ion struct.
+    """
+    result = {
+        'implementation': ion_implementation.identifier,
+        'corpus': entry['name'],
+        'shape': entry['shape'],
+        'encoding': entry['encoding'],
+        'mode': mode,
+        'size': entry['size'],
+        'events': entry['events']
+    }
+    run_root = os.path.join(output_root, ion_implementation.identifier, entry['name'], mode)
+    if not os.path.isdir(run_root):
+        os.makedirs(run_root)
+    output = os.path.join(run_root, 'output' + ('.10n' if output_format == 'binary' else '.ion'))
+    errors = os.path.join(run_root, 'errors.ion')
+    perf_report = os.path.join(run_root, 'perf.ion')
+    input_location = os.path.join(corpus_dir, entry['name'])
+    seconds = []
+    for n in range(warmups + repetitions):
+        for stale in (errors, perf_report):
+            if os.path.isfile(stale):
+                os.remove(stale)
+        args = ('process', '--error-report', errors, '--output-format', output_format)
+        if output_format != 'none':
+            args += ('--output', output)
+        if n >= warmups:
+            args += ('--perf-report', perf_report)
+        with TRACER.context(phase=mode, test_file=input_location):
+            process_result = ion_implementation.execute(*(args + (input_location,)))
+        message = benchmark_error(process_result, errors)
+        if message is not None:
+            result['error'] = message
+            break
+        if n >= warmups:
+            report = load_first_value(perf_report)
+            if report is not None and report.get('elapsed_time'):
+                seconds.append(report['elapsed_time'] * PERF_ELAPSED_TIME_UNIT)
+            else:
+                seconds.append(process_result.metrics.wall_time)
+    if os.path.isfile(output):
+        os.remove(output)  # The re-written corpus can be large, and it isn't needed for anything else.
+    result['seconds'] = seconds
+    if seconds:
+        for field, amount in (('throughput', entry['size'] / (1024.0 * 1024.0)), ('event_rate', entry['events'])):
+            mean, low, high = mean_confidence_interval([amount / s for s in seconds if s > 0] or [0.0])
+            result[field] = {'mean': mean, 'ci_low': low, 'ci_high': high}
+    return result
+
+
+def run_benchmarks(ion_implementations, output_root, results_file, seed, size, warmups, repetitions):
+    """
+    Generates the benchmark corpus for the given seed and size, measures every implementation in every one of the
+    BENCHMARK_MODES over every corpus file, and writes the results to `results_file`.
+    :param ion_implementations: The installed IonImplementations to measure.
+    :param output_root: Root directory for the corpus and the benchmark output.
+    :param results_file: The Ion file to which the results are written. Throughput is reported in MB/s and event rate
+        in events/s, each as a mean with a 95% confidence interval.
+    """
+    benchmark_root = os.path.join(output_root, 'benchmark')
+    corpus_dir, manifest = generate_benchmark_corpus(os.path.join(benchmark_root, 'corpus'), seed, size)
+    results = []
+    print('Running benchmarks.', end='', flush=True)
+    for ion_implementation in ion_implementations:
+        for entry in manifest:
+            for mode, output_format in BENCHMARK_MODES:
+                results.append(benchmark_implementation(ion_implementation, corpus_dir, entry, mode, output_format,
+                                                        warmups, repetitions, os.path.join(benchmark_root, 'runs')))
+                print('.', end='', flush=True)
+    summary = {
+        'seed': seed,
+        'corpus_size': size,
+        'warmups': warmups,
+        'repetitions': repetitions,
+        'date': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'results': results
+    }
+    if ISOLATION.description:
+        summary['isolation'] = ISOLATION.description
+    results_out = FileIO(results_file, mode='wb')
+    try:
+        simpleion.dump(summary, results_out, binary=False, indent=' ')
+    finally:
+        results_out.close()
+    print('\nBenchmarks complete. Results written to %s.' % results_file)
+    print('%-24s %-20s %-13s %26s %30s' % ('implementation', 'corpus', 'mode', 'throughput (MB/s, 95% CI)',
+                                           'events/s (95% CI)'))
+    for result in results:
+        if 'throughput' not in result:
+            print('%-24s %-20s %-13s %s' % (result['implementation'], result['corpus'], result['mode'],
+                                            result.get('error', 'no samples')))
+            continue
+        throughput = result['throughput']
+        event_rate = result['event_rate']
+        print('%-24s %-20s %-13s %26s %30s' % (
+            result['implementation'], result['corpus'], result['mode'],
+            '%.2f [%.2f, %.2f]' % (throughput['mean'], throughput['ci_low'], throughput['ci_high']),
+            '%.0f [%.0f, %.0f]' % (event_rate['mean'], event_rate['ci_low'], event_rate['ci_high'])
+        ))
@@ -0,0 +1,276 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+
+"""
+In-process equivalence checking of Ion streams and EventStreams, used to avoid spawning implementations' `compare`
+commands when all of their inputs agree.
+"""
+
+import itertools
+from io import FileIO
+
+import six
+from six.moves import zip_longest
+from amazon.ion import simpleion
+from amazon.ion.core import IonType, IonEventType
+from amazon.ion.equivalence import ion_equals
+from amazon.ion.reader import blocking_reader, NEXT_EVENT
+from amazon.ion.reader_binary import binary_reader
+from amazon.ion.reader_managed import managed_reader
+from amazon.ion.reader_text import text_reader
+from amazon.ion.simple_types import IonPyNull, IonPyBool, IonPyInt, IonPyFloat, IonPyDecimal, IonPyTimestamp, \
+    IonPySymbol, IonPyText, IonPyBytes, IonPyList, IonPyDict
+
+EVENT_STREAM_SYMBOL = '$ion_event_stream'
+EMBEDDED_STREAMS_ANNOTATIONS = ('$ion_embedded_streams', 'embedded_documents')
+ION_BINARY_VERSION_MARKER = b'\xe0\x01\x00\xea'
+EVENT_FIELDS = ('event_type', 'ion_type', 'field_name', 'annotations', 'value_text', 'value_binary', 'imports', 'depth')
+
+ION_PY_TYPES = {
+    IonType.NULL: IonPyNull,
+    IonType.BOOL: IonPyBool,
+    IonType.INT: IonPyInt,
+    IonType.FLOAT: IonPyFloat,
+    IonType.DECIMAL: IonPyDecimal,
+    IonType.TIMESTAMP: IonPyTimestamp,
+    IonType.SYMBOL: IonPySymbol,
+    IonType.STRING: IonPyText,
+    IonType.CLOB: IonPyBytes,
+    IonType.BLOB: IonPyBytes,
+    IonType.LIST: IonPyList,
+    IonType.SEXP: IonPyList,
+    IonType.STRUCT: IonPyDict
+}
+
+
+class Undecidable(Exception):
+    """
+    Raised when a stream contains something that can't be compared in-process, e.g. a symbol with unknown text, or an
+    Event that is inconsistent (its value_text and value_binary differ) or has fields the prefilter doesn't compare.
+    Such streams are left to the implementations' comparators.
+    """
+
+
+class EmbeddedStream(list):
+    """
+    The top-level values of an embedded stream: an element of a top-level sequence annotated with one of
+    `EMBEDDED_STREAMS_ANNOTATIONS`. Embedded streams are compared as streams, whether they were read from Ion text (in
+    an Ion stream) or from Events (in an EventStream).
+    """
+
+
+def is_embedded_streams(value):
+    return isinstance(value, IonPyList) and any(getattr(annotation, 'text', annotation) in EMBEDDED_STREAMS_ANNOTATIONS
+                                                for annotation in value.ion_annotations)
+
+
+def _embedded_streams_from_text(value):
+    # Replaces the Ion text elements of a top-level embedded streams sequence with their values.
+    if is_embedded_streams(value):
+        for i, element in enumerate(value):
+            if isinstance(element, six.text_type) and not isinstance(element, IonPyNull):
+                value[i] = EmbeddedStream(simpleion.loads(six.text_type(element), single_value=False))
+    return value
+
+
+def _symbol_text(token):
+    text = getattr(token, 'text', token)
+    if text is None:
+        raise Undecidable('Symbol with unknown text.')
+    return text
+
+
+def _value_from_reader(event, reader):
+    # Builds the value that starts with the given event, consuming the rest of its events from the reader.
+    annotations = tuple(_symbol_text(annotation) for annotation in event.annotations)
+    if event.event_type is IonEventType.CONTAINER_START:
+        container = ION_PY_TYPES[event.ion_type].from_value(event.ion_type, {} if event.ion_type is IonType.STRUCT
+                                                             else [], annotations)
+        child = reader.send(NEXT_EVENT)
+        while child.event_type is not IonEventType.CONTAINER_END:
+            value = _value_from_reader(child, reader)
+            if event.ion_type is IonType.STRUCT:
+                container.add_item(_symbol_text(child.field_name), value)
+            else:
+                container.append(value)
+            child = reader.send(NEXT_EVENT)
+        return container
+    if event.value is None or event.ion_type is IonType.NULL:
+        return IonPyNull.from_value(event.ion_type, None, annotations)
+    if event.ion_type is IonType.SYMBOL:
+        _symbol_text(event.value)
+    return ION_PY_TYPES[event.ion_type].from_value(event.ion_type, event.value, annotations)
+
+
+def read_values(location):
+    """
+    Reads the top-level values of the Ion stream (text or binary) at the given location one at a time, so that only
+    the current value is held in memory.
+    """
+    data_in = FileIO(location, mode='rb')
+    try:
+        raw_reader = binary_reader() if data_in.read(4) == ION_BINARY_VERSION_MARKER else text_reader()
+        data_in.seek(0)
+        reader = blocking_reader(managed_reader(raw_reader), data_in)
+        event = reader.send(NEXT_EVENT)
+        while event.event_type is not IonEventType.STREAM_END:
+            yield _value_from_reader(event, reader)
+            event = reader.send(NEXT_EVENT)
+    finally:
+        data_in.close()
+
+
+def _event_field(event, name):
+    value = event.get(name)
+    if value is None or isinstance(value, IonPyNull):
+        return None
+    return value
+
+
+def _check_event(event, depth):
+    # Events with fields that aren't compared in-process, or at the wrong depth, are left to the implementations.
+    for name in event:
+        if _symbol_text(name) not in EVENT_FIELDS:
+            raise Undecidable('Event with an unexpected %s field.' % _symbol_text(name))
+    event_depth = _event_field(event, 'depth')
+    if event_depth is not None and event_depth != depth:
+        raise Undecidable('Event at depth %d has depth %d.' % (depth, event_depth))
+
+
+def _event_type(event):
+    event_type = _event_field(event, 'event_type')
+    if event_type is None:
+        raise Undecidable('Event without an event_type.')
+    return _symbol_text(event_type)
+
+
+def _embedded_stream_from_events(events, depth):
+    # Builds an embedded stream from the Events that precede its STREAM_END.
+    stream = EmbeddedStream()
+    for event in events:
+        event_type = _event_type(event)
+        if event_type == 'SYMBOL_TABLE':
+            continue
+        if event_type == 'STREAM_END':
+            return stream
+        stream.append(_value_from_events(event, events, depth=depth))
+    raise Undecidable('Unterminated embedded stream.')
+
+
+def _value_from_events(event, events, top_level=False, depth=0):
+    # Builds the value that starts with the given Event, consuming the rest of its Events from the iterator.
+    _check_event(event, depth)
+    event_type = _event_type(event)
+    annotations = tuple(_symbol_text(_event_field(token, 'text')) for token in _event_field(event, 'annotations') or ())
+    embedded = top_level and any(annotation in EMBEDDED_STREAMS_ANNOTATIONS for annotation in annotations)
+    ion_type = getattr(IonType, _symbol_text(_event_field(event, 'ion_type')), None)
+    if not isinstance(ion_type, IonType):
+        raise Undecidable('Event without a valid ion_type.')
+    if event_type == 'CONTAINER_START':
+        container = ION_PY_TYPES[ion_type].from_value(ion_type, {} if ion_type is IonType.STRUCT else [], annotations)
+        for child in events:
+            child_type = _event_type(child)
+            if child_type == 'SYMBOL_TABLE':
+                continue
+            if child_type == 'CONTAINER_END':
+                _check_event(child, depth)
+                return container
+            if embedded and ion_type is not IonType.STRUCT:
+                # The embedded stream's first Event; the rest follow.
+                container.append(_embedded_stream_from_events(itertools.chain((child,), events), depth + 1))
+                continue
+            value = _value_from_events(child, events, depth=depth + 1)
+            if ion_type is IonType.STRUCT:
+                field_name = _event_field(child, 'field_name')
+                container.add_item(_symbol_text(_event_field(field_name or {}, 'text')), value)
+            else:
+                container.append(value)
+        raise Undecidable('Unterminated container.')
+    if event_type != 'SCALAR':
+        raise Undecidable('Unexpected %s event.' % event_type)
+    # An implementation may write either encoding of the value, or both, which must then agree.
+    values = []
+    value_text = _event_field(event, 'value_text')
+    if value_text is not None:
+        values.append(simpleion.loads(six.text_type(value_text)))
+    value_binary = _event_field(event, 'value_binary')
+    if value_binary is not None:
+        value_binary = bytes(bytearray(value_binary))
+        if not value_binary.startswith(ION_BINARY_VERSION_MARKER):
+            value_binary = ION_BINARY_VERSION_MARKER + value_binary
+        values.append(simpleion.loads(value_binary))
+    if not values:
+        raise Undecidable('Scalar without a value.')
+    value = values[0]
+    if len(values) > 1 and not ion_equals(values[0], values[1]):
+        raise Undecidable("Scalar's value_text and value_binary differ.")
+    if value.ion_type is not ion_type:
+        raise Undecidable('Scalar value does not match its ion_type.')
+    if ion_type is IonType.SYMBOL and not isinstance(value, IonPyNull):
+        _symbol_text(value)
+    value.ion_annotations = annotations
+    return value
+
+
+def stream_values(location):
+    """
+    Reads the top-level values of the Ion stream or EventStream at the given location one at a time. The values of an
+    EventStream are reconstructed from its Events, so that it may be compared with the Ion stream it was read from.
+    Embedded streams are read as `EmbeddedStream`s.
+    :raises Undecidable: If the stream contains symbols with unknown text, or is an invalid EventStream.
+    """
+    values = read_values(location)
+    try:
+        first = next(values, None)
+        if first is None:
+            return
+        if not (isinstance(first, IonPySymbol) and first.text == EVENT_STREAM_SYMBOL and not first.ion_annotations):
+            yield _embedded_streams_from_text(first)
+            for value in values:
+                yield _embedded_streams_from_text(value)
+            return
+        for event in values:
+            event_type = _event_type(event)
+            if event_type == 'SYMBOL_TABLE':
+                continue
+            if event_type == 'STREAM_END':
+                return
+            yield _value_from_events(event, values, top_level=True)
+    finally:
+        values.close()
+
+
+def streams_equivalent(locations):
+    """
+    Determines whether the Ion streams and EventStreams at the given locations are all equivalent under the Ion data
+    model, as an implementation's `compare --comparison-type basic` would. The streams are compared one top-level
+    value at a time, stopping at the first difference.
+    :return: True if all of the streams are equivalent; False if any of them differ; None if the streams can't be
+        compared in-process (see `Undecidable`) or any of them can't be read.
+    """
+    streams = [stream_values(location) for location in locations]
+    end = object()
+    try:
+        for values in zip_longest(*streams, fillvalue=end):
+            first = values[0]
+            for other in values[1:]:
+                if first is end or other is end or not ion_equals(first, other):
+                    return False
+        return True
+    except Exception:
+        # Undecidable, or unreadable; the implementations will report why.
+        return None
+    finally:
+        for stream in streams:
+            stream.close()
@@ -18,12 +18,103 @@ Provides the build logic for Ion resources required by the ion_test_driver.
 
 import os
 
-from amazon.iontest.ion_test_driver_util import IonBuild, NO_OP_BUILD, log_call
+from amazon.iontest.ion_test_driver_python import ION_PYTHON_VERSION, run_cli
+from amazon.iontest.ion_test_driver_util import IonBuild, NO_OP_BUILD, install_no_op, log_call
 
 RESULTS_FILE_DEFAULT = 'ion-test-driver-results.ion'
+FUZZ_SEEDS_FILE_DEFAULT = 'ion-test-driver-fuzz-seeds.ion'
 ION_TESTS_SOURCE = 'https://github.com/amazon-ion/ion-tests.git'
 RETRY_ATTEMPTS = 2
 
+# Limits applied to every invocation of an implementation's CLI. Key: name, value: limit. The timeout (in seconds) and
+# max-stderr (in bytes) limits may be overridden using --<name>; a value of None disables the limit. The deadline is
+# the monotonic time by which the whole run must finish, and is computed from --deadline at the start of the run.
+EXECUTION_LIMITS = {
+    'timeout': 600,
+    'max-stderr': 64 * 1024,
+    'deadline': None
+}
+
+# Policies for the in-process pre-filter that checks whether all of the streams to be compared are equivalent before
+# the implementations' `compare` commands run. When they are, 'skip' runs no basic comparisons and 'reduce' runs them
+# with only the first implementation; any comparisons specific to the test type still run with every implementation.
+# 'off' disables the pre-filter. The policy in effect may be overridden using --prefilter.
+COMPARE_PREFILTER_POLICIES = ('off', 'reduce', 'skip')
+COMPARE_PREFILTER = {
+    'policy': 'off'
+}
+
+# Limits on the size of the results. 'max-failures' is the maximum number of values that a test file's result embeds
+# from each of the ComparisonReports and ErrorReports describing its failures; the number omitted is recorded instead
+# of the rest. None embeds them all, which --results-diff needs to compare them. It may be set using --max-failures.
+REPORT_LIMITS = {
+    'max-failures': None
+}
+
+# Encodings of the EventStreams written when reading the test files. With 'binary', each implementation is asked
+# whether it supports `--output-format events-binary` at the start of the run, and those that don't write text. The
+# encoding is 'text' unless 'binary' is selected using --event-format.
+EVENT_STREAM_FORMATS = ('text', 'binary')
+
+# Seconds between the checks that --watch makes for changes to the watched implementation's source, and the
+# directories under it that are never watched (version control metadata, installed dependencies, and the usual build
+# output directories) when the source is not a git working tree. In a git working tree, only the files that git tracks
+# or would track are watched.
+WATCH_POLL_INTERVAL = 0.5
+WATCH_IGNORED_DIRECTORIES = ('.git', '.hg', '.svn', 'node_modules', 'build', 'target', 'dist')
+
+# Used by --plan to estimate the artifacts' sizes: the size of each output format relative to the size of the test
+# file that it was produced from, by the test file's suffix (measured with ion-python on a mix of structs, lists,
+# strings, decimals, and timestamps), and the typical size in bytes of a PerformanceReport or of the ErrorReport of a
+# bad file. No other ErrorReports are written, and ComparisonReports are empty, when every implementation passes.
+PLAN_OUTPUT_SIZE_RATIOS = {
+    '.ion': {'events': 14.0, 'events-binary': 4.5, 'text': 1.0, 'binary': 0.55},
+    '.10n': {'events': 26.0, 'events-binary': 8.3, 'text': 1.8, 'binary': 1.0}
+}
+PLAN_REPORT_BYTES = 256
+
+# Shard counts for which --plan estimates the wall time.
+PLAN_SHARD_COUNTS = (1, 2, 4, 8, 16)
+
+# The largest accepted exponent of the driver's CPU time in the number of test files, fitted on a log-log scale across
+# the --vector-counts of a --driver-benchmark. Larger exponents mean that some of the driver's work grows superlinearly
+# with the size of ion-tests, and fail the benchmark.
+DRIVER_SCALING_EXPONENT_LIMIT = 1.5
+
+# Number of cores reserved for each implementation process by --isolate.
+ISOLATION_CPUS_PER_PROCESS = 1
+
+# Fraction of the memory available when the run starts that the concurrent invocations of the implementations may
+# use, when test files are tested concurrently (see AdmissionControl). The budget may be set in bytes using
+# --memory-budget. The rest is left for the driver, the page cache, and the rest of the host.
+MEMORY_BUDGET_FRACTION = 0.8
+
+# Memory weight, in bytes, of an implementation whose invocations complete without a measured peak RSS, e.g. on hosts
+# without os.wait4 (see AdmissionControl). Without it, such an implementation's weight would stay unknown, and its
+# invocations would each reserve the whole memory budget and run alone.
+UNMEASURED_MEMORY_WEIGHT = 512 * 1024 * 1024
+
+# Output formats exercised by --perf. 'none' measures reading alone.
+PERF_OUTPUT_FORMATS = ('none', 'text', 'binary')
+
+# Seconds per unit of a PerformanceReport's `elapsed_time`. The CLI specification leaves the unit to the implementation;
+# implementations that integrate with --perf are expected to report milliseconds.
+PERF_ELAPSED_TIME_UNIT = 1e-3
+
+# Minimum relative change in a measurement that --results-diff reports when significant, unless --perf-threshold is
+# given. Without --perf-threshold, changes in the CPU time and memory recorded for ordinary runs are only reported.
+PERF_REPORT_THRESHOLD = 0.1
+
+# Estimated cost, in seconds, of testing a file with an implementation that has no recorded history for enough files
+# to fit its own: a fixed cost per file (dominated by process startup) plus a cost per byte of the file.
+COST_ESTIMATE_DEFAULTS = {
+    'per_file': 0.1,
+    'per_byte': 1e-6
+}
+
+# Weight of the latest observation in a test file's recorded cost; the rest comes from its previous value.
+HISTORY_SMOOTHING = 0.5
+
 # Tools expected to be present on the system. Key: name, value: path. Paths may be overridden using --<name>.
 # Accordingly, if tool dependencies are added here, a corresponding option should be added to the CLI.
 TOOL_DEPENDENCIES = {
@@ -64,7 +155,11 @@ ION_BUILDS = {
     'ion-tests': NO_OP_BUILD,
     'ion-java': IonBuild(install_ion_java, './ion-test-driver-run', ()),
     'ion-js': IonBuild(install_ion_js, os.path.join('test-driver', 'dist', 'Cli.js'),
-                       (TOOL_DEPENDENCIES['node'],))
+                       (TOOL_DEPENDENCIES['node'],)),
+    # Tested in-process, using the ion-python that the driver runs with; see ion_test_driver_python. Not tested by
+    # default, since the driver's ion-python isn't built from a repository; select it with `--implementation`. Its
+    # memory is the driver's own, which the memory budget leaves out, so it reserves none.
+    'ion-python': IonBuild(install_no_op, None, (), in_process=(ION_PYTHON_VERSION, run_cli), memory_weight=0)
     # TODO add more implementations here
 }
 
@@ -0,0 +1,374 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+
+"""
+Aligned diffs of the events of two Ion streams or EventStreams (e.g. the artifacts under read/data and write/*/data),
+used to triage the failures described by ComparisonReports.
+"""
+
+import binascii
+import hashlib
+import struct
+from array import array
+from io import FileIO
+
+import six
+from amazon.ion import simpleion
+from amazon.ion.core import IonEventType, IonType
+from amazon.ion.reader import blocking_reader, NEXT_EVENT
+from amazon.ion.reader_binary import binary_reader
+from amazon.ion.reader_managed import managed_reader
+from amazon.ion.reader_text import text_reader
+from amazon.ion.simple_types import IonPyNull, IonPySymbol
+
+from amazon.iontest.ion_test_driver_compare import EVENT_STREAM_SYMBOL, ION_BINARY_VERSION_MARKER, ION_PY_TYPES, \
+    read_values
+
+CONTAINER_START = 'CONTAINER_START'
+CONTAINER_END = 'CONTAINER_END'
+STREAM_END = 'STREAM_END'
+
+# Events that don't describe data; they're left out of the diff.
+IGNORED_EVENT_TYPES = ('SYMBOL_TABLE', 'VERSION_MARKER')
+
+CONTAINER_DELIMITERS = {
+    'STRUCT': ('{', '}'),
+    'LIST': ('[', ']'),
+    'SEXP': ('(', ')')
+}
+
+
+def _token_text(token):
+    # The text of a SymbolToken read from an Ion stream, or of one represented as a struct in an EventStream.
+    if token is None or isinstance(token, IonPyNull):
+        return None
+    if getattr(token, 'ion_type', None) is IonType.STRUCT:
+        text = token.get('text')
+        if text is not None and not isinstance(text, IonPyNull):
+            return six.text_type(text)
+        location = token.get('import_location')
+        if location is not None and not isinstance(location, IonPyNull):
+            return '$%s#%s' % (location.get('import_name'), location.get('location'))
+        return '$0'
+    text = getattr(token, 'text', token)
+    if text is None:
+        return '$%s' % getattr(token, 'sid', 0)
+    return six.text_type(text)
+
+
+def _value_text(value):
+    # Canonical Ion text of a scalar, so that the same value read from text or binary (or from an Event's value_text or
+    # value_binary) compares equal.
+    return simpleion.dumps(value, binary=False, omit_version_marker=True)
+
+
+def _reader_events(location):
+    # The events of an Ion stream, described as by `stream_events`.
+    data_in = FileIO(location, mode='rb')
+    try:
+        raw_reader = binary_reader() if data_in.read(4) == ION_BINARY_VERSION_MARKER else text_reader()
+        data_in.seek(0)
+        reader = blocking_reader(managed_reader(raw_reader), data_in)
+        while True:
+            event = reader.send(NEXT_EVENT)
+            event_type = event.event_type.name
+            if event_type in IGNORED_EVENT_TYPES:
+                continue
+            if event_type in (CONTAINER_END, STREAM_END):
+                yield event_type, None, None, (), None
+                if event.event_type is IonEventType.STREAM_END:
+                    return
+                continue
+            ion_type = event.ion_type.name
+            value = None
+            if event_type != CONTAINER_START:
+                try:
+                    value = _value_text(ION_PY_TYPES[event.ion_type].from_value(event.ion_type, event.value))
+                except Exception:
+                    value = _token_text(event.value) if isinstance(event.value, IonPySymbol) else repr(event.value)
+            yield (event_type, ion_type, _token_text(event.field_name),
+                   tuple(_token_text(annotation) for annotation in event.annotations), value)
+    finally:
+        data_in.close()
+
+
+def _event_stream_events(values):
+    # The events of an EventStream (following its $ion_event_stream marker), described as by `stream_events`.
+    for event in values:
+        event_type = _token_text(event.get('event_type'))
+        if event_type in IGNORED_EVENT_TYPES:
+            continue
+        if event_type in (CONTAINER_END, STREAM_END):
+            yield event_type, None, None, (), None
+            continue
+        value = None
+        if event_type != CONTAINER_START:
+            value_text = event.get('value_text')
+            value_binary = event.get('value_binary')
+            if value_text is not None and not isinstance(value_text, IonPyNull):
+                try:
+                    value = _value_text(simpleion.loads(six.text_type(value_text)))
+                except Exception:
+                    value = six.text_type(value_text)
+            elif value_binary is not None and not isinstance(value_binary, IonPyNull):
+                value_binary = bytes(bytearray(value_binary))
+                if not value_binary.startswith(ION_BINARY_VERSION_MARKER):
+                    value_binary = ION_BINARY_VERSION_MARKER + value_binary
+                try:
+                    value = _value_text(simpleion.loads(value_binary))
+                except Exception:
+                    value = binascii.hexlify(value_binary).decode('ascii')
+        annotations = event.get('annotations')
+        if annotations is None or isinstance(annotations, IonPyNull):
+            annotations = ()
+        yield (event_type, _token_text(event.get('ion_type')), _token_text(event.get('field_name')),
+               tuple(_token_text(annotation) for annotation in annotations), value)
+
+
+def stream_events(location):
+    """
+    Reads the events of the Ion stream or EventStream at the given location one at a time. Each event is described by
+    a tuple (event type, Ion type, field name, annotations, value), in which the value is the canonical Ion text of a
+    scalar, so that the same data read from an Ion stream or from an EventStream, in text or binary, is described
+    identically. Symbol tables and version markers are omitted, as are the Ion types of CONTAINER_END events, which
+    EventStreams needn't include.
+    """
+    values = read_values(location)
+    try:
+        first = next(values, None)
+        if isinstance(first, IonPySymbol) and first.text == EVENT_STREAM_SYMBOL and not first.ion_annotations:
+            for event in _event_stream_events(values):
+                yield event
+            return
+    finally:
+        values.close()
+    for event in _reader_events(location):
+        yield event
+
+
+def event_key(event):
+    """
+    The first 8 bytes of the SHA-1 digest of an event's description (see `stream_events`), as a signed integer. Unlike
+    `hash`, which isn't designed to resist collisions, it makes the chance that two distinct events share a key (which
+    would hide a divergence) negligible.
+    """
+    return struct.unpack('<q', hashlib.sha1(repr(event).encode('utf-8')).digest()[:8])[0]
+
+
+def event_keys(location):
+    """
+    Keys each of the events of the stream at the given location (see `event_key`), so that streams of millions of
+    events can be aligned in memory.
+    """
+    return array('q', (event_key(event) for event in stream_events(location)))
+
+
+def _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi):
+    # Finds the middle snake of a shortest edit script between a[a_lo:a_hi] and b[b_lo:b_hi] by searching forward from
+    # the start and backward from the end until the paths overlap (Myers, "An O(ND) Difference Algorithm and Its
+    # Variations", section 4b). Returns the snake's start and end, relative to (a_lo, b_lo).
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    delta = n - m
+    odd = delta % 2 != 0
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            if odd and delta - (d - 1) <= k <= delta + (d - 1) and x + backward[offset + delta - k] >= n:
+                return start_x, start_y, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            start_x, start_y = x, y
+            while x < n and y < m and a[a_hi - 1 - x] == b[b_hi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return n - x, m - y, n - start_x, m - start_y
+    raise ValueError('No middle snake found.')  # Unreachable: every pair of sequences has an edit script.
+
+
+def align_events(a, b):
+    """
+    Computes a minimal diff between two sequences of event keys (see `event_keys`) using Myers' linear-space
+    algorithm, which needs memory proportional to the sequences' lengths and time proportional to their lengths times
+    the size of the diff.
+    :return: The divergent regions, in order, as tuples (a_start, a_end, b_start, b_end): the events a[a_start:a_end]
+        are replaced by b[b_start:b_end]. Either range may be empty.
+    """
+    regions = []
+    pending = [(0, len(a), 0, len(b))]
+    while pending:
+        a_lo, a_hi, b_lo, b_hi = pending.pop()
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+        if a_lo == a_hi or b_lo == b_hi:
+            if a_lo != a_hi or b_lo != b_hi:
+                regions.append((a_lo, a_hi, b_lo, b_hi))
+            continue
+        start_x, start_y, end_x, end_y = _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi)
+        # The later half is pushed first, so that regions are found in order.
+        pending.append((a_lo + end_x, a_hi, b_lo + end_y, b_hi))
+        pending.append((a_lo, a_lo + start_x, b_lo, b_lo + start_y))
+    merged = []
+    for region in regions:
+        if merged and merged[-1][1] == region[0] and merged[-1][3] == region[2]:
+            merged[-1] = (merged[-1][0], region[1], merged[-1][2], region[3])
+        else:
+            merged.append(region)
+    return merged
+
+
+def _describe_container(event):
+    event_type, ion_type, field_name, annotations, _ = event
+    description = ''.join('%s::' % annotation for annotation in annotations) + ion_type.lower()
+    if field_name is not None:
+        description = '%s: %s' % (field_name, description)
+    return description
+
+
+def _render_event(event, start):
+    # Renders an event as a line of Ion text. The start of the container that a CONTAINER_END closes is given.
+    event_type, ion_type, field_name, annotations, value = event
+    if event_type == STREAM_END:
+        return '<end of stream>'
+    if event_type == CONTAINER_END:
+        return CONTAINER_DELIMITERS.get(start[1] if start else None, ('', '<end of container>'))[1]
+    text = ''.join('%s::' % annotation for annotation in annotations)
+    if event_type == CONTAINER_START:
+        text += CONTAINER_DELIMITERS.get(ion_type, ('<%s>' % ion_type,))[0]
+    else:
+        text += value if value is not None else '<%s>' % ion_type
+    if field_name is not None:
+        text = '%s: %s' % (field_name, text)
+    return text
+
+
+def collect_events(location, windows, path_indices=()):
+    """
+    Reads the given events of the stream at the given location, with the containers that enclose the given events.
+    :param windows: The (start, end) ranges of the events to read, in order.
+    :param path_indices: The indices of the events whose enclosing containers are described, e.g. the first event of
+        each divergent region.
+    :return: A tuple (lines, paths): each requested event's index mapped to a tuple (depth, rendered event), and each
+        of `path_indices` mapped to descriptions of the containers that enclose its event, outermost first.
+    """
+    lines = {}
+    paths = {}
+    containers = []
+    window = 0
+    last_path_index = max(path_indices) if path_indices else -1
+    for index, event in enumerate(stream_events(location)):
+        while window < len(windows) and windows[window][1] <= index:
+            window += 1
+        if window == len(windows) and index > last_path_index:
+            break
+        if index in path_indices:
+            paths[index] = [_describe_container(container) for container in containers]
+        event_type = event[0]
+        if event_type == CONTAINER_END and containers:
+            closed = containers.pop()
+        else:
+            closed = None
+        if window < len(windows) and windows[window][0] <= index:
+            lines[index] = (len(containers), _render_event(event, closed))
+        if event_type == CONTAINER_START:
+            containers.append(event)
+    return lines, paths
+
+
+def diff_event_streams(first_location, second_location, context=3):
+    """
+    Prints the divergent regions of the aligned events of two Ion streams or EventStreams, each with up to `context`
+    agreeing events around it, the depth of each event (as indentation), and the containers (with their field names and
+    annotations) that enclose the region.
+    :return: The number of divergent regions.
+    """
+    a = event_keys(first_location)
+    b = event_keys(second_location)
+    a_length = len(a)
+    b_length = len(b)
+    regions = align_events(a, b)
+    del a, b
+    print('--- %s (%d events)' % (first_location, a_length))
+    print('+++ %s (%d events)' % (second_location, b_length))
+    if not regions:
+        print("The streams' events are identical.")
+        return 0
+    # Regions whose context overlaps are shown together, as hunks. Between regions the streams agree, so each hunk's
+    # window spans the same number of agreeing events in both streams.
+    hunks = []
+    for region in regions:
+        if hunks and region[0] - hunks[-1][-1][1] <= 2 * context:
+            hunks[-1].append(region)
+        else:
+            hunks.append([region])
+    a_windows = [(max(0, hunk[0][0] - context), min(a_length, hunk[-1][1] + context)) for hunk in hunks]
+    b_windows = [(max(0, hunk[0][2] - context), min(b_length, hunk[-1][3] + context)) for hunk in hunks]
+    # Each hunk is described by the containers that enclose its first divergent event, which its context may not share.
+    a_lines, a_paths = collect_events(first_location, a_windows, set(hunk[0][0] for hunk in hunks))
+    b_lines, _ = collect_events(second_location, b_windows)
+
+    def line(marker, a_index, b_index, depth_and_text):
+        depth, text = depth_and_text
+        return '%s %9s %9s  %s%s' % (marker, '' if a_index is None else a_index, '' if b_index is None else b_index,
+                                     '  ' * depth, text)
+
+    removed = 0
+    added = 0
+    for hunk, (a_index, a_window_end), (b_index, b_window_end) in zip(hunks, a_windows, b_windows):
+        path = a_paths.get(hunk[0][0])
+        print('@@ first events %d-%d, second events %d-%d, in %s @@' % (
+            a_index, a_window_end - 1, b_index, b_window_end - 1, ' > '.join(path) if path else 'the top level'))
+        for a_start, a_end, b_start, b_end in hunk:
+            while a_index < a_start:
+                print(line(' ', a_index, b_index, a_lines[a_index]))
+                a_index += 1
+                b_index += 1
+            for i in range(a_start, a_end):
+                print(line('-', i, None, a_lines[i]))
+            for i in range(b_start, b_end):
+                print(line('+', None, i, b_lines[i]))
+            removed += a_end - a_start
+            added += b_end - b_start
+            a_index = a_end
+            b_index = b_end
+        while a_index < a_window_end:
+            print(line(' ', a_index, b_index, a_lines[a_index]))
+            a_index += 1
+            b_index += 1
+    print('%d divergent regions: %d events only in the first stream, %d only in the second.'
+          % (len(regions), removed, added))
+    return len(regions)
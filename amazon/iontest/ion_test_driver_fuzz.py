@@ -0,0 +1,192 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+
+"""
+Seeded fuzz testing of Ion implementations' readers with randomly generated traversals: streams of ReadInstructions
+(see the README) given to `process --traverse`.
+"""
+
+import hashlib
+import os
+import random
+from io import FileIO
+
+import six
+from amazon.ion import simpleion
+from amazon.ion.core import IonType
+from amazon.ion.simple_types import IonPyNull, IonPySymbol
+
+from amazon.iontest.ion_test_driver_compare import read_values
+
+READ_INSTRUCTIONS = ('NEXT', 'SKIP')
+
+# Upper bound on the length of a traversal. Traversals of small vectors are bounded by twice the number of events in
+# the vector, which is enough to reach (and overrun) the end of the stream.
+MAX_INSTRUCTIONS = 4096
+
+# Number of events assumed for vectors that can't be read in-process, e.g. because they contain symbols with unknown
+# text.
+DEFAULT_EVENT_COUNT = 64
+
+
+class Traversal:
+    __slots__ = ('seed', 'location', 'event_count')
+
+    def __init__(self, seed, location, event_count):
+        """
+        A traversal of one vector, generated from `seed` (see `generate_traversal`).
+        :param seed: The traversal's seed.
+        :param location: The file to which the traversal's ReadInstructions are written.
+        :param event_count: The number of events in the vector.
+        """
+        self.seed = seed
+        self.location = location
+        self.event_count = event_count
+
+    @property
+    def name(self):
+        return '%d' % self.seed
+
+    def write(self):
+        """
+        Generates the traversal's ReadInstructions and writes them to its location.
+        """
+        directory = os.path.dirname(self.location)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        instructions = [IonPySymbol.from_value(IonType.SYMBOL, instruction)
+                        for instruction in generate_traversal(self.seed, self.event_count)]
+        traversal_out = FileIO(self.location, mode='wb')
+        try:
+            simpleion.dump(instructions, traversal_out, binary=False, sequence_as_stream=True)
+        finally:
+            traversal_out.close()
+
+
+def traversal_seed(seed, digest, index):
+    """
+    Derives the seed of the index-th traversal of a vector in a fuzz run with the given seed. Because the vector's
+    digest is included, changing one vector doesn't change the traversals of any other.
+    """
+    material = ('%d:%s:%d' % (seed, digest, index)).encode('utf-8')
+    return int(hashlib.sha1(material).hexdigest()[:15], 16)
+
+
+def generate_traversal(seed, event_count):
+    """
+    Generates the ReadInstructions of the traversal with the given seed over a vector with `event_count` events. The
+    traversal's length and its mix of NEXT and SKIP vary with the seed, so that traversals range from a few steps to
+    more than a full traversal, and from mostly stepping in to mostly skipping.
+    """
+    generator = random.Random(seed)
+    length = generator.randint(1, min(MAX_INSTRUCTIONS, 2 * event_count + 2))
+    next_probability = generator.uniform(0.5, 0.95)
+    return [READ_INSTRUCTIONS[0] if generator.random() < next_probability else READ_INSTRUCTIONS[1]
+            for _ in range(length)]
+
+
+def _value_event_count(value):
+    if isinstance(value, IonPyNull):
+        return 1
+    if value.ion_type is IonType.STRUCT:
+        return 2 + sum(_value_event_count(child) for _, child in six.iteritems(value))
+    if value.ion_type in (IonType.LIST, IonType.SEXP):
+        return 2 + sum(_value_event_count(child) for child in value)
+    return 1
+
+
+def vector_event_count(path):
+    """
+    Counts the value events in an EventStream representing the vector at the given path, or returns
+    DEFAULT_EVENT_COUNT if it can't be read in-process.
+    """
+    try:
+        return sum(_value_event_count(value) for value in read_values(path))
+    except Exception:
+        return DEFAULT_EVENT_COUNT
+
+
+class FailingSeeds:
+    def __init__(self, location):
+        """
+        The traversals that failed in previous fuzz runs, which are replayed by later runs until they pass. Stored as
+        Ion at `location`, in the form
+        {'good/one.ion': [{seed: 1234, digest: "ab12...", signature: ["ion-c:read_compare", "ion-java:read_error"]}]},
+        where digest is the SHA-1 of the vector's contents and signature describes the failure: each implementation
+        (by name) that failed, with the field of its result under which the failure was recorded. Only the first seed
+        found with each signature is kept for each vector, so that a bug found by many traversals is stored once.
+        """
+        self.__location = location
+        self.__entries = self.__load()
+        self.__updated = False
+
+    def __load(self):
+        if not os.path.isfile(self.__location):
+            return {}
+        seeds_in = FileIO(self.__location, mode='rb')
+        try:
+            values = simpleion.load(seeds_in, single_value=False)
+        finally:
+            seeds_in.close()
+        if len(values) == 0:
+            return {}
+        return {six.text_type(key): [{
+            'seed': int(entry['seed']),
+            'digest': six.text_type(entry['digest']),
+            'signature': [six.text_type(part) for part in entry['signature']]
+        } for entry in entries] for key, entries in six.iteritems(values[0])}
+
+    def seeds(self, key, digest):
+        """
+        The seeds of the stored failures of the given vector, as long as its contents haven't changed.
+        """
+        return [entry['seed'] for entry in self.__entries.get(key, []) if entry['digest'] == digest]
+
+    def add(self, key, digest, seed, signature):
+        """
+        Records a failing traversal.
+        :return: True if the failure's signature is new for the vector; False if it was already stored.
+        """
+        entries = self.__entries.setdefault(key, [])
+        signature = sorted(signature)
+        for entry in entries:
+            if entry['digest'] == digest and (entry['signature'] == signature or entry['seed'] == seed):
+                return False
+        entries.append({'seed': seed, 'digest': digest, 'signature': signature})
+        self.__updated = True
+        return True
+
+    def remove(self, key, seed):
+        """
+        Forgets a stored failure, e.g. because its traversal now passes.
+        """
+        entries = self.__entries.get(key, [])
+        remaining = [entry for entry in entries if entry['seed'] != seed]
+        if len(remaining) != len(entries):
+            self.__entries[key] = remaining
+            self.__updated = True
+
+    def save(self):
+        """
+        Writes the stored failures, if any were added.
+        """
+        if not self.__updated:
+            return
+        temp_location = self.__location + '.tmp'
+        seeds_out = FileIO(temp_location, mode='wb')
+        try:
+            simpleion.dump(self.__entries, seeds_out, binary=False)
+        finally:
+            seeds_out.close()
+        os.replace(temp_location, self.__location)
@@ -0,0 +1,413 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+
+"""
+An in-process implementation of the CLI's `process` and `compare` commands (see the README) on ion-python, the Ion
+library that the driver itself uses. It lets ion-python take part in the tests without a process per invocation.
+"""
+
+import os
+import time
+import traceback
+from io import FileIO
+
+import six
+from six.moves import zip_longest
+import amazon.ion
+from amazon.ion import simpleion
+from amazon.ion.core import IonType
+from amazon.ion.equivalence import ion_equals
+from amazon.ion.simple_types import IonPyList, IonPyDict, IonPySymbol, IonPyText
+
+from amazon.iontest.ion_test_driver_compare import EVENT_STREAM_SYMBOL, ION_BINARY_VERSION_MARKER, EmbeddedStream, \
+    is_embedded_streams, read_values, stream_values
+
+ION_PYTHON_VERSION = amazon.ion.__version__
+COMPARISON_TYPES = ('basic', 'equivs', 'non-equivs', 'equiv-timeline')
+EVENTS_OUTPUT_FORMATS = ('events', 'events-binary')
+READ_INSTRUCTIONS = ('NEXT', 'SKIP')
+
+
+def _symbol(text):
+    return IonPySymbol.from_value(IonType.SYMBOL, text)
+
+
+def _symbol_token(text):
+    return {'text': text}
+
+
+def _annotation_texts(value):
+    return [getattr(annotation, 'text', annotation) for annotation in getattr(value, 'ion_annotations', ())]
+
+
+def _scalar_encodings(value):
+    # Serializes a scalar without its annotations, which its Event carries separately.
+    annotations = value.ion_annotations
+    value.ion_annotations = ()
+    try:
+        value_text = simpleion.dumps(value, binary=False, omit_version_marker=True)
+        value_binary = simpleion.dumps(value, binary=True)
+    finally:
+        value.ion_annotations = annotations
+    if isinstance(value_text, bytes):
+        value_text = value_text.decode('utf-8')
+    return value_text, list(bytearray(value_binary[len(ION_BINARY_VERSION_MARKER):]))
+
+
+def _event(event_type, depth, ion_type=None, field_name=None, annotations=(), value=None):
+    event = {'event_type': _symbol(event_type)}
+    if ion_type is not None:
+        event['ion_type'] = _symbol(ion_type.name)
+    if field_name is not None:
+        event['field_name'] = _symbol_token(field_name)
+    if annotations:
+        event['annotations'] = [_symbol_token(annotation) for annotation in annotations]
+    if value is not None:
+        event['value_text'], event['value_binary'] = _scalar_encodings(value)
+    event['depth'] = depth
+    return event
+
+
+def value_events(value, depth=0, field_name=None):
+    """
+    Generates the Events that represent the given value (see the README), including those of any embedded streams.
+    """
+    annotations = _annotation_texts(value)
+    ion_type = value.ion_type
+    if isinstance(value, (IonPyList, IonPyDict)):
+        yield _event('CONTAINER_START', depth, ion_type, field_name, annotations)
+        if depth == 0 and is_embedded_streams(value):
+            for stream in value:
+                if isinstance(stream, EmbeddedStream):
+                    for event in stream_events(stream, end=False):
+                        yield event
+                    yield _event('STREAM_END', 0)
+                else:
+                    for event in value_events(stream, depth + 1):
+                        yield event
+        elif isinstance(value, IonPyDict):
+            for name, child in six.iteritems(value):
+                for event in value_events(child, depth + 1, getattr(name, 'text', name)):
+                    yield event
+        else:
+            for child in value:
+                for event in value_events(child, depth + 1):
+                    yield event
+        yield _event('CONTAINER_END', depth, ion_type)
+    else:
+        yield _event('SCALAR', depth, ion_type, field_name, annotations, value)
+
+
+def stream_events(values, end=True):
+    """
+    Generates the Events that represent the given top-level values, followed by a STREAM_END unless `end` is False.
+    """
+    for value in values:
+        for event in value_events(value):
+            yield event
+    if end:
+        yield _event('STREAM_END', 0)
+
+
+def _children(value):
+    # Generates (field name, value) pairs for the children of a container.
+    if isinstance(value, IonPyDict):
+        for name, child in six.iteritems(value):
+            yield getattr(name, 'text', name), child
+    else:
+        for child in value:
+            yield None, child
+
+
+def _is_container(value):
+    return isinstance(value, (IonPyList, IonPyDict))
+
+
+def traverse_events(values, instructions):
+    """
+    Generates the Events emitted by reading the given top-level values according to the given ReadInstructions (see
+    the README's description of `--traverse`). NEXT at the end of a container steps out of it, emitting its
+    CONTAINER_END; NEXT at the end of the stream emits STREAM_END. If the instructions end while the reader is
+    positioned on a top-level container that it hasn't stepped into, that container's CONTAINER_END is emitted.
+    :raises ValueError: If the stream ends before the instructions do, or the instructions end below the top level.
+    """
+    siblings = [((None, value) for value in values)]
+    containers = []  # The containers the reader has stepped into.
+    current = None  # The container on which the reader is positioned, if any.
+    for instruction in instructions:
+        if siblings is None:
+            raise ValueError('The stream ended before the ReadInstructions did.')
+        depth = len(containers)
+        if instruction == 'NEXT':
+            if current is not None:
+                containers.append(current)
+                siblings.append(_children(current))
+                current = None
+                depth += 1
+            field_name, value = next(siblings[-1], (None, None))
+            if value is None:
+                if depth == 0:
+                    yield _event('STREAM_END', 0)
+                    siblings = None
+                else:
+                    siblings.pop()
+                    yield _event('CONTAINER_END', depth - 1, containers.pop().ion_type)
+            elif _is_container(value):
+                yield _event('CONTAINER_START', depth, value.ion_type, field_name, _annotation_texts(value))
+                current = value
+            else:
+                yield _event('SCALAR', depth, value.ion_type, field_name, _annotation_texts(value), value)
+        elif current is not None:
+            yield _event('CONTAINER_END', depth, current.ion_type)
+            current = None
+        elif depth != 0:
+            siblings.pop()
+            yield _event('CONTAINER_END', depth - 1, containers.pop().ion_type)
+    if siblings is None:
+        return
+    if containers:
+        raise ValueError('The ReadInstructions ended at depth %d.' % len(containers))
+    if current is not None:
+        yield _event('CONTAINER_END', 0, current.ion_type)
+    yield _event('STREAM_END', 0)
+
+
+def _event_count(value):
+    if isinstance(value, EmbeddedStream):
+        return sum(_event_count(child) for child in value) + 1
+    if isinstance(value, (IonPyList, IonPyDict)):
+        children = [child for _, child in six.iteritems(value)] if isinstance(value, IonPyDict) else value
+        return sum(_event_count(child) for child in children) + 2
+    return 1
+
+
+def _with_embedded_text(value):
+    # Re-serializes a top-level sequence's embedded streams as Ion text, the form they take in an Ion stream.
+    if not is_embedded_streams(value):
+        return value
+    elements = [IonPyText.from_value(IonType.STRING, simpleion.dumps(list(element), binary=False,
+                                                                      sequence_as_stream=True))
+                if isinstance(element, EmbeddedStream) else element for element in value]
+    return IonPyList.from_value(value.ion_type, elements, value.ion_annotations)
+
+
+class CliError(Exception):
+    def __init__(self, error_type, message, location):
+        """
+        An ErrorDescription (see the README) raised while executing a command.
+        """
+        super(CliError, self).__init__(message)
+        self.error_type = error_type
+        self.location = location
+
+
+def _dump_stream(values, location, binary=False):
+    stream_out = FileIO(location, mode='wb')
+    try:
+        simpleion.dump(values, stream_out, binary=binary, sequence_as_stream=True)
+    finally:
+        stream_out.close()
+
+
+def _read_streams(inputs, streams):
+    # Appends each input's values to `streams` as they're read, so that those read before any error are available.
+    for location in inputs:
+        stream = []
+        streams.append(stream)
+        try:
+            for value in stream_values(location):
+                stream.append(value)
+        except Exception as e:
+            raise CliError('READ', '%s: %s' % (type(e).__name__, e), location)
+
+
+def _read_instructions(location):
+    try:
+        instructions = [getattr(value, 'text', None) for value in read_values(location)]
+    except Exception as e:
+        raise CliError('READ', '%s: %s' % (type(e).__name__, e), location)
+    for instruction in instructions:
+        if instruction not in READ_INSTRUCTIONS:
+            raise CliError('READ', 'Invalid ReadInstruction %r.' % instruction, location)
+    return instructions
+
+
+def process(options, inputs):
+    """
+    Re-writes the given inputs (Ion streams or EventStreams) in the requested `--output-format`, optionally reading
+    them according to the ReadInstructions given by `--traverse`.
+    """
+    output_format = options.get('--output-format', 'pretty')
+    output = options.get('--output')
+    start = time.perf_counter()
+    instructions = None
+    if '--traverse' in options:
+        if output_format not in EVENTS_OUTPUT_FORMATS + ('none',):
+            raise CliError('WRITE', '--traverse requires an EventStream output format.', output)
+        instructions = _read_instructions(options['--traverse'])
+    streams = []
+    read_error = None
+    try:
+        _read_streams(inputs, streams)
+    except CliError as e:
+        read_error = e  # As with a streaming implementation, the values read before the error are still written.
+    values = [value for stream in streams for value in stream]
+    if instructions is not None:
+        # Traversals see embedded streams as the strings they are in the input.
+        events = []
+        try:
+            for event in traverse_events([_with_embedded_text(value) for value in values], instructions):
+                events.append(event)
+        except ValueError as e:
+            if read_error is None:
+                read_error = CliError('STATE', str(e), options['--traverse'])
+    else:
+        events = None
+    try:
+        if output_format in EVENTS_OUTPUT_FORMATS:
+            if events is None:
+                events = stream_events(values)
+            _dump_stream([_symbol(EVENT_STREAM_SYMBOL)] + list(events), output, output_format == 'events-binary')
+        elif output_format in ('text', 'pretty', 'binary'):
+            _dump_stream([_with_embedded_text(value) for value in values], output, output_format == 'binary')
+        elif output_format != 'none':
+            raise ValueError('Unsupported output format %s.' % output_format)
+    except Exception as e:
+        raise CliError('WRITE', '%s: %s' % (type(e).__name__, e), output)
+    if read_error is not None:
+        raise read_error
+    elapsed = time.perf_counter() - start
+    if '--perf-report' in options:
+        # There's no memory_usage: ion-python shares the driver's process, so its own usage can't be measured.
+        report = {
+            'options': '-f %s' % output_format,
+            'input': {'name': inputs[0], 'size': sum(os.path.getsize(location) for location in inputs)},
+            'elapsed_time': int(round(elapsed * 1000))
+        }
+        if output is not None and output_format != 'none':
+            report['output'] = {'name': output, 'size': os.path.getsize(output)}
+        _dump_stream([report], options['--perf-report'])
+
+
+def _comparison_context(location, value, event_index, depth=0):
+    if value is None:
+        event = _event('STREAM_END', 0)
+    elif isinstance(value, EmbeddedStream):
+        event = next(stream_events(value))
+    else:
+        event = next(value_events(value, depth))
+    return {'location': location, 'event': event, 'event_index': event_index}
+
+
+def _comparison_result(result, lhs, rhs, message):
+    return {'result': _symbol(result), 'lhs': lhs, 'rhs': rhs, 'message': message}
+
+
+def _compare_streams(lhs_location, lhs, rhs_location, rhs):
+    # Compares two streams' top-level values in order, reporting the first pair that isn't equivalent.
+    lhs_index = rhs_index = 0
+    for lhs_value, rhs_value in zip_longest(lhs, rhs):
+        if lhs_value is None or rhs_value is None or not ion_equals(lhs_value, rhs_value):
+            return _comparison_result('NOT_EQUAL', _comparison_context(lhs_location, lhs_value, lhs_index),
+                                      _comparison_context(rhs_location, rhs_value, rhs_index),
+                                      '%r vs. %r' % (lhs_value, rhs_value))
+        lhs_index += _event_count(lhs_value)
+        rhs_index += _event_count(rhs_value)
+    return None
+
+
+def _compare_sets(location, values, comparison_type):
+    # Compares the elements of each top-level sequence with each other, as prescribed by the comparison type.
+    failures = []
+    index = 0
+    for value in values:
+        if isinstance(value, IonPyList) and not isinstance(value, EmbeddedStream):
+            element_indexes = []
+            element_index = index + 1
+            for element in value:
+                element_indexes.append(element_index)
+                element_index += _event_count(element)
+            for i in range(len(value)):
+                for j in range(i + 1, len(value)):
+                    equal = ion_equals(value[i], value[j], timestamps_instants_only=comparison_type == 'equiv-timeline')
+                    if equal == (comparison_type == 'non-equivs'):
+                        failures.append(_comparison_result(
+                            'EQUAL' if equal else 'NOT_EQUAL',
+                            _comparison_context(location, value[i], element_indexes[i], 1),
+                            _comparison_context(location, value[j], element_indexes[j], 1),
+                            '%r vs. %r' % (value[i], value[j])
+                        ))
+        index += _event_count(value)
+    return failures
+
+
+def compare(options, inputs):
+    """
+    Compares the given inputs (Ion streams or EventStreams) according to the `--comparison-type`, writing a
+    ComparisonReport that describes any unexpected result.
+    """
+    comparison_type = options.get('--comparison-type', 'basic')
+    if comparison_type not in COMPARISON_TYPES:
+        raise ValueError('Unsupported comparison type %s.' % comparison_type)
+    streams = []
+    _read_streams(inputs, streams)
+    failures = []
+    if comparison_type == 'basic':
+        for i in range(len(inputs)):
+            for j in range(i + 1, len(inputs)):
+                failure = _compare_streams(inputs[i], streams[i], inputs[j], streams[j])
+                if failure is not None:
+                    failures.append(failure)
+    else:
+        for location, values in zip(inputs, streams):
+            failures += _compare_sets(location, values, comparison_type)
+    _dump_stream(failures, options['--output'])
+
+
+def _parse_arguments(args):
+    command = args[0]
+    options = {}
+    inputs = []
+    remaining = list(args[1:])
+    while remaining:
+        arg = remaining.pop(0)
+        if arg.startswith('--'):
+            options[arg] = remaining.pop(0)
+        else:
+            inputs.append(arg)
+    return command, options, inputs
+
+
+def run_cli(args):
+    """
+    Executes the given CLI arguments in-process. As with an implementation's executable, ErrorReports are written to
+    the location given by `--error-report`, and anything unexpected is reported on stderr.
+    :return: a tuple (exit status, stderr bytes).
+    """
+    command, options, inputs = _parse_arguments(args)
+    try:
+        if command == 'process':
+            process(options, inputs)
+        elif command == 'compare':
+            compare(options, inputs)
+        else:
+            raise ValueError('Unsupported command %s.' % command)
+    except CliError as e:
+        error = {'error_type': _symbol(e.error_type), 'message': str(e), 'location': e.location}
+        if '--error-report' in options:
+            _dump_stream([error], options['--error-report'])
+        return 1, b''
+    except Exception:
+        return 1, traceback.format_exc().encode('utf-8')
+    return 0, b''
@@ -0,0 +1,302 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+
+"""
+Scalability benchmarks for the driver itself. The driver is run over synthetic ion-tests trees with stub
+implementations: shell scripts that honor the `process` and `compare` CLI contract without parsing Ion, so that nearly
+all of the time that isn't spent starting processes is the driver's own. Everything runs offline.
+"""
+
+import contextlib
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import stat
+import time
+from datetime import datetime
+from io import FileIO
+
+import six
+from amazon.ion import simpleion
+
+from amazon.iontest.ion_test_driver_config import ION_BUILDS, DRIVER_SCALING_EXPONENT_LIMIT
+from amazon.iontest.ion_test_driver_util import IonBuild, install_no_op, fit_line, max_rss_bytes, PHASE_TIMER, \
+    METRICS_INVOCATIONS_FIELD
+
+STUB_NAME_PREFIX = 'ion-stub-'
+STUB_EXECUTABLE = 'ion-stub'
+STUB_BUILD = IonBuild(install_no_op, STUB_EXECUTABLE, ())
+
+# Each vector's first line is an Ion comment that lists the stubs that fail it: ` e<n> ` for the stubs that raise an
+# error reading it (or, for bad vectors, that fail to), and ` d<n> ` for those whose comparisons report a disagreement.
+STUB_SCRIPT = """#!/bin/sh
+# Stub Ion CLI generated by ion_test_driver_scaling. Uses only shell builtins, apart from sleep.
+stub=%(index)d
+latency=%(latency)s
+command=$1
+shift
+output=
+error_report=
+input=
+while [ $# -gt 0 ]; do
+    case $1 in
+        --*)
+            case $1 in
+                --output) output=$2 ;;
+                --error-report) error_report=$2 ;;
+            esac
+            shift 2 ;;
+        *)
+            [ -z "$input" ] && input=$1
+            shift ;;
+    esac
+done
+header=
+[ -n "$input" ] && IFS= read -r header < "$input"
+[ "$latency" = 0 ] || sleep "$latency"
+case $command in
+    process)
+        case $header in
+            *" e$stub "*)
+                [ -n "$error_report" ] && \\
+                    printf '{error_type:READ,message:"stub error",location:"%%s"}\\n' "$input" > "$error_report"
+                exit 0 ;;
+        esac
+        if [ -n "$output" ]; then
+            while IFS= read -r line || [ -n "$line" ]; do printf '%%s\\n' "$line"; done < "$input" > "$output"
+        fi ;;
+    compare)
+        case $header in
+            *" d$stub "*) printf '{result:NOT_EQUAL,message:"stub disagreement"}\\n' > "$output" ;;
+            *) : > "$output" ;;
+        esac ;;
+esac
+"""
+
+# Directories of the synthetic trees, relative to the Ion 1.0 test directory, and the fraction of the vectors in each.
+SYNTHETIC_TYPE_MIX = (
+    ('good', 0.8),
+    ('bad', 0.1),
+    (os.path.join('good', 'equivs'), 0.05),
+    (os.path.join('good', 'non-equivs'), 0.05)
+)
+VECTORS_PER_DIRECTORY = 1000
+
+
+def stub_names(count):
+    return ['%s%d' % (STUB_NAME_PREFIX, index) for index in range(1, count + 1)]
+
+
+def write_stubs(root, count, latency):
+    """
+    Writes `count` stub implementations, each in its own directory under `root`.
+    :param latency: The number of seconds that each invocation of a stub sleeps for.
+    :return: a list of (name, directory) pairs.
+    """
+    stubs = []
+    for index, name in enumerate(stub_names(count), 1):
+        directory = os.path.join(root, name)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        executable = os.path.join(directory, STUB_EXECUTABLE)
+        with open(executable, 'w') as stub_out:
+            stub_out.write(STUB_SCRIPT % {'index': index, 'latency': '%g' % latency})
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        stubs.append((name, directory))
+    return stubs
+
+
+def generate_tree(root, vector_count, stub_count, error_rate, disagreement_rate, seed):
+    """
+    Generates a synthetic ion-tests tree of `vector_count` vectors, split between the test types according to
+    `SYNTHETIC_TYPE_MIX`, unless an identical tree was already generated under `root`. Each stub fails each vector with
+    probability `error_rate` and, for good vectors that it reads successfully, disagrees with the others about it with
+    probability `disagreement_rate`.
+    :return: the tree's root directory.
+    """
+    name = 'tree-%d-%d-%d-%g-%g' % (vector_count, stub_count, seed, error_rate, disagreement_rate)
+    tests_dir = os.path.join(root, name)
+    if os.path.isdir(tests_dir):
+        return tests_dir
+    # Generated under a temporary name, so that an interrupted generation is never mistaken for a complete tree.
+    temp_dir = tests_dir + '.tmp'
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    generator = random.Random(seed)
+    stubs = range(1, stub_count + 1)
+    index = 0
+    for directory, fraction in SYNTHETIC_TYPE_MIX:
+        is_bad = directory == 'bad'
+        for _ in range(int(round(vector_count * fraction))):
+            failing = [stub for stub in stubs if generator.random() < error_rate]
+            # Bad vectors are rejected by every stub that doesn't fail them.
+            erring = [stub for stub in stubs if stub not in failing] if is_bad else failing
+            disagreeing = [] if is_bad else [stub for stub in stubs
+                                             if stub not in failing and generator.random() < disagreement_rate]
+            header = '// stub:%s%s ' % (''.join(' e%d' % stub for stub in erring),
+                                        ''.join(' d%d' % stub for stub in disagreeing))
+            vector_dir = os.path.join(temp_dir, 'iontestdata', directory, '%03d' % (index // VECTORS_PER_DIRECTORY))
+            if not os.path.isdir(vector_dir):
+                os.makedirs(vector_dir)
+            with open(os.path.join(vector_dir, 'v%07d.ion' % index), 'w') as vector_out:
+                vector_out.write('%s\n(%d "%d" %d.0)\n' % (header, index, index, index))
+            index += 1
+    os.rename(temp_dir, tests_dir)
+    return tests_dir
+
+
+def _measure_run(tests_dir, stubs, output_root, results_root, jobs, connection):
+    # Runs in a fresh process, so that each configuration's memory is measured from the same starting point. The
+    # driver is imported here; it imports this module. So is `resource`, which is unavailable on Windows, so that the
+    # driver can import this module there.
+    import resource
+    from amazon.iontest.ion_test_driver import IonImplementation, TestType, test_all, results_file_sibling
+    from amazon.iontest.ion_test_driver_config import RESULTS_FILE_DEFAULT
+    for name, _ in stubs:
+        ION_BUILDS[name] = STUB_BUILD
+    impls = [IonImplementation(output_root, name, directory, None) for name, directory in stubs]
+    for impl in impls:
+        impl.install_in_place()
+    base_rss = max_rss_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    PHASE_TIMER.start()
+    start = time.monotonic()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        test_all(impls, tests_dir, list(TestType.__iter__()), [], results_root, RESULTS_FILE_DEFAULT, jobs=jobs)
+    wall_time = time.monotonic() - start
+    PHASE_TIMER.stop()
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    metrics_in = FileIO(results_file_sibling(os.path.join(results_root, RESULTS_FILE_DEFAULT), '_metrics'), 'rb')
+    try:
+        metrics = simpleion.load(metrics_in)
+    finally:
+        metrics_in.close()
+    phases = PHASE_TIMER.phases
+    peak_rss = max_rss_bytes(usage_after.ru_maxrss)
+    connection.send({
+        'invocations': sum(totals[METRICS_INVOCATIONS_FIELD] for phase_totals in six.itervalues(metrics)
+                           for totals in six.itervalues(phase_totals)),
+        'wall_time': wall_time,
+        'driver_cpu_time': usage_after.ru_utime + usage_after.ru_stime - usage_before.ru_utime - usage_before.ru_stime,
+        'children_cpu_time': children_after.ru_utime + children_after.ru_stime - children_before.ru_utime -
+        children_before.ru_stime,
+        'child_wait': sum(totals['child_wait'] for totals in six.itervalues(phases)),
+        'driver_time': sum(max(totals['elapsed'] - totals['child_wait'], 0.0) for totals in six.itervalues(phases)),
+        'peak_rss': peak_rss,
+        'rss_growth': peak_rss - base_rss
+    })
+    connection.close()
+
+
+def measure_run(tests_dir, stubs, output_root, results_root, jobs):
+    """
+    Runs the driver (`test_all`) over the given tree with the given stubs, in a new process.
+    :param stubs: The output of `write_stubs`.
+    :return: a dict of the run's measurements: the number of invocations of the stubs; the wall time; the driver's CPU
+        time, and that of the processes it started; the time that the driver spent waiting on those processes, and the
+        rest of its time (summed across jobs; see `PhaseTimer`); and its peak RSS, and the growth of its peak RSS
+        during the run, in bytes.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_run, args=(tests_dir, stubs, output_root, results_root, jobs, sender))
+    process.start()
+    sender.close()
+    try:
+        measurement = receiver.recv()
+    except EOFError:
+        measurement = None
+    process.join()
+    if measurement is None:
+        raise ValueError('The driver failed to test %s (exit status %s).' % (tests_dir, process.exitcode))
+    return measurement
+
+
+def scaling_exponent(points):
+    """
+    Fits y = a * x^k to the given (x, y) points on a log-log scale.
+    :return: k, or None if it can't be fitted (e.g. there are fewer than two distinct x values).
+    """
+    fit = fit_line([(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0])
+    return None if fit is None else fit[1]
+
+
+def run_scaling_benchmarks(output_root, results_location, vector_counts, stub_counts, latency, error_rate,
+                           disagreement_rate, seed, jobs):
+    """
+    Runs the driver over a synthetic tree of each of `vector_counts` vectors with each of `stub_counts` stubs, measures
+    its overhead and memory (see `measure_run`), and writes the measurements to `results_location`, along with the
+    scaling curve of each number of stubs: the exponents of the driver's CPU time and peak RSS growth in the number of
+    vectors. Trees are cached under the `driver-benchmark` directory of `output_root`; the driver's output for each
+    run is deleted once it has been measured.
+    :return: True if every curve's CPU time exponent is within `DRIVER_SCALING_EXPONENT_LIMIT`.
+    """
+    root = os.path.join(output_root, 'driver-benchmark')
+    configurations = []
+    print('%7s %5s %11s %10s %13s %14s %15s %13s %15s' % (
+        'vectors', 'stubs', 'invocations', 'wall (s)', 'driver (s)', 'driver cpu (s)', 'cpu/invoc (us)',
+        'peak rss (MB)', 'rss growth (MB)'))
+    for stub_count in stub_counts:
+        stubs = write_stubs(os.path.join(root, 'stubs'), stub_count, latency)
+        for vector_count in vector_counts:
+            tests_dir = generate_tree(os.path.join(root, 'trees'), vector_count, stub_count, error_rate,
+                                      disagreement_rate, seed)
+            results_root = os.path.join(root, 'runs', '%d-%d' % (vector_count, stub_count))
+            shutil.rmtree(results_root, ignore_errors=True)
+            try:
+                measurement = measure_run(tests_dir, stubs, output_root, results_root, jobs)
+            finally:
+                shutil.rmtree(results_root, ignore_errors=True)
+            measurement.update({'vectors': vector_count, 'stubs': stub_count})
+            configurations.append(measurement)
+            print('%7d %5d %11d %10.2f %13.2f %14.2f %15.1f %13.1f %15.1f' % (
+                vector_count, stub_count, measurement['invocations'], measurement['wall_time'],
+                measurement['driver_time'], measurement['driver_cpu_time'],
+                1e6 * measurement['driver_cpu_time'] / max(measurement['invocations'], 1),
+                measurement['peak_rss'] / (1024.0 * 1024.0), measurement['rss_growth'] / (1024.0 * 1024.0)))
+    curves = []
+    passed = True
+    for stub_count in stub_counts:
+        runs = [run for run in configurations if run['stubs'] == stub_count]
+        cpu_exponent = scaling_exponent([(run['vectors'], run['driver_cpu_time']) for run in runs])
+        if cpu_exponent is None:
+            continue
+        memory_exponent = scaling_exponent([(run['vectors'], run['rss_growth']) for run in runs])
+        within_limit = cpu_exponent <= DRIVER_SCALING_EXPONENT_LIMIT
+        passed = passed and within_limit
+        curves.append({'stubs': stub_count, 'driver_cpu_time_exponent': cpu_exponent,
+                       'rss_growth_exponent': memory_exponent, 'within_limit': within_limit})
+        print('%d stubs: driver CPU time grows as vectors^%.2f%s; peak RSS growth as vectors^%s.' % (
+            stub_count, cpu_exponent, '' if within_limit else ' (limit %.2f)' % DRIVER_SCALING_EXPONENT_LIMIT,
+            '-' if memory_exponent is None else '%.2f' % memory_exponent))
+    summary = {
+        'date': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'seed': seed,
+        'jobs': jobs,
+        'stub_latency': latency,
+        'stub_error_rate': error_rate,
+        'stub_disagreement_rate': disagreement_rate,
+        'configurations': configurations,
+        'curves': curves
+    }
+    results_out = FileIO(results_location, mode='wb')
+    try:
+        simpleion.dump(summary, results_out, binary=False, indent=' ')
+    finally:
+        results_out.close()
+    print('Driver benchmark results written to %s.' % results_location)
+    return passed
@@ -16,38 +16,1272 @@
 ion_test_driver utilities.
 """
 
+import json
+import math
 import os
+import signal
+import statistics
 import sys
-from subprocess import check_call
+import threading
+import time
+from contextlib import contextmanager
+from subprocess import call, check_call, CalledProcessError, Popen, PIPE, DEVNULL, TimeoutExpired
 
 COMMAND_SHELL = False
 if sys.platform.startswith('win'):
     COMMAND_SHELL = True  # shell=True on Windows allows the .exe suffix to be omitted.
 
+STDERR_CHUNK_SIZE = 64 * 1024
+
+# Seconds that the driver keeps reading a child's stderr after the child has exited. Anything it spawned that still
+# holds stderr open afterwards is killed, so that a lingering grandchild can't stall the run.
+STDERR_DRAIN_GRACE = 1.0
+
+
+class TraceRecorder:
+    def __init__(self):
+        """
+        Records spans in the Chrome trace event format, which can be opened in chrome://tracing or
+        https://ui.perfetto.dev. Does nothing until started.
+        """
+        self.__events = []
+        self.__origin = None
+        self.__local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.__origin is not None
+
+    def start(self):
+        self.__events = []
+        self.__origin = time.perf_counter()
+
+    @contextmanager
+    def context(self, **args):
+        """
+        Adds the given arguments to every span that the current thread begins within the enclosed block.
+        """
+        if not self.enabled:
+            yield
+            return
+        stack = self.__context_stack()
+        merged = dict(stack[-1]) if stack else {}
+        merged.update(args)
+        stack.append(merged)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """
+        Records the enclosed block as a span with the given name, category, and arguments, in addition to those of any
+        enclosing `context`. Yields the span's arguments so that outcomes (e.g. an exit status) can be added to them.
+        """
+        if not self.enabled:
+            yield {}
+            return
+        stack = self.__context_stack()
+        span_args = dict(stack[-1]) if stack else {}
+        span_args.update(args)
+        start = time.perf_counter()
+        try:
+            yield span_args
+        except BaseException as e:
+            span_args['error'] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            self.__events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - self.__origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': span_args
+            })
+
+    def write(self, location):
+        """
+        Writes the spans recorded so far to the given location in the JSON object format, and stops recording.
+        """
+        metadata = {'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': 'ion-test-driver'}}
+        trace_out = open(location, 'w')
+        try:
+            json.dump({'traceEvents': [metadata] + self.__events, 'displayTimeUnit': 'ms'}, trace_out)
+        finally:
+            trace_out.close()
+        self.__origin = None
+
+    def __context_stack(self):
+        if not hasattr(self.__local, 'stack'):
+            self.__local.stack = []
+        return self.__local.stack
+
+
+# The driver's trace recorder, which is started by the --trace option.
+TRACER = TraceRecorder()
+
 
 def log_call(log, args):
     """
     Logs the stdout and stderr for the given subprocess call to the given file.
     """
+    command = args if isinstance(args, str) else ' '.join(args)
     log_file = open(log, 'a' if os.path.isfile(log) else 'w')
     try:
-        check_call(args, shell=COMMAND_SHELL, stdout=log_file, stderr=log_file)
+        with TRACER.span(command, 'install', command=command) as span_args:
+            try:
+                check_call(args, shell=COMMAND_SHELL, stdout=log_file, stderr=log_file)
+                span_args['exit_status'] = 0
+            except CalledProcessError as e:
+                span_args['exit_status'] = e.returncode
+                raise
     finally:
         log_file.close()
 
 
+class InvocationMetrics:
+    def __init__(self, wall_time, user_time=None, system_time=None, max_rss=None):
+        """
+        Resources consumed by a single child process.
+
+        :param wall_time: elapsed wall-clock time, in seconds.
+        :param user_time: CPU time spent in user mode, in seconds, or None if unavailable on this platform.
+        :param system_time: CPU time spent in kernel mode, in seconds, or None if unavailable on this platform.
+        :param max_rss: peak resident set size, in bytes, or None if unavailable on this platform.
+        """
+        self.wall_time = wall_time
+        self.user_time = user_time
+        self.system_time = system_time
+        self.max_rss = max_rss
+
+
+class ProcessResult:
+    def __init__(self, returncode, stderr, metrics, timed_out=False, stderr_discarded=0):
+        """
+        The outcome of a completed child process.
+
+        :param returncode: the process's exit status (negative if it was terminated by a signal).
+        :param stderr: the (possibly truncated) bytes the process wrote to stderr.
+        :param metrics: the process's InvocationMetrics.
+        :param timed_out: True if the process was killed because it exceeded its timeout.
+        :param stderr_discarded: the number of bytes of stderr that were dropped to stay within the capture limit.
+        """
+        self.returncode = returncode
+        self.stderr = stderr
+        self.metrics = metrics
+        self.timed_out = timed_out
+        self.stderr_discarded = stderr_discarded
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when an invocation cannot be completed before the run's global deadline.
+    """
+    pass
+
+
+def max_rss_bytes(ru_maxrss):
+    """
+    Normalizes `ru_maxrss`, which is reported in bytes on macOS and in kilobytes elsewhere.
+    """
+    if sys.platform == 'darwin':
+        return ru_maxrss
+    return ru_maxrss * 1024
+
+
+def exit_status(status):
+    """
+    Converts a status returned by `os.wait4` into the convention used by `Popen.returncode`.
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def bound_output(data, limit):
+    """
+    Truncates `data` to at most `limit` bytes (no limit if `limit` is None).
+    :return: a tuple (retained bytes, number of bytes discarded).
+    """
+    if limit is None or len(data) <= limit:
+        return data, 0
+    return data[:limit], len(data) - limit
+
+
+def read_bounded(stream, limit):
+    """
+    Drains `stream` until EOF, retaining at most `limit` bytes (no limit if `limit` is None). The remainder is read
+    and discarded so that the writer never blocks on a full pipe.
+    :return: a tuple (retained bytes, number of bytes discarded).
+    """
+    captured = bytearray()
+    discarded = 0
+    fd = stream.fileno()
+    while True:
+        chunk = os.read(fd, STDERR_CHUNK_SIZE)
+        if not chunk:
+            break
+        room = len(chunk) if limit is None else max(limit - len(captured), 0)
+        captured += chunk[:room]
+        discarded += len(chunk) - min(room, len(chunk))
+    return bytes(captured), discarded
+
+
+def kill_process_tree(process):
+    """
+    Kills a child started without its own process group (see `execute_process`) along with everything it spawned. On
+    Windows, where the child is usually a shell, `taskkill /T` takes out the shell's descendants too.
+    """
+    if sys.platform.startswith('win'):
+        call(('taskkill', '/F', '/T', '/PID', '%d' % process.pid), stdout=DEVNULL, stderr=DEVNULL)
+    else:
+        process.kill()
+
+
+class ProcessGroupKiller:
+    def __init__(self, process):
+        """
+        Kills a child process and all of its descendants from a timer thread, unless the child has already exited.
+        Children started by `execute_process` lead their own process groups, so killing the group also takes out any
+        processes they spawned (e.g. a JVM launched from a wrapper script).
+        """
+        self.__process = process
+        self.__lock = threading.Lock()
+        self.__exited = False
+        self.fired = False
+
+    def kill(self):
+        with self.__lock:
+            if self.__exited:
+                return
+            self.fired = True
+            try:
+                if hasattr(os, 'killpg'):
+                    os.killpg(self.__process.pid, signal.SIGKILL)
+                else:
+                    self.__process.kill()
+            except OSError:
+                pass  # The process exited on its own in the meantime.
+
+    def exited(self):
+        """
+        Must be called once the child has exited, but before it is reaped; after that point, its process group ID may
+        be reused.
+        """
+        with self.__lock:
+            self.__exited = True
+
+
+class PhaseTimer:
+    def __init__(self):
+        """
+        Attributes the driver's elapsed time to named phases, separating the time spent waiting on child processes
+        from the driver's own work. Each thread has its own stack of phases, so when test files run concurrently, the
+        totals are summed across threads. Does nothing until started.
+        """
+        self.__phases = {}
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__enabled = False
+
+    def start(self):
+        self.__phases = {}
+        self.__local = threading.local()
+        self.__enabled = True
+
+    def stop(self):
+        self.__enabled = False
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the enclosed block as the given phase. Time spent in a nested phase is attributed only to that phase.
+        """
+        if not self.__enabled:
+            yield
+            return
+        stack = self.__stack()
+        frame = [name, time.perf_counter(), 0.0]
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            if stack:
+                stack[-1][2] += elapsed
+            with self.__lock:
+                totals = self.__phases.setdefault(name, {'entries': 0, 'elapsed': 0.0, 'child_wait': 0.0})
+                totals['entries'] += 1
+                totals['elapsed'] += elapsed - frame[2]
+
+    def add_child_wait(self, seconds):
+        """
+        Attributes the given time spent waiting on a child process to the innermost active phase.
+        """
+        if not self.__enabled:
+            return
+        stack = self.__stack()
+        if stack:
+            with self.__lock:
+                totals = self.__phases.setdefault(stack[-1][0], {'entries': 0, 'elapsed': 0.0, 'child_wait': 0.0})
+                totals['child_wait'] += seconds
+
+    @property
+    def phases(self):
+        """
+        A dict of the form {phase: {entries, elapsed, child_wait}}, with times in seconds.
+        """
+        return self.__phases
+
+    def __stack(self):
+        if not hasattr(self.__local, 'stack'):
+            self.__local.stack = []
+        return self.__local.stack
+
+
+# The driver's phase timer, which is started by the --profile option.
+PHASE_TIMER = PhaseTimer()
+
+
+def fit_line(points):
+    """
+    Fits a line to the given (x, y) points by least squares.
+    :return: a tuple (intercept, slope), or None if there are fewer than two distinct x values.
+    """
+    if len(set(x for x, _ in points)) < 2:
+        return None
+    mean_x = statistics.mean(x for x, _ in points)
+    mean_y = statistics.mean(y for _, y in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+    return mean_y - slope * mean_x, slope
+
+
+# Upper bounds, in seconds, of the buckets of RunMonitor's invocation latency histograms.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Minimum number of seconds between rewrites of RunMonitor's metrics file, other than those after each test file.
+MONITOR_PUBLISH_INTERVAL = 10.0
+
+
+def prometheus_labels(**labels):
+    """
+    Formats the given labels for the Prometheus text exposition format.
+    """
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{%s}' % ','.join('%s="%s"' % (name, escape(value)) for name, value in sorted(labels.items()))
+
+
+class RunMonitor:
+    def __init__(self):
+        """
+        Publishes the progress of a test run while it happens: as a metrics file in the Prometheus text exposition
+        format (suitable for the node exporter's textfile collector), which is atomically rewritten as the run
+        progresses, and as a stream of JSON lines with one event per completed test file. Does nothing unless
+        configured.
+        """
+        self.__metrics_location = None
+        self.__progress_location = None
+        self.__progress_out = None
+        self.__lock = threading.Lock()
+        self.__reset(0)
+
+    @property
+    def enabled(self):
+        return self.__metrics_location is not None or self.__progress_location is not None
+
+    def configure(self, metrics_location, progress_location):
+        """
+        :param metrics_location: The Prometheus metrics file to maintain, or None.
+        :param progress_location: The JSON lines file to write, or None.
+        """
+        self.__metrics_location = metrics_location
+        self.__progress_location = progress_location
+
+    def begin(self, total_files):
+        """
+        Starts monitoring a run of the given number of test files.
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__reset(total_files)
+            if self.__progress_location is not None:
+                self.__progress_out = open(self.__progress_location, 'w')
+            self.__emit({'event': 'start', 'total': total_files})
+            self.__publish(force=True)
+
+    @contextmanager
+    def in_flight(self):
+        """
+        Counts the enclosed block as an in-flight process.
+        """
+        if not self.enabled:
+            yield
+            return
+        with self.__lock:
+            self.__in_flight += 1
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.__in_flight -= 1
+
+    def record_invocation(self, implementation, phase, seconds, output_bytes):
+        """
+        Records a completed invocation of an implementation.
+        :param output_bytes: The number of bytes of output the invocation wrote.
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            key = (implementation, phase)
+            self.__invocations[key] = self.__invocations.get(key, 0) + 1
+            self.__output_bytes[implementation] = self.__output_bytes.get(implementation, 0) + output_bytes
+            histogram = self.__latencies.setdefault(key, [[0] * len(LATENCY_BUCKETS), 0.0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            self.__publish(force=False)
+
+    def file_finished(self, path, failed_implementations):
+        """
+        Records a completed test file, for which the given implementations failed.
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__done += 1
+            for implementation in failed_implementations:
+                self.__failures[implementation] = self.__failures.get(implementation, 0) + 1
+            self.__emit({
+                'event': 'file',
+                'file': path,
+                'failed': sorted(failed_implementations),
+                'done': self.__done,
+                'total': self.__total,
+                'elapsed': time.monotonic() - self.__start,
+                'eta': self.__eta()
+            })
+            self.__publish(force=True)
+
+    def end(self, complete):
+        """
+        Records the end of the run. If not `complete`, the run stopped before all test files were tested.
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__complete = 1 if complete else 0
+            self.__emit({'event': 'complete' if complete else 'incomplete', 'done': self.__done, 'total': self.__total,
+                         'elapsed': time.monotonic() - self.__start})
+            self.__publish(force=True)
+            if self.__progress_out is not None:
+                self.__progress_out.close()
+                self.__progress_out = None
+
+    def __reset(self, total_files):
+        self.__total = total_files
+        self.__done = 0
+        self.__complete = 0
+        self.__in_flight = 0
+        self.__invocations = {}
+        self.__failures = {}
+        self.__output_bytes = {}
+        self.__latencies = {}
+        self.__start = time.monotonic()
+        self.__last_publish = None
+
+    def __eta(self):
+        if self.__done == 0:
+            return None
+        return (time.monotonic() - self.__start) / self.__done * (self.__total - self.__done)
+
+    def __emit(self, event):
+        if self.__progress_out is None:
+            return
+        event['time'] = time.time()
+        self.__progress_out.write(json.dumps(event, sort_keys=True) + '\n')
+        self.__progress_out.flush()
+
+    def __publish(self, force):
+        if self.__metrics_location is None:
+            return
+        now = time.monotonic()
+        if not force and self.__last_publish is not None and now - self.__last_publish < MONITOR_PUBLISH_INTERVAL:
+            return
+        self.__last_publish = now
+        lines = []
+
+        def metric(name, metric_type, description, samples):
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+            for suffix, labels, value in samples:
+                lines.append('%s%s %s' % (name + suffix, prometheus_labels(**labels) if labels else '', value))
+
+        metric('ion_test_driver_files', 'gauge', 'Test files by state.',
+               [('', {'state': 'done'}, self.__done), ('', {'state': 'remaining'}, self.__total - self.__done)])
+        metric('ion_test_driver_run_complete', 'gauge', 'Whether the run has finished testing every file.',
+               [('', None, self.__complete)])
+        metric('ion_test_driver_elapsed_seconds', 'gauge', 'Time since the run started.',
+               [('', None, '%.3f' % (now - self.__start))])
+        eta = self.__eta()
+        if eta is not None:
+            metric('ion_test_driver_eta_seconds', 'gauge', 'Estimated time until the run finishes.',
+                   [('', None, '%.3f' % eta)])
+        metric('ion_test_driver_in_flight_processes', 'gauge', 'Implementation processes currently running.',
+               [('', None, self.__in_flight)])
+        metric('ion_test_driver_invocations_total', 'counter', 'Completed invocations of implementations.',
+               [('', {'implementation': implementation, 'phase': phase}, count)
+                for (implementation, phase), count in sorted(self.__invocations.items())])
+        metric('ion_test_driver_failures_total', 'counter', 'Test files for which an implementation failed.',
+               [('', {'implementation': implementation}, count)
+                for implementation, count in sorted(self.__failures.items())])
+        metric('ion_test_driver_output_bytes_total', 'counter', 'Bytes of output written by implementations.',
+               [('', {'implementation': implementation}, count)
+                for implementation, count in sorted(self.__output_bytes.items())])
+        samples = []
+        for (implementation, phase), (buckets, total) in sorted(self.__latencies.items()):
+            count = self.__invocations[(implementation, phase)]
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                samples.append(('_bucket', {'implementation': implementation, 'phase': phase, 'le': repr(bound)},
+                                bucket))
+            samples.append(('_bucket', {'implementation': implementation, 'phase': phase, 'le': '+Inf'}, count))
+            samples.append(('_sum', {'implementation': implementation, 'phase': phase}, '%.6f' % total))
+            samples.append(('_count', {'implementation': implementation, 'phase': phase}, count))
+        metric('ion_test_driver_invocation_duration_seconds', 'histogram',
+               'Wall time of invocations of implementations.', samples)
+        # The textfile collector may read the file at any time, so it's replaced atomically.
+        temp_location = self.__metrics_location + '.tmp'
+        metrics_out = open(temp_location, 'w')
+        try:
+            metrics_out.write('\n'.join(lines) + '\n')
+        finally:
+            metrics_out.close()
+        os.replace(temp_location, self.__metrics_location)
+
+
+# The driver's run monitor, which is configured by the --metrics-file and --progress-file options.
+RUN_MONITOR = RunMonitor()
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+CGROUP_CONTROLLERS = ('cpuset', 'cpu', 'memory')
+CGROUP_CPU_PERIOD = 100000  # microseconds
+
+
+class IsolationSlot:
+    def __init__(self, cpus, cgroup):
+        """
+        The cores (and, if any, the cgroup) reserved for one implementation process at a time; see `ProcessIsolation`.
+        """
+        self.cpus = cpus
+        self.cgroup = cgroup
+
+
+class ProcessIsolation:
+    def __init__(self):
+        """
+        Isolates the implementations' processes from each other and from the driver, so that their measurements are
+        stable: the driver is pinned to one core, and each process to cores of its own (see `os.sched_setaffinity`)
+        that no concurrent process uses. A process waits for cores to free up, so at most one process runs per slot of
+        cores, whatever the number of jobs. Where the host's cgroup v2 hierarchy is delegated to the driver's user,
+        each slot is also a cgroup, created for the run, that limits the processes in it to the slot's cores and
+        (optionally) to a maximum amount of memory. What was applied, and why anything wasn't, is recorded in
+        `description`. In-process implementations run on the driver's core. Does nothing unless configured.
+        """
+        self.__enabled = False
+        self.__driver_cpus = None
+        self.__free = []
+        self.__condition = threading.Condition()
+        self.__run_cgroup = None
+        self.__parent_cgroup = None
+        self.__parent_controllers = []
+        self.__description = {}
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    @property
+    def description(self):
+        """
+        A dict describing the isolation that was applied, suitable for serialization as an Ion struct: the driver's
+        cores, the cores of each slot, and the run's cgroup and its limits, with the reasons for anything that couldn't
+        be applied under `unavailable`.
+        """
+        return self.__description
+
+    def configure(self, cpus_per_process=1, memory_limit=None):
+        """
+        Pins the driver (along with any threads that it starts later) to the first of its allowed cores and divides
+        the rest into slots of `cpus_per_process` cores, then creates the run's cgroups if possible.
+        :param memory_limit: The maximum number of bytes of memory that each process may use, or None. Enforced only
+            if the run's cgroups can be created.
+        """
+        unavailable = []
+        self.__description = {'pinned': False, 'driver_cpus': [], 'slots': [], 'cgroup': None,
+                              'memory_limit': memory_limit, 'placement_failures': 0, 'unavailable': unavailable}
+        if not hasattr(os, 'sched_setaffinity'):
+            unavailable.append('os.sched_setaffinity is not supported on %s.' % sys.platform)
+            return
+        allowed = sorted(os.sched_getaffinity(0))
+        if len(allowed) < cpus_per_process + 1:
+            unavailable.append('%d cores are allowed; pinning needs at least %d.'
+                               % (len(allowed), cpus_per_process + 1))
+            return
+        self.__driver_cpus = allowed[:1]
+        rest = allowed[1:]
+        slots = [rest[i:i + cpus_per_process] for i in range(0, len(rest) - cpus_per_process + 1, cpus_per_process)]
+        os.sched_setaffinity(0, self.__driver_cpus)
+        cgroups = self.__create_cgroups(slots, memory_limit, unavailable)
+        self.__free = [IsolationSlot(cpus, cgroup) for cpus, cgroup in zip(slots, cgroups)]
+        self.__description.update({'pinned': True, 'driver_cpus': self.__driver_cpus, 'slots': slots,
+                                   'cgroup': self.__run_cgroup})
+        self.__enabled = True
+
+    def __create_cgroups(self, slots, memory_limit, unavailable):
+        # Returns the cgroup of each slot, or Nones if they can't be created with the controllers that enforce the
+        # limits. The run's cgroup is created in the driver's own cgroup (the parent), and the driver moves into a leaf
+        # of it, alongside the slots: a cgroup that contains processes can't enable controllers for its children (the
+        # "no internal processes" rule).
+        none = [None] * len(slots)
+        if not os.path.isfile(os.path.join(CGROUP_ROOT, 'cgroup.controllers')):
+            unavailable.append('cgroup v2 is not mounted at %s.' % CGROUP_ROOT)
+            return none
+        try:
+            with open('/proc/self/cgroup') as cgroup_in:
+                own = [line.strip()[3:] for line in cgroup_in if line.startswith('0::')][0]
+            parent = os.path.join(CGROUP_ROOT, own.lstrip('/'))
+            run = os.path.join(parent, 'ion-test-driver-%d' % os.getpid())
+            os.mkdir(run)
+        except (OSError, IndexError) as e:
+            unavailable.append('The run\'s cgroup could not be created: %s.' % e)
+            return none
+        self.__run_cgroup = run
+        self.__parent_cgroup = parent
+        try:
+            os.mkdir(os.path.join(run, 'driver'))
+            with open(os.path.join(run, 'driver', 'cgroup.procs'), 'w') as procs_out:
+                procs_out.write('%d' % os.getpid())
+            with open(os.path.join(parent, 'cgroup.subtree_control')) as control_in:
+                enabled = control_in.read().split()
+            # Only those enabled here are disabled again when the run ends.
+            self.__parent_controllers = [controller for controller in CGROUP_CONTROLLERS if controller not in enabled]
+            # Fails if the parent contains other processes, or if it isn't delegated to the driver's user.
+            for cgroup in (parent, run):
+                with open(os.path.join(cgroup, 'cgroup.subtree_control'), 'w') as control_out:
+                    control_out.write(' '.join('+' + controller for controller in CGROUP_CONTROLLERS))
+            cgroups = []
+            for i, cpus in enumerate(slots):
+                cgroup = os.path.join(run, 'slot-%d' % i)
+                os.mkdir(cgroup)
+                cgroups.append(cgroup)
+                for name, value in (('cpuset.cpus', ','.join('%d' % cpu for cpu in cpus)),
+                                    ('cpu.max', '%d %d' % (CGROUP_CPU_PERIOD * len(cpus), CGROUP_CPU_PERIOD)),
+                                    ('memory.max', 'max' if memory_limit is None else '%d' % memory_limit)):
+                    with open(os.path.join(cgroup, name), 'w') as value_out:
+                        value_out.write(value)
+            return cgroups
+        except OSError as e:
+            unavailable.append('The run\'s cgroups could not be configured with the %s controllers: %s.'
+                               % (', '.join(CGROUP_CONTROLLERS), e))
+            self.close()
+            return none
+
+    @contextmanager
+    def reserve(self):
+        """
+        Reserves a slot for the process started within the enclosed block, waiting for one to free up if necessary. The
+        block's thread runs on the slot's cores until it calls the yielded function with the started process's pid,
+        so that the process inherits them; the function then moves the process into the slot's cgroup, if any.
+        """
+        if not self.__enabled:
+            yield lambda pid: None
+            return
+        with self.__condition:
+            while not self.__free:
+                self.__condition.wait()
+            slot = self.__free.pop(0)
+        restored = [False]
+
+        def started(pid):
+            os.sched_setaffinity(0, self.__driver_cpus)
+            restored[0] = True
+            if slot.cgroup is not None:
+                try:
+                    with open(os.path.join(slot.cgroup, 'cgroup.procs'), 'w') as procs_out:
+                        procs_out.write('%d' % pid)
+                except OSError:
+                    with self.__condition:
+                        self.__description['placement_failures'] += 1
+
+        os.sched_setaffinity(0, slot.cpus)
+        try:
+            yield started
+        finally:
+            if not restored[0]:
+                os.sched_setaffinity(0, self.__driver_cpus)
+            with self.__condition:
+                self.__free.append(slot)
+                self.__condition.notify()
+
+    def close(self):
+        """
+        Moves the driver back into its own cgroup, restoring the controllers that that cgroup enabled for its children,
+        and removes the run's cgroups. Their processes must have exited.
+        """
+        if self.__run_cgroup is None:
+            return
+        for name in os.listdir(self.__run_cgroup):
+            path = os.path.join(self.__run_cgroup, name)
+            if name.startswith('slot-') and os.path.isdir(path):
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass
+        # Controllers are disabled from the bottom up: a cgroup's can't be disabled while its children enable them,
+        # and the parent can't take the driver back while it enables any.
+        for cgroup, controllers in ((self.__run_cgroup, CGROUP_CONTROLLERS),
+                                    (self.__parent_cgroup, self.__parent_controllers)):
+            if controllers:
+                try:
+                    with open(os.path.join(cgroup, 'cgroup.subtree_control'), 'w') as control_out:
+                        control_out.write(' '.join('-' + controller for controller in controllers))
+                except OSError:
+                    pass
+        try:
+            with open(os.path.join(self.__parent_cgroup, 'cgroup.procs'), 'w') as procs_out:
+                procs_out.write('%d' % os.getpid())
+        except OSError:
+            pass
+        for cgroup in (os.path.join(self.__run_cgroup, 'driver'), self.__run_cgroup):
+            try:
+                os.rmdir(cgroup)
+            except OSError:
+                pass
+        self.__run_cgroup = None
+        self.__parent_cgroup = None
+        self.__parent_controllers = []
+
+
+# The isolation of the implementations' processes, which is configured by the --isolate option.
+ISOLATION = ProcessIsolation()
+
+
+def available_memory():
+    """
+    The number of bytes of memory available to new processes without swapping (MemAvailable, on Linux), or the host's
+    physical memory where that isn't reported, or None if neither is known.
+    """
+    try:
+        with open('/proc/meminfo') as meminfo_in:
+            for line in meminfo_in:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class AdmissionTicket:
+    __slots__ = ('name', 'max_concurrency', 'weight')
+
+    def __init__(self, name, max_concurrency, weight):
+        """
+        An invocation waiting to be admitted by `AdmissionControl`.
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.weight = weight
+
+
+class AdmissionControl:
+    def __init__(self):
+        """
+        Queues the invocations of the implementations, when test files are tested concurrently, so that they don't
+        oversubscribe the host's memory. An invocation starts once fewer invocations of its implementation are running
+        than the implementation's concurrency limit, and the memory weights of the running invocations, plus its own,
+        fit within the memory budget. An invocation is always admitted when nothing else is running, however heavy.
+        Invocations are admitted in the order they arrive, except that one may overtake those waiting for their
+        implementation's concurrency limit; memory is reserved for those waiting for memory, so that light invocations
+        can't starve heavy ones.
+
+        An implementation's weight is configured in its `IonBuild`, or else learned: the largest peak RSS of its
+        invocations so far. Until one of its invocations has completed, its weight is unknown, and its invocations run
+        alone. An implementation whose invocations complete without a measured peak RSS (e.g. where `os.wait4` isn't
+        available) can't be learned, so it is given the configured default weight instead. Does nothing unless
+        configured.
+        """
+        self.__enabled = False
+        self.__memory_budget = None
+        self.__unmeasured_weight = None
+        self.__unmeasured = set()
+        self.__condition = threading.Condition()
+        self.__queue = []
+        self.__running = {}
+        self.__admitted_weight = 0
+        self.__learned_weights = {}
+        self.__queued = 0
+        self.__queued_seconds = 0.0
+        self.__peak_weight = 0
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    @property
+    def memory_budget(self):
+        return self.__memory_budget
+
+    def configure(self, memory_budget, unmeasured_weight=None):
+        """
+        Enables admission control.
+        :param memory_budget: The number of bytes within which the running invocations' weights must fit, or None to
+            enforce only the implementations' concurrency limits.
+        :param unmeasured_weight: The weight in bytes of an implementation whose invocations' peak RSS isn't measured,
+            or None to keep assuming that they use the whole budget.
+        """
+        self.__memory_budget = memory_budget
+        self.__unmeasured_weight = unmeasured_weight
+        self.__enabled = True
+
+    def __weight(self, name, weight):
+        if weight is not None:
+            return weight
+        if name in self.__learned_weights:
+            return self.__learned_weights[name]
+        if name in self.__unmeasured and self.__unmeasured_weight is not None:
+            return self.__unmeasured_weight
+        # Until an implementation's weight is learned, its invocations are assumed to use the whole budget.
+        return self.__memory_budget or 0
+
+    def __admissible(self, ticket):
+        # Simulates admitting the waiting invocations in order, as each is admitted once it fits, reserving memory for
+        # those that would fit but for memory. Must be called with the condition held.
+        running = dict(self.__running)
+        count = sum(running.values())
+        used = self.__admitted_weight
+        for waiting in self.__queue:
+            weight = self.__weight(waiting.name, waiting.weight)
+            limit = waiting.max_concurrency
+            fits_concurrency = limit is None or running.get(waiting.name, 0) < limit
+            fits_memory = count == 0 or self.__memory_budget is None or used + weight <= self.__memory_budget
+            if waiting is ticket:
+                return fits_concurrency and fits_memory
+            if fits_concurrency:
+                used += weight
+                if fits_memory:
+                    running[waiting.name] = running.get(waiting.name, 0) + 1
+                    count += 1
+        raise ValueError('Invocation is not queued for admission.')
+
+    @contextmanager
+    def admit(self, name, max_concurrency=None, weight=None, deadline=None):
+        """
+        Waits until an invocation of the named implementation may start, and holds its place until the enclosed block
+        exits. Yields the number of seconds it waited.
+        :param max_concurrency: The implementation's concurrency limit, or None for no limit.
+        :param weight: The implementation's memory weight in bytes, or None to use its learned weight.
+        :param deadline: If provided, the monotonic time after which to stop waiting and raise DeadlineExceeded.
+        """
+        if not self.__enabled:
+            yield 0.0
+            return
+        ticket = AdmissionTicket(name, max_concurrency, weight)
+        start = time.monotonic()
+        waited = False
+        with self.__condition:
+            self.__queue.append(ticket)
+            try:
+                while not self.__admissible(ticket):
+                    waited = True
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise DeadlineExceeded()
+                    self.__condition.wait(remaining)
+            finally:
+                self.__queue.remove(ticket)
+                self.__condition.notify_all()
+            admitted_weight = self.__weight(name, weight)
+            self.__running[name] = self.__running.get(name, 0) + 1
+            self.__admitted_weight += admitted_weight
+            self.__peak_weight = max(self.__peak_weight, self.__admitted_weight)
+            queued_seconds = time.monotonic() - start if waited else 0.0
+            if waited:
+                self.__queued += 1
+                self.__queued_seconds += queued_seconds
+        try:
+            yield queued_seconds
+        finally:
+            with self.__condition:
+                self.__running[name] -= 1
+                self.__admitted_weight -= admitted_weight
+                self.__condition.notify_all()
+
+    def record(self, name, max_rss):
+        """
+        Learns from the peak RSS of a completed invocation of the named implementation, if it was measured. Once an
+        invocation completes unmeasured, the implementation is given the default weight until one is measured.
+        """
+        if not self.__enabled:
+            return
+        with self.__condition:
+            if max_rss is None:
+                self.__unmeasured.add(name)
+            else:
+                self.__learned_weights[name] = max(self.__learned_weights.get(name, 0), max_rss)
+            self.__condition.notify_all()
+
+    @property
+    def description(self):
+        """
+        A dict describing what admission control did, suitable for serialization as an Ion struct: the memory budget,
+        the number of invocations that were queued and the total time they spent queued, the peak total weight of the
+        running invocations, and each implementation's learned weight.
+        """
+        with self.__condition:
+            return {'memory_budget': self.__memory_budget, 'queued_invocations': self.__queued,
+                    'queued_seconds': self.__queued_seconds, 'peak_weight': self.__peak_weight,
+                    'learned_weights': dict(self.__learned_weights)}
+
+
+# The admission control of concurrent invocations, which is configured when test files are tested concurrently.
+ADMISSION = AdmissionControl()
+
+
+def timed_iteration(iterable, phase):
+    """
+    Yields the items of `iterable`, attributing the time spent producing each one to the given phase of PHASE_TIMER.
+    """
+    iterator = iter(iterable)
+    while True:
+        with PHASE_TIMER.phase(phase):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def execute_process(args, timeout=None, max_stderr=None):
+    """
+    Runs the given command to completion, capturing its stderr. Where the platform supports it, the child is reaped
+    with `os.wait4` so that its own rusage (rather than that of all of this process's children) is recorded.
+    :param args: the command to run.
+    :param timeout: seconds after which the command (and everything it spawned) is killed. None for no limit.
+    :param max_stderr: the maximum number of bytes of stderr to retain. None for no limit.
+    :return: a ProcessResult.
+    """
+    with ISOLATION.reserve() as started:
+        return _execute_process(args, timeout, max_stderr, started)
+
+
+def _read_stderr(process, max_stderr):
+    """
+    Starts a thread that drains the child's stderr, retaining at most `max_stderr` bytes (see `read_bounded`).
+    :return: a tuple (the reader thread, a list to which it appends its result once stderr reaches EOF).
+    """
+    captured = []
+    reader = threading.Thread(target=lambda: captured.append(read_bounded(process.stderr, max_stderr)))
+    reader.daemon = True
+    reader.start()
+    return reader, captured
+
+
+def _execute_process(args, timeout, max_stderr, started):
+    start = time.perf_counter()
+    if not hasattr(os, 'wait4'):
+        process = Popen(args, stderr=PIPE, shell=COMMAND_SHELL)
+        started(process.pid)
+        reader, captured = _read_stderr(process, max_stderr)
+        timed_out = False
+        try:
+            try:
+                process.wait(timeout)
+            except TimeoutExpired:
+                timed_out = True
+                kill_process_tree(process)
+                process.wait()
+            # Anything the child spawned that outlives it and holds stderr open is abandoned, with its output.
+            reader.join(STDERR_DRAIN_GRACE)
+        except BaseException:
+            kill_process_tree(process)
+            process.wait()
+            raise
+        finally:
+            if not reader.is_alive():
+                process.stderr.close()
+        stderr, discarded = captured[0] if captured else (b'', 0)
+        wall_time = time.perf_counter() - start
+        PHASE_TIMER.add_child_wait(wall_time)
+        return ProcessResult(process.returncode, stderr, InvocationMetrics(wall_time), timed_out, discarded)
+    process = Popen(args, stderr=PIPE, shell=COMMAND_SHELL, start_new_session=True)
+    started(process.pid)
+    killer = ProcessGroupKiller(process)
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, killer.kill)
+        timer.daemon = True
+        timer.start()
+    reader, captured = _read_stderr(process, max_stderr)
+    try:
+        if hasattr(os, 'waitid'):
+            # Waits for the child without reaping it, so that its process group can still be killed safely.
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            reader.join(STDERR_DRAIN_GRACE)
+            if reader.is_alive():
+                # Something the child spawned still holds stderr open.
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+        reader.join()
+        killer.exited()
+    except BaseException:
+        # The child runs in its own session, so it won't see e.g. a KeyboardInterrupt delivered to the driver.
+        killer.kill()
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not reader.is_alive():
+            process.stderr.close()
+    stderr, discarded = captured[0] if captured else (b'', 0)
+    _, status, rusage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - start
+    PHASE_TIMER.add_child_wait(wall_time)
+    # The child has been reaped; record its status so that Popen doesn't attempt to wait on it again.
+    process.returncode = exit_status(status)
+    metrics = InvocationMetrics(wall_time, rusage.ru_utime, rusage.ru_stime, max_rss_bytes(rusage.ru_maxrss))
+    return ProcessResult(process.returncode, stderr, metrics, killer.fired, discarded)
+
+
+def execute_in_process(function, args, timeout=None, max_stderr=None):
+    """
+    Runs an in-process implementation's CLI function with the given arguments (see `IonBuild`) on a thread of its own,
+    measuring it as `execute_process` measures a child process. User time is the CPU time of that thread.
+    :param timeout: seconds after which the invocation is abandoned and reported as timed out. None for no limit. A
+        thread can't be killed, so an abandoned invocation runs on in the background until it returns.
+    :param max_stderr: the maximum number of bytes of stderr to retain. None for no limit.
+    :return: a ProcessResult.
+    """
+    outcome = []
+
+    def run():
+        cpu_start = time.thread_time()
+        try:
+            outcome.append((function(args), None))
+        except BaseException as e:
+            outcome.append((None, e))
+        outcome.append(time.thread_time() - cpu_start)
+
+    start = time.perf_counter()
+    worker = threading.Thread(target=run)
+    worker.daemon = True
+    worker.start()
+    worker.join(timeout)
+    wall_time = time.perf_counter() - start
+    PHASE_TIMER.add_child_wait(wall_time)
+    if worker.is_alive():
+        return ProcessResult(-signal.SIGTERM, b'', InvocationMetrics(wall_time), timed_out=True)
+    (result, error), user_time = outcome
+    if error is not None:
+        raise error
+    returncode, stderr = result
+    stderr, discarded = bound_output(stderr, max_stderr)
+    return ProcessResult(returncode, stderr, InvocationMetrics(wall_time, user_time), stderr_discarded=discarded)
+
+
+METRICS_INVOCATIONS_FIELD = 'invocations'
+METRICS_WALL_TIME_FIELD = 'wall_time'
+METRICS_USER_TIME_FIELD = 'user_time'
+METRICS_SYSTEM_TIME_FIELD = 'system_time'
+METRICS_MAX_RSS_FIELD = 'max_rss'
+
+
+def new_metrics_totals():
+    """
+    Creates an empty set of resource totals, suitable for serialization as an Ion struct.
+    """
+    return {METRICS_INVOCATIONS_FIELD: 0, METRICS_WALL_TIME_FIELD: 0.0}
+
+
+def merge_metrics_totals(totals, other):
+    """
+    Accumulates one set of resource totals into another. Times are summed; max_rss is the peak of the two.
+    """
+    for field in (METRICS_INVOCATIONS_FIELD, METRICS_WALL_TIME_FIELD, METRICS_USER_TIME_FIELD,
+                  METRICS_SYSTEM_TIME_FIELD):
+        value = other.get(field)
+        if value is not None:
+            totals[field] = totals.get(field, 0) + value
+    max_rss = other.get(METRICS_MAX_RSS_FIELD)
+    if max_rss is not None:
+        totals[METRICS_MAX_RSS_FIELD] = max(totals.get(METRICS_MAX_RSS_FIELD, 0), max_rss)
+
+
+def add_invocation_metrics(totals, metrics):
+    """
+    Accumulates the given InvocationMetrics into `totals`.
+    """
+    merge_metrics_totals(totals, {
+        METRICS_INVOCATIONS_FIELD: 1,
+        METRICS_WALL_TIME_FIELD: metrics.wall_time,
+        METRICS_USER_TIME_FIELD: metrics.user_time,
+        METRICS_SYSTEM_TIME_FIELD: metrics.system_time,
+        METRICS_MAX_RSS_FIELD: metrics.max_rss
+    })
+
+
+# Two-sided 95% critical values of Student's t distribution, indexed by degrees of freedom (1-30). Larger samples use
+# the normal approximation.
+T_CRITICAL_95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145,
+                 2.131, 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048,
+                 2.045, 2.042)
+Z_CRITICAL_95 = 1.960
+
+
+def mean_confidence_interval(samples):
+    """
+    Computes the mean of the given samples and a 95% confidence interval around it.
+    :return: a tuple (mean, low, high). With fewer than two samples, the interval collapses to the mean.
+    """
+    mean = statistics.mean(samples)
+    if len(samples) < 2:
+        return mean, mean, mean
+    degrees_of_freedom = len(samples) - 1
+    critical = T_CRITICAL_95[degrees_of_freedom - 1] if degrees_of_freedom <= len(T_CRITICAL_95) else Z_CRITICAL_95
+    margin = critical * statistics.stdev(samples) / math.sqrt(len(samples))
+    return mean, mean - margin, mean + margin
+
+
+# Rank tests over at most this many samples without ties compute exact p-values; the rest use the normal approximation.
+EXACT_RANK_TEST_MAX_SAMPLES = 50
+
+
+def rank_samples(samples):
+    """
+    Ranks the given samples from 1, assigning tied samples the average of the ranks they span.
+    :return: a tuple (ranks, ties) where ranks[i] is the rank of samples[i] and ties lists the size of each group of
+        two or more tied samples.
+    """
+    order = sorted(range(len(samples)), key=lambda i: samples[i])
+    ranks = [0.0] * len(samples)
+    ties = []
+    start = 0
+    while start < len(order):
+        end = start + 1
+        while end < len(order) and samples[order[end]] == samples[order[start]]:
+            end += 1
+        for i in order[start:end]:
+            ranks[i] = (start + end + 1) / 2.0
+        if end - start > 1:
+            ties.append(end - start)
+        start = end
+    return ranks, ties
+
+
+def normal_survival(z):
+    """
+    Computes P(Z >= z) for a standard normal Z.
+    """
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def mann_whitney_greater(first, second):
+    """
+    One-sided Mann-Whitney U test for independent samples.
+    :return: the p-value of the hypothesis that values in `second` tend to be no larger than values in `first`. A small
+        value means `second` is significantly larger.
+    """
+    n1 = len(first)
+    n2 = len(second)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    ranks, ties = rank_samples(list(first) + list(second))
+    u = sum(ranks[n1:]) - n2 * (n2 + 1) / 2.0
+    if not ties and n1 + n2 <= EXACT_RANK_TEST_MAX_SAMPLES:
+        # counts[j][k] is the number of orderings of i samples from `first` and j from `second` for which k pairs have
+        # the `second` sample larger. Built up one sample of `first` (i) at a time.
+        counts = [[1] for _ in range(n2 + 1)]
+        for i in range(1, n1 + 1):
+            row = [[1]]
+            for j in range(1, n2 + 1):
+                distribution = [0] * (i * j + 1)
+                for k, count in enumerate(counts[j]):  # The largest sample is from `first`.
+                    distribution[k] += count
+                for k, count in enumerate(row[j - 1]):  # The largest sample is from `second`; it beats all i.
+                    distribution[k + i] += count
+                row.append(distribution)
+            counts = row
+        distribution = counts[n2]
+        return sum(distribution[int(u):]) / float(sum(distribution))
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - sum(t ** 3 - t for t in ties) / float(n * (n - 1)))
+    if variance == 0:
+        return 1.0
+    return normal_survival((u - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance))
+
+
+def wilcoxon_signed_rank_greater(differences):
+    """
+    One-sided Wilcoxon signed-rank test for paired samples. Zero differences are discarded.
+    :param differences: For each pair, the second sample minus the first.
+    :return: the p-value of the hypothesis that the differences are not centered above zero. A small value means the
+        second samples are significantly larger.
+    """
+    differences = [d for d in differences if d != 0]
+    n = len(differences)
+    if n == 0:
+        return 1.0
+    ranks, ties = rank_samples([abs(d) for d in differences])
+    w = sum(rank for rank, d in zip(ranks, differences) if d > 0)
+    if not ties and n <= EXACT_RANK_TEST_MAX_SAMPLES:
+        # distribution[s] is the number of subsets of the ranks 1..n that sum to s.
+        distribution = [1]
+        for r in range(1, n + 1):
+            distribution = [count + (distribution[s - r] if s >= r else 0)
+                            for s, count in enumerate(distribution + [0] * r)]
+        return sum(distribution[int(w):]) / float(2 ** n)
+    variance = n * (n + 1) * (2 * n + 1) / 24.0 - sum(t ** 3 - t for t in ties) / 48.0
+    if variance == 0:
+        return 1.0
+    return normal_survival((w - n * (n + 1) / 4.0 - 0.5) / math.sqrt(variance))
+
+
 class IonBuild:
-    def __init__(self, installer, executable, prefix):
+    def __init__(self, installer, executable, prefix, in_process=None, max_concurrency=None, memory_weight=None):
         """
         Build information for an Ion resource.
 
         :param installer: function which builds the resource.
         :param executable: path to the resource's executable (if any), relative to the root of the implementation.
         :param prefix: prefix of the command that runs executable. (e.g java requests java -jar)
+        :param in_process: for an implementation that runs inside the driver instead of being built, a tuple
+            (version, function). The function accepts the CLI arguments and returns a tuple (exit status, stderr bytes).
+        :param max_concurrency: the maximum number of concurrent invocations of the implementation (see
+            `AdmissionControl`), or None for no limit.
+        :param memory_weight: the memory, in bytes, to reserve for each invocation of the implementation (see
+            `AdmissionControl`), or None to learn it from the invocations' peak RSS.
         """
         self.install = installer
         self.execute = executable
         self.prefix = prefix
+        self.in_process = in_process
+        self.max_concurrency = max_concurrency
+        self.memory_weight = memory_weight
 
 
 def install_no_op(log):
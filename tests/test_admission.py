@@ -0,0 +1,186 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import threading
+import time
+from contextlib import ExitStack
+
+import pytest
+
+from amazon.iontest.ion_test_driver_util import AdmissionControl, DeadlineExceeded
+
+BUDGET = 100
+UNMEASURED_WEIGHT = 40
+
+
+def admission_with(memory_budget=BUDGET):
+    admission = AdmissionControl()
+    admission.configure(memory_budget, UNMEASURED_WEIGHT)
+    return admission
+
+
+def admitted_now(admission, name, max_concurrency=None, weight=None):
+    """
+    Whether an invocation would be admitted without waiting, given those running and queued.
+    """
+    try:
+        with admission.admit(name, max_concurrency, weight, deadline=time.monotonic()):
+            return True
+    except DeadlineExceeded:
+        return False
+
+
+def wait_for(condition):
+    end = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < end, 'Timed out.'
+        time.sleep(0.001)
+
+
+def wait_until_queued(admission, count):
+    wait_for(lambda: len(admission._AdmissionControl__queue) >= count)
+
+
+class Waiter(threading.Thread):
+    def __init__(self, admission, order, label, name, max_concurrency=None, weight=None):
+        """
+        Waits for the admission of an invocation of the named implementation in a thread of its own, appends `label`
+        to `order` once admitted, and holds its place until released.
+        """
+        super(Waiter, self).__init__(daemon=True)
+        self.__admission = admission
+        self.__order = order
+        self.__label = label
+        self.__args = (name, max_concurrency, weight)
+        self.released = threading.Event()
+
+    def run(self):
+        with self.__admission.admit(*self.__args):
+            self.__order.append(self.__label)
+            self.released.wait(5)
+
+
+def test_disabled_admits_immediately():
+    with AdmissionControl().admit('a', max_concurrency=1, weight=10 ** 12) as waited:
+        assert waited == 0.0
+
+
+def test_concurrency_limit_lets_other_implementations_overtake():
+    admission = admission_with()
+    with admission.admit('a', max_concurrency=1, weight=10):
+        assert not admitted_now(admission, 'a', max_concurrency=1, weight=10)
+        assert admitted_now(admission, 'b', weight=10)
+    assert admitted_now(admission, 'a', max_concurrency=1, weight=10)
+
+
+def test_running_weights_fit_the_budget():
+    admission = admission_with()
+    with admission.admit('a', weight=60):
+        assert not admitted_now(admission, 'b', weight=50)
+        assert admitted_now(admission, 'b', weight=40)
+    # Nothing else is running, so even an invocation heavier than the budget is admitted.
+    assert admitted_now(admission, 'b', weight=BUDGET * 2)
+
+
+def test_invocations_are_admitted_in_order():
+    admission = admission_with()
+    order = []
+    with admission.admit('a', max_concurrency=1, weight=10):
+        waiters = []
+        for label in ('first', 'second'):
+            waiters.append(Waiter(admission, order, label, 'a', max_concurrency=1, weight=10))
+            waiters[-1].start()
+            wait_until_queued(admission, len(waiters))
+    for index, waiter in enumerate(waiters):
+        wait_for(lambda: len(order) > index)
+        # Only the first is running; the second waits for it.
+        assert order == ['first', 'second'][:index + 1]
+        waiter.released.set()
+        waiter.join(5)
+    assert order == ['first', 'second'] and not any(waiter.is_alive() for waiter in waiters)
+    assert admission.description['queued_invocations'] == 2
+
+
+def test_memory_is_reserved_for_waiting_invocations():
+    admission = admission_with()
+    order = []
+    with ExitStack() as stack:
+        stack.enter_context(admission.admit('light', weight=60))
+        heavy = Waiter(admission, order, 'heavy', 'heavy', weight=80)
+        heavy.start()
+        wait_until_queued(admission, 1)
+        # A light invocation would fit, but it would keep the heavy one waiting for as long as light ones keep arriving.
+        assert not admitted_now(admission, 'light', weight=30)
+    wait_for(lambda: order == ['heavy'])
+    assert admitted_now(admission, 'light', weight=20)
+    assert not admitted_now(admission, 'light', weight=30)
+    heavy.released.set()
+    heavy.join(5)
+    assert admission.description['peak_weight'] == 80 + 20
+
+
+def test_deadline_stops_waiting():
+    admission = admission_with()
+    with admission.admit('a', weight=BUDGET):
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            with admission.admit('b', weight=10, deadline=start + 0.05):
+                pass
+        assert time.monotonic() - start >= 0.05
+    # The invocation that gave up no longer holds a place in the queue.
+    assert admitted_now(admission, 'b', weight=10)
+
+
+def test_unknown_weights_use_the_budget_until_measured():
+    admission = admission_with()
+    with admission.admit('a', weight=10):
+        assert not admitted_now(admission, 'b')
+        admission.record('b', 30)
+        admission.record('b', 20)
+        assert admission.description['learned_weights'] == {'b': 30}
+        assert admitted_now(admission, 'b')
+        assert not admitted_now(admission, 'b', weight=BUDGET)
+
+
+def test_unmeasured_implementations_use_the_default_weight():
+    admission = admission_with()
+    with admission.admit('a', weight=10):
+        assert not admitted_now(admission, 'b')
+        # An unmeasured invocation teaches nothing about the weight, which would otherwise stay unknown.
+        admission.record('b', None)
+        assert 'b' not in admission.description['learned_weights']
+        assert admitted_now(admission, 'b')
+        with admission.admit('c', weight=BUDGET - 10 - UNMEASURED_WEIGHT + 1):
+            assert not admitted_now(admission, 'b')
+    # A measurement replaces the default.
+    admission.record('b', 80)
+    with admission.admit('a', weight=10):
+        assert admitted_now(admission, 'b')
+        with admission.admit('c', weight=20):
+            assert not admitted_now(admission, 'b')
+
+
+def test_unmeasured_invocations_run_concurrently():
+    admission = admission_with()
+    admission.record('b', None)
+    order = []
+    waiters = [Waiter(admission, order, label, 'b') for label in ('first', 'second')]
+    for waiter in waiters:
+        waiter.start()
+    # Both are admitted while the other is still running.
+    wait_for(lambda: len(order) == 2)
+    assert admission.description['peak_weight'] == 2 * UNMEASURED_WEIGHT
+    for waiter in waiters:
+        waiter.released.set()
+        waiter.join(5)
+    assert admission.description['queued_invocations'] == 0
@@ -0,0 +1,41 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import pytest
+
+from amazon.iontest.ion_test_driver import parse_arguments
+
+IMPLEMENTATIONS = ['-i', 'ion-c,a', '-i', 'ion-java,b', '-i', 'ion-js,c']
+
+
+@pytest.mark.parametrize('mode', [[], ['--plan'], ['--fuzz'], ['-f'], ['--watch', 'ion-c,d'],
+                                  ['--bisect', 'a', 'b', 'c'], ['--benchmark']])
+def test_repeated_options_are_counted_once(mode):
+    arguments = parse_arguments(mode + IMPLEMENTATIONS)
+    assert arguments['--implementation'] == ['ion-c,a', 'ion-java,b', 'ion-js,c']
+    arguments = parse_arguments(IMPLEMENTATIONS + mode)
+    assert arguments['--implementation'] == ['ion-c,a', 'ion-java,b', 'ion-js,c']
+
+
+def test_repeated_test_types_are_counted_once():
+    assert parse_arguments(['--fuzz', '-t', 'good', '-t', 'bad'])['--test'] == ['good', 'bad']
+
+
+def test_every_option_has_a_value():
+    default = parse_arguments([])
+    for mode in (['--list'], ['--fuzz'], ['--diff-events', 'a', 'b'], ['--results-diff', 'a,1', 'a,2', 'r.ion']):
+        arguments = parse_arguments(mode)
+        assert set(arguments) == set(default)
+        assert arguments['--output-dir'] == '.'
+    assert not default['--fuzz']
+    assert default['<test_file>'] == []
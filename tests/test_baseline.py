@@ -0,0 +1,117 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import os
+import shutil
+
+import pytest
+import six
+from amazon.ion import simpleion
+
+from amazon.iontest import ion_test_driver
+from amazon.iontest.ion_test_driver import Baseline, CachedReport, IonImplementation
+from amazon.iontest.ion_test_driver_config import ION_BUILDS, RESULTS_FILE_DEFAULT
+from amazon.iontest.ion_test_driver_scaling import STUB_BUILD, write_stubs
+
+# Stubs copy their input as their EventStream, and fail to read the vectors whose header lists them (see STUB_SCRIPT):
+# ion-stub-2 fails to read b.ion.
+VECTORS = {
+    'a.ion': '// \n1',
+    'b.ion': '// e2 \n2',
+}
+
+
+def load(location):
+    with open(location, 'rb') as results_in:
+        return simpleion.load(results_in)
+
+
+def run(implementations, output_root, results_dir, baseline=None):
+    results_root = os.path.join(output_root, results_dir)
+    ion_test_driver.test_all(implementations, os.path.join(output_root, 'ion-tests'),
+                             list(ion_test_driver.TestType.__iter__()), [], results_root, RESULTS_FILE_DEFAULT,
+                             baseline=baseline)
+    return os.path.join(results_root, RESULTS_FILE_DEFAULT)
+
+
+@pytest.fixture
+def stored_run(tmp_path, monkeypatch):
+    """
+    Tests the vectors with two stubs, and returns the stubs and the location of the stored run's results file.
+    """
+    output_root = str(tmp_path)
+    monkeypatch.chdir(output_root)
+    good_dir = os.path.join(output_root, 'ion-tests', ion_test_driver.test_dir_from_version('1.0'), 'good')
+    os.makedirs(good_dir)
+    for name, text in six.iteritems(VECTORS):
+        with open(os.path.join(good_dir, name), 'w') as vector_out:
+            vector_out.write(text)
+    implementations = []
+    for name, directory in write_stubs(os.path.join(output_root, 'stubs'), 2, 0):
+        monkeypatch.setitem(ION_BUILDS, name, STUB_BUILD)
+        implementation = IonImplementation(output_root, name, directory, None)
+        implementation.install_in_place()
+        implementations.append(implementation)
+    return implementations, run(implementations, output_root, 'stored')
+
+
+def test_peers_are_the_stored_implementations_not_being_tested(stored_run):
+    (tested, peer), location = stored_run
+    assert Baseline(location, [tested]).peers == [peer.identifier]
+    assert Baseline(location, [tested, peer]).peers == []
+
+
+def test_peers_reports_are_reused_unchanged(stored_run, tmp_path):
+    (tested, peer), location = stored_run
+    stored = load(location)
+    results = load(run([tested], str(tmp_path), 'now', Baseline(location, [tested])))
+    for name in VECTORS:
+        assert results['good'][name][peer.identifier] == stored['good'][name][peer.identifier]
+        assert results['good'][name][tested.identifier]['result'].text == 'PASS'
+        # The peer wasn't invoked again.
+        assert not os.path.exists(os.path.join(str(tmp_path), 'now', 'good', name, 'read', 'data',
+                                               peer.identifier + '.ion'))
+    assert results['good']['b.ion'][peer.identifier]['result'].text == 'FAIL'
+
+
+def test_files_added_since_are_skipped_for_peers(stored_run, tmp_path):
+    (tested, peer), location = stored_run
+    good_dir = os.path.join(str(tmp_path), 'ion-tests', ion_test_driver.test_dir_from_version('1.0'), 'good')
+    with open(os.path.join(good_dir, 'new.ion'), 'w') as vector_out:
+        vector_out.write('// \n3')
+    # Installed ion-tests are named for their commit, so their manifest is kept; a changed tree needs a new one.
+    os.remove(os.path.join(str(tmp_path), 'ion-tests' + ion_test_driver.MANIFEST_SUFFIX))
+    baseline = Baseline(location, [tested])
+    reports = baseline.reports(ion_test_driver.TestType.GOOD, 'new.ion')
+    assert list(reports) == [peer.identifier]
+    assert not isinstance(reports[peer.identifier], CachedReport)
+    results = load(run([tested], str(tmp_path), 'now', baseline))
+    assert results['good']['new.ion'][peer.identifier]['result'].text == 'SKIPPED'
+    assert results['good']['new.ion'][tested.identifier]['result'].text == 'PASS'
+
+
+def test_cached_report_is_written_unchanged(stored_run):
+    (tested, peer), location = stored_run
+    report = Baseline(location, [tested]).reports(ion_test_driver.TestType.GOOD, 'b.ion')[peer.identifier]
+    assert isinstance(report, CachedReport)
+    assert report.result.text == 'FAIL'
+    assert report.to_ion() == load(location)['good']['b.ion'][peer.identifier]
+    # Resources belong to the stored run, so they aren't summarized with the current run's.
+    assert report.metrics is None and report.performance is None
+
+
+def test_missing_artifacts_are_reported(stored_run, tmp_path):
+    (tested, peer), location = stored_run
+    shutil.rmtree(os.path.join(os.path.dirname(location), 'good', 'a.ion', 'read'))
+    with pytest.raises(ValueError, match='has no outputs of %s for good/a.ion' % peer.identifier):
+        run([tested], str(tmp_path), 'now', Baseline(location, [tested]))
@@ -0,0 +1,48 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import pytest
+
+from amazon.iontest.ion_test_driver_compare import streams_equivalent
+
+LIST_START = '{event_type:CONTAINER_START, ion_type:LIST, depth:0}'
+LIST_END = '{event_type:CONTAINER_END, ion_type:LIST, depth:0}'
+STREAM_END = '{event_type:STREAM_END, depth:0}'
+
+
+def event_stream(*events):
+    return '$ion_event_stream ' + ' '.join(events + (STREAM_END,))
+
+
+def scalar(fields, depth=1):
+    return '{event_type:SCALAR, ion_type:INT, %s, depth:%d}' % (fields, depth)
+
+
+@pytest.mark.parametrize('events,expected', [
+    ((LIST_START, scalar('value_text:"1"'), LIST_END), True),
+    ((LIST_START, scalar('value_binary:[0x21, 0x01]'), LIST_END), True),
+    ((LIST_START, scalar('value_text:"1", value_binary:[0x21, 0x01]'), LIST_END), True),
+    ((LIST_START, scalar('value_text:"2"'), LIST_END), False),
+    # The encodings disagree; only the implementations can tell which is wrong.
+    ((LIST_START, scalar('value_text:"1", value_binary:[0x21, 0x02]'), LIST_END), None),
+    ((LIST_START, scalar('value_text:"2", value_binary:[0x21, 0x01]'), LIST_END), None),
+    ((LIST_START, scalar('value_text:"1"', depth=0), LIST_END), None),
+    ((LIST_START, scalar('value_text:"1", import_location:1'), LIST_END), None),
+    ((LIST_START, scalar('value_text:"1"'), LIST_END.replace('depth:0', 'depth:1')), None),
+])
+def test_event_stream_against_ion_stream(tmp_path, events, expected):
+    ion = tmp_path / 'values.ion'
+    ion.write_text(u'[1]')
+    events_file = tmp_path / 'events.ion'
+    events_file.write_text(event_stream(*events))
+    assert streams_equivalent([str(ion), str(events_file)]) is expected
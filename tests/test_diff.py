@@ -0,0 +1,108 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import random
+
+import pytest
+from amazon.ion import simpleion
+
+from amazon.iontest.ion_test_driver_diff import align_events, diff_event_streams, event_keys, stream_events
+from amazon.iontest.ion_test_driver_python import run_cli
+
+DATA = u'''
+$ion_1_0
+a::1
+{name: "x", 'quoted field': [1, 2.5, 3e0, -0.0d1], nested: {s: sym, n: null.int, b: true}}
+(op 1 two::"three" {{aGVsbG8=}} {{"clob"}})
+2001-02-03T04:05:06.007Z
+null
+[]
+'''
+
+
+def lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def test_align_events_is_minimal():
+    rng = random.Random(7)
+    for _ in range(3000):
+        a = [rng.randrange(4) for _ in range(rng.randrange(13))]
+        b = [rng.randrange(4) for _ in range(rng.randrange(13))]
+        regions = align_events(a, b)
+        # Replacing each region of `a` with its counterpart in `b` produces `b`, and the events outside the regions
+        # are common to both, in order.
+        rebuilt = []
+        a_index = b_index = 0
+        for a_start, a_end, b_start, b_end in regions:
+            assert a_start - a_index == b_start - b_index >= 0
+            assert a[a_index:a_start] == b[b_index:b_start]
+            assert a_start < a_end or b_start < b_end
+            rebuilt.extend(b[b_index:b_end])
+            a_index, b_index = a_end, b_end
+        assert a[a_index:] == b[b_index:]
+        rebuilt.extend(b[b_index:])
+        assert rebuilt == b
+        edits = sum((a_end - a_start) + (b_end - b_start) for a_start, a_end, b_start, b_end in regions)
+        assert edits == len(a) + len(b) - 2 * lcs_length(a, b), (a, b)
+
+
+def test_stream_events_are_independent_of_the_encoding(tmp_path):
+    text = tmp_path / 'data.ion'
+    text.write_text(DATA)
+    binary = tmp_path / 'data.10n'
+    binary.write_bytes(simpleion.dumps(simpleion.loads(DATA, single_value=False), binary=True, sequence_as_stream=True))
+    locations = [str(text), str(binary)]
+    for source in (text, binary):
+        for output_format in ('events', 'events-binary'):
+            events = tmp_path / ('%s-%s.ion' % (source.name, output_format))
+            assert run_cli(('process', '--output', str(events), '--output-format', output_format, str(source))) == \
+                (0, b'')
+            locations.append(str(events))
+    expected = list(stream_events(locations[0]))
+    assert len(expected) == 27
+    for location in locations[1:]:
+        assert list(stream_events(location)) == expected, location
+
+
+def test_event_keys_match_only_equal_events(tmp_path):
+    text = tmp_path / 'data.ion'
+    text.write_text(DATA + u' -1 -2 "-1" sym::-1')
+    binary = tmp_path / 'data.10n'
+    binary.write_bytes(simpleion.dumps(simpleion.loads(text.read_text(), single_value=False), binary=True,
+                                       sequence_as_stream=True))
+    events = list(stream_events(str(text)))
+    keys = event_keys(str(text))
+    assert len(keys) == len(events)
+    assert len(set(keys)) == len(set(events))
+    assert event_keys(str(binary)) == keys
+
+
+@pytest.mark.parametrize('first,second,path', [
+    # The context before the divergent event is in a struct, but the event isn't.
+    (u'{a:1, b:2} foo::2', u'{a:1, b:2} 2', 'the top level'),
+    (u'1 2 3 {a:[1, 2]}', u'1 2 3 {a:[1, 3]}', 'struct > a: list'),
+])
+def test_diff_describes_the_containers_of_the_divergent_event(tmp_path, capsys, first, second, path):
+    first_location = tmp_path / 'first.ion'
+    first_location.write_text(first)
+    second_location = tmp_path / 'second.ion'
+    second_location.write_text(second)
+    assert diff_event_streams(str(first_location), str(second_location), context=3) == 1
+    assert ', in %s @@' % path in capsys.readouterr().out
@@ -0,0 +1,149 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import os
+import sys
+import time
+
+import pytest
+from amazon.ion import simpleion
+
+from amazon.iontest import ion_test_driver
+from amazon.iontest.ion_test_driver import IonImplementation
+from amazon.iontest.ion_test_driver_config import EXECUTION_LIMITS, ION_BUILDS, RESULTS_FILE_DEFAULT
+from amazon.iontest.ion_test_driver_scaling import STUB_BUILD, write_stubs
+from amazon.iontest.ion_test_driver_util import STDERR_DRAIN_GRACE, execute_process
+
+TIMEOUT = 1.0
+# Far longer than any of the calls below are allowed to take.
+SLEEP = 60
+# Allows for a slow, loaded host.
+SLACK = 5.0
+
+
+@pytest.fixture(params=['wait4', 'no-wait4'])
+def platform(request, monkeypatch):
+    """
+    Runs the test on both of execute_process's paths: reaping the child with os.wait4, and (as on Windows) without.
+    """
+    if request.param == 'wait4':
+        if not hasattr(os, 'wait4'):
+            pytest.skip('os.wait4 is not available.')
+    else:
+        monkeypatch.delattr(os, 'wait4', raising=False)
+    return request.param
+
+
+def python(script):
+    return sys.executable, '-c', script
+
+
+def timed(args, **limits):
+    start = time.monotonic()
+    result = execute_process(args, **limits)
+    return result, time.monotonic() - start
+
+
+def spawning(child_script):
+    """
+    :return: a script that starts a grandchild running `child_script`, which inherits its stderr, then sleeps.
+    """
+    return 'import subprocess, sys, time\n' \
+           'subprocess.Popen((sys.executable, "-c", %r))\n' \
+           'time.sleep(%d)\n' % (child_script, SLEEP)
+
+
+def test_timeout_kills_sleeping_child(platform):
+    result, elapsed = timed(python('import time; time.sleep(%d)' % SLEEP), timeout=TIMEOUT)
+    assert result.timed_out
+    assert result.returncode != 0
+    assert elapsed < TIMEOUT + STDERR_DRAIN_GRACE + SLACK
+
+
+def test_completed_child_is_not_timed_out(platform):
+    result, _ = timed(python('import sys; sys.stderr.write("done"); sys.exit(3)'), timeout=SLEEP)
+    assert not result.timed_out
+    assert result.returncode == 3
+    assert result.stderr == b'done'
+    assert result.stderr_discarded == 0
+
+
+def test_timeout_kills_grandchild_holding_stderr(platform):
+    result, elapsed = timed(python(spawning('import time; time.sleep(%d)' % SLEEP)), timeout=TIMEOUT)
+    assert result.timed_out
+    assert elapsed < TIMEOUT + STDERR_DRAIN_GRACE + SLACK
+
+
+def test_exited_child_does_not_wait_for_grandchild_holding_stderr(platform):
+    script = 'import subprocess, sys\nsubprocess.Popen((sys.executable, "-c", "import time; time.sleep(%d)"))\n' \
+             % SLEEP
+    result, elapsed = timed(python(script), timeout=SLEEP)
+    assert not result.timed_out
+    assert result.returncode == 0
+    assert elapsed < STDERR_DRAIN_GRACE + SLACK
+
+
+def test_stderr_flood_is_capped(platform):
+    flood = 4 * 1024 * 1024
+    result, _ = timed(python('import sys; sys.stderr.buffer.write(b"x" * %d)' % flood), timeout=SLEEP,
+                      max_stderr=1024)
+    assert not result.timed_out
+    assert result.stderr == b'x' * 1024
+    assert result.stderr_discarded == flood - 1024
+
+
+def test_flood_from_timed_out_grandchild_is_capped(platform):
+    flood = 'import sys\nwhile True: sys.stderr.buffer.write(b"x" * 65536)'
+    result, elapsed = timed(python(spawning(flood)), timeout=TIMEOUT, max_stderr=1024)
+    assert result.timed_out
+    assert len(result.stderr) <= 1024
+    assert elapsed < TIMEOUT + STDERR_DRAIN_GRACE + SLACK
+
+
+def install_stub(output_root, latency, monkeypatch):
+    (name, directory), = write_stubs(os.path.join(output_root, 'stubs'), 1, latency)
+    monkeypatch.setitem(ION_BUILDS, name, STUB_BUILD)
+    implementation = IonImplementation(output_root, name, directory, None)
+    implementation.install_in_place()
+    return implementation
+
+
+def test_timed_out_invocation_is_reported_as_timeout(tmp_path, monkeypatch):
+    output_root = str(tmp_path)
+    monkeypatch.chdir(output_root)
+    monkeypatch.setitem(EXECUTION_LIMITS, 'timeout', TIMEOUT)
+    good_dir = os.path.join(output_root, 'ion-tests', ion_test_driver.test_dir_from_version('1.0'), 'good')
+    os.makedirs(good_dir)
+    with open(os.path.join(good_dir, 'a.ion'), 'w') as vector_out:
+        vector_out.write('// \n1')
+    # The stub sleeps in a child of its own shell, so only killing the whole process group stops it in time.
+    implementation = install_stub(output_root, SLEEP, monkeypatch)
+    results_root = os.path.join(output_root, 'results')
+    start = time.monotonic()
+    ion_test_driver.test_all([implementation], os.path.join(output_root, 'ion-tests'),
+                             [ion_test_driver.TestType.GOOD], [], results_root, RESULTS_FILE_DEFAULT)
+    assert time.monotonic() - start < TIMEOUT + STDERR_DRAIN_GRACE + SLACK
+    with open(os.path.join(results_root, RESULTS_FILE_DEFAULT), 'rb') as results_in:
+        results = simpleion.load(results_in)
+    report = results['good']['a.ion'][implementation.identifier]
+    assert report['result'].text == 'FAIL'
+    assert [error['error_type'].text for error in report['read_error']] == ['TIMEOUT']
+
+
+def test_event_format_negotiation_survives_the_deadline(tmp_path, monkeypatch):
+    output_root = str(tmp_path)
+    monkeypatch.chdir(output_root)
+    implementation = install_stub(output_root, 0, monkeypatch)
+    monkeypatch.setitem(EXECUTION_LIMITS, 'deadline', time.monotonic() - 1)
+    ion_test_driver.negotiate_event_formats([implementation], output_root)
+    assert implementation.event_output_format == ion_test_driver.EVENTS_OUTPUT_FORMAT_TEXT
@@ -0,0 +1,95 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import os
+from collections import namedtuple
+
+import pytest
+
+from amazon.iontest.ion_test_driver import CostHistory, schedule_test_files, select_shard, parse_shard
+from amazon.iontest.ion_test_driver_config import COST_ESTIMATE_DEFAULTS, HISTORY_SMOOTHING
+import os
+
+import pytest
+
+from amazon.iontest import ion_test_driver
+
+
+def path(*components):
+    return os.path.join('iontestdata', *components)
+
+
+PATHS = [path('good', 'one.ion'), path('good', 'bone.ion'), path('good', 'blobs.ion'), path('good', 'blobs.10n'),
+         path('good', 'equivs', 'ints.ion'), path('good', 'equivs', 'ints.10n'), path('bad', 'one.ion'),
+         path('good', 'timestamp', 'one.ion')]
+
+
+def select(*patterns):
+    return ion_test_driver.TestFileFilter(patterns).select(PATHS)
+
+
+def test_no_patterns_select_everything():
+    assert select() == set(PATHS)
+
+
+def test_suffix():
+    assert select(path('good', 'blobs.ion')) == {path('good', 'blobs.ion')}
+    assert select(os.path.join('good', 'blobs.ion')) == {path('good', 'blobs.ion')}
+    assert select('blobs.ion') == {path('good', 'blobs.ion')}
+
+
+def test_suffix_matches_whole_components():
+    assert select('one.ion') == {path('good', 'one.ion'), path('bad', 'one.ion'), path('good', 'timestamp', 'one.ion')}
+    assert select('bone.ion') == {path('good', 'bone.ion')}
+    assert select(os.path.join('good', 'one.ion')) == {path('good', 'one.ion')}
+    assert select('ne.ion') == set()
+    assert select(os.path.join('od', 'one.ion')) == set()
+
+
+def test_glob():
+    assert select(os.path.join('equivs', '*.10n')) == {path('good', 'equivs', 'ints.10n')}
+    assert select('*.10n') == {path('good', 'blobs.10n'), path('good', 'equivs', 'ints.10n')}
+    assert select(os.path.join('good', 'b*.ion')) == {path('good', 'bone.ion'), path('good', 'blobs.ion')}
+
+
+def test_glob_matches_whole_components():
+    assert select('?ne.ion') == {path('good', 'one.ion'), path('bad', 'one.ion'), path('good', 'timestamp', 'one.ion')}
+    assert select('[bo]ne.ion') == {path('good', 'one.ion'), path('bad', 'one.ion'),
+                                    path('good', 'timestamp', 'one.ion')}
+
+
+def test_glob_star_matches_across_components():
+    assert select(os.path.join('good', '*.10n')) == {path('good', 'blobs.10n'), path('good', 'equivs', 'ints.10n')}
+
+
+def test_suffixes_and_globs_combine():
+    assert select('bone.ion', '*.10n') == {path('good', 'bone.ion'), path('good', 'blobs.10n'),
+                                           path('good', 'equivs', 'ints.10n')}
+
+
+def test_absolute_paths_select_nothing():
+    assert select(os.path.abspath(path('good', 'blobs.ion'))) == set()
+
+
+def test_unmatched():
+    test_file_filter = ion_test_driver.TestFileFilter(['one.ion', 'ne.ion', '*.10n', '*.txt'])
+    assert test_file_filter.unmatched(PATHS) == ['ne.ion', '*.txt']
+    assert ion_test_driver.TestFileFilter([]).unmatched(PATHS) == []
+
+
+@pytest.mark.parametrize('count', [1, 10, 1000])
+def test_suffix_search_matches_linear_scan(count):
+    paths = [path('good', '%d.ion' % i) for i in range(count)]
+    for suffix in ('1.ion', '11.ion', '0.ion'):
+        expected = {p for p in paths if p == suffix or p.endswith(os.sep + suffix)}
+        assert ion_test_driver.TestFileFilter([suffix]).select(paths) == expected
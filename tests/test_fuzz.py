@@ -0,0 +1,179 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import itertools
+import os
+import random
+
+import pytest
+from amazon.ion import simpleion
+
+from amazon.iontest.ion_test_driver_fuzz import FailingSeeds, Traversal, generate_traversal, traversal_seed, \
+    MAX_INSTRUCTIONS, READ_INSTRUCTIONS
+from amazon.iontest.ion_test_driver_python import traverse_events, stream_events
+
+VALUES = u'1 a::{b:[2, 3.0, "four"], c:null.int} [] (five (six)) seven'
+EVENT_COUNT = 18  # Excluding the STREAM_END.
+
+
+def values():
+    return simpleion.loads(VALUES, single_value=False)
+
+
+def summary(events):
+    return [(event['event_type'].text, event['depth'], event.get('ion_type').text if 'ion_type' in event else None)
+            for event in events]
+
+
+def test_full_traversal_matches_stream_events():
+    expected = list(stream_events(values()))
+    assert len(expected) == EVENT_COUNT + 1
+    assert list(traverse_events(values(), ['NEXT'] * (EVENT_COUNT + 1))) == expected
+
+
+def test_no_instructions():
+    assert summary(traverse_events(values(), [])) == [('STREAM_END', 0, None)]
+
+
+def test_skip_steps_over_a_container():
+    events = summary(traverse_events(values(), ['NEXT', 'NEXT', 'SKIP', 'NEXT']))
+    assert events == [('SCALAR', 0, 'INT'), ('CONTAINER_START', 0, 'STRUCT'), ('CONTAINER_END', 0, 'STRUCT'),
+                      ('CONTAINER_START', 0, 'LIST'), ('CONTAINER_END', 0, 'LIST'), ('STREAM_END', 0, None)]
+
+
+def test_skip_steps_out_of_a_container():
+    events = summary(traverse_events(values(), ['NEXT', 'NEXT', 'NEXT', 'NEXT', 'SKIP', 'NEXT', 'NEXT']))
+    assert events == [('SCALAR', 0, 'INT'), ('CONTAINER_START', 0, 'STRUCT'), ('CONTAINER_START', 1, 'LIST'),
+                      ('SCALAR', 2, 'INT'), ('CONTAINER_END', 1, 'LIST'), ('SCALAR', 1, 'INT'),
+                      ('CONTAINER_END', 0, 'STRUCT'), ('STREAM_END', 0, None)]
+
+
+def test_skip_at_the_top_level_emits_nothing():
+    assert summary(traverse_events(values(), ['SKIP', 'NEXT'])) == [('SCALAR', 0, 'INT'), ('STREAM_END', 0, None)]
+
+
+def test_field_names_and_annotations():
+    events = list(itertools.islice(traverse_events(values(), ['NEXT', 'NEXT', 'NEXT']), 3))
+    assert [token['text'] for token in events[1]['annotations']] == ['a']
+    assert events[2]['field_name']['text'] == 'b'
+
+
+def test_instructions_ending_on_an_unentered_container():
+    events = summary(traverse_events(values(), ['NEXT', 'NEXT']))
+    assert events[-2:] == [('CONTAINER_END', 0, 'STRUCT'), ('STREAM_END', 0, None)]
+
+
+def test_instructions_ending_inside_a_container():
+    with pytest.raises(ValueError):
+        list(traverse_events(values(), ['NEXT', 'NEXT', 'NEXT']))
+
+
+def test_instructions_after_the_stream_ends():
+    with pytest.raises(ValueError):
+        list(traverse_events(values(), ['NEXT'] * (EVENT_COUNT + 2)))
+
+
+def test_random_traversals_are_well_formed():
+    generator = random.Random(0)
+    for _ in range(500):
+        instructions = generate_traversal(generator.getrandbits(60), EVENT_COUNT)
+        try:
+            events = summary(traverse_events(values(), instructions))
+        except ValueError:
+            continue
+        open_containers = []
+        for event_type, depth, ion_type in events:
+            if event_type == 'CONTAINER_START':
+                assert depth == len(open_containers)
+                open_containers.append(ion_type)
+            elif event_type == 'CONTAINER_END':
+                assert open_containers.pop() == ion_type
+                assert depth == len(open_containers)
+            elif event_type == 'SCALAR':
+                assert depth == len(open_containers)
+        assert open_containers == []
+        assert events[-1] == ('STREAM_END', 0, None)
+        assert [event for event in events if event[0] == 'STREAM_END'] == [('STREAM_END', 0, None)]
+
+
+@pytest.mark.parametrize('event_count', [0, 1, 18, 10000])
+def test_generate_traversal(event_count):
+    for seed in range(200):
+        instructions = generate_traversal(seed, event_count)
+        assert instructions == generate_traversal(seed, event_count)
+        assert 1 <= len(instructions) <= min(MAX_INSTRUCTIONS, 2 * event_count + 2)
+        assert set(instructions) <= set(READ_INSTRUCTIONS)
+
+
+def test_generate_traversal_varies_with_the_seed():
+    traversals = [tuple(generate_traversal(seed, 100)) for seed in range(100)]
+    assert len(set(traversals)) == len(traversals)
+    assert len(set(len(traversal) for traversal in traversals)) > 10
+    assert any('SKIP' in traversal for traversal in traversals)
+
+
+def test_traversal_seed():
+    seed = traversal_seed(1, 'ab12', 0)
+    assert seed == traversal_seed(1, 'ab12', 0)
+    assert 0 <= seed < 2 ** 60
+    assert len({seed, traversal_seed(2, 'ab12', 0), traversal_seed(1, 'cd34', 0), traversal_seed(1, 'ab12', 1)}) == 4
+
+
+def test_traversal_write(tmp_path):
+    traversal = Traversal(traversal_seed(1, 'ab12', 0), str(tmp_path / 'traversals' / 'one.ion'), EVENT_COUNT)
+    traversal.write()
+    written = simpleion.load(open(traversal.location, 'rb'), single_value=False)
+    assert [instruction.text for instruction in written] == generate_traversal(traversal.seed, EVENT_COUNT)
+
+
+def test_failing_seeds_add(tmp_path):
+    seeds = FailingSeeds(str(tmp_path / 'seeds.ion'))
+    assert seeds.add('good/one.ion', 'ab12', 1, ['ion-java:read_error', 'ion-c:read_compare'])
+    # The same failure, found by another traversal.
+    assert not seeds.add('good/one.ion', 'ab12', 2, ['ion-c:read_compare', 'ion-java:read_error'])
+    # A different failure found by the same traversal.
+    assert not seeds.add('good/one.ion', 'ab12', 1, ['ion-c:read_error'])
+    assert seeds.add('good/one.ion', 'ab12', 3, ['ion-c:read_error'])
+    assert seeds.add('good/two.ion', 'cd34', 1, ['ion-c:read_compare'])
+    assert seeds.seeds('good/one.ion', 'ab12') == [1, 3]
+    # The vector changed since its failures were found.
+    assert seeds.seeds('good/one.ion', 'ef56') == []
+    assert seeds.seeds('good/three.ion', 'ab12') == []
+
+
+def test_failing_seeds_round_trip(tmp_path):
+    location = str(tmp_path / 'seeds.ion')
+    seeds = FailingSeeds(location)
+    seeds.add('good/one.ion', 'ab12', 1, ['ion-c:read_compare'])
+    seeds.add('good/one.ion', 'ab12', 3, ['ion-c:read_error'])
+    seeds.add('good/two.ion', 'cd34', 2, ['ion-java:read_error'])
+    seeds.save()
+    loaded = FailingSeeds(location)
+    assert loaded.seeds('good/one.ion', 'ab12') == [1, 3]
+    assert loaded.seeds('good/two.ion', 'cd34') == [2]
+    assert not loaded.add('good/one.ion', 'ab12', 4, ['ion-c:read_compare'])
+    loaded.remove('good/one.ion', 1)
+    loaded.remove('good/two.ion', 5)  # Not stored.
+    loaded.save()
+    reloaded = FailingSeeds(location)
+    assert reloaded.seeds('good/one.ion', 'ab12') == [3]
+    assert reloaded.seeds('good/two.ion', 'cd34') == [2]
+    assert reloaded.add('good/one.ion', 'ab12', 4, ['ion-c:read_compare'])
+
+
+def test_failing_seeds_save_without_changes(tmp_path):
+    location = str(tmp_path / 'seeds.ion')
+    seeds = FailingSeeds(location)
+    seeds.remove('good/one.ion', 1)
+    seeds.save()
+    assert not os.path.exists(location)
@@ -0,0 +1,63 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import os
+
+import pytest
+import six
+from amazon.ion import simpleion
+
+from amazon.iontest import ion_test_driver
+from amazon.iontest.ion_test_driver import IonImplementation, generate_test_files, plan_test_file
+from amazon.iontest.ion_test_driver_config import COMPARE_PREFILTER, COMPARE_PREFILTER_POLICIES, RESULTS_FILE_DEFAULT
+from amazon.iontest.ion_test_driver_util import METRICS_INVOCATIONS_FIELD
+
+VECTORS = {
+    os.path.join('good', 'one.ion'): '1 2 3',
+    os.path.join('good', 'struct.ion'): '{a:1, b:[1,2,3]}',
+    os.path.join('good', 'equivs', 'ones.ion'): '(1 1)',
+    os.path.join('bad', 'under.ion'): '[1__0]',
+}
+
+
+def ion_tests_with_vectors(root):
+    for path, text in six.iteritems(VECTORS):
+        location = os.path.join(root, 'ion-tests', ion_test_driver.test_dir_from_version('1.0'), path)
+        if not os.path.isdir(os.path.dirname(location)):
+            os.makedirs(os.path.dirname(location))
+        with open(location, 'w') as f:
+            f.write(text)
+    return os.path.join(root, 'ion-tests')
+
+
+@pytest.mark.parametrize('policy', COMPARE_PREFILTER_POLICIES)
+def test_plan_matches_a_run(tmp_path, monkeypatch, policy):
+    monkeypatch.setitem(COMPARE_PREFILTER, 'policy', policy)
+    output_root = str(tmp_path)
+    monkeypatch.chdir(output_root)
+    tests_dir = ion_tests_with_vectors(output_root)
+    implementation = IonImplementation(output_root, 'ion-python', 'unused', None)
+    implementation.install()
+    test_types = list(ion_test_driver.TestType.__iter__())
+    results_root = os.path.join(output_root, 'results')
+    ion_test_driver.test_all([implementation], tests_dir, test_types, [], results_root, RESULTS_FILE_DEFAULT)
+    with open(os.path.join(results_root, RESULTS_FILE_DEFAULT), 'rb') as results_in:
+        results = simpleion.load(results_in)
+    test_files = list(generate_test_files(tests_dir, test_types, [], results_root, []))
+    assert len(test_files) == len(VECTORS)
+    for test_file in test_files:
+        test_type, short_path = test_file.key.split('/', 1)
+        metrics = results[test_type][short_path][implementation.identifier]['metrics']
+        invocations = {phase: totals[METRICS_INVOCATIONS_FIELD] for phase, totals in six.iteritems(metrics)}
+        planned = {phase: counts[0] for phase, counts in six.iteritems(plan_test_file(test_file, 1)) if counts[0]}
+        assert invocations == planned, test_file.key
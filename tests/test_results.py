@@ -0,0 +1,127 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+from collections import namedtuple
+from io import BytesIO
+
+import six
+from amazon.ion import simpleion
+from amazon.ion.equivalence import ion_equals
+
+from amazon.iontest import ion_test_driver
+from amazon.iontest.ion_test_driver_util import InvocationMetrics
+
+# Stand-ins for the attributes of TestResult and CompareResult that a TestReport records.
+Result = namedtuple('Result', ['error_location'])
+Comparison = namedtuple('Comparison', ['output_location', 'has_comparison_failures', 'error_location', 'has_errors'])
+
+ERRORS = u"""
+{error_type: READ, message: "Repeated underscore in numeric value.", location: "good/one.ion"}
+{error_type: STATE, message: "Unexpected EOF.", location: "good/one.ion"}
+"""
+FAILURES = u"""
+{result: NOT_EQUAL, lhs: {location: "ion-c_abc.ion", event: {event_type: SCALAR, ion_type: INT, value_text: "1",
+ value_binary: [0x21, 0x01], depth: 1}, event_index: 2}, rhs: {location: "good/one.ion", event: {event_type: SCALAR,
+ ion_type: INT, value_text: "2", value_binary: [0x21, 0x02], depth: 1}, event_index: 2}, message: "1 vs. 2"}
+"""
+
+
+def report_file(tmp_path, name, contents):
+    location = tmp_path / name
+    location.write_text(contents)
+    return str(location)
+
+
+def results(tmp_path):
+    errors = report_file(tmp_path, 'errors.ion', ERRORS)
+    failures = report_file(tmp_path, 'failures.ion', FAILURES)
+    passed = ion_test_driver.TestReport()
+    passed.add_metrics('read', InvocationMetrics(0.012, 0.004, 0.002, 4321280))
+    read_error = ion_test_driver.TestReport()
+    read_error.error(Result(errors), is_read=True)
+    compare = ion_test_driver.TestReport()
+    compare.fail_compare(Comparison(failures, True, errors, True), is_read=True)
+    compare.fail_compare(Comparison(failures, True, None, False), is_read=False)
+    write_error = ion_test_driver.TestReport()
+    write_error.error(Result(errors), is_read=False)
+    skipped = ion_test_driver.TestReport()
+    skipped.skip()
+    return {
+        'good': {
+            'good/one.ion': {'ion-c_abc': passed, 'ion-java_def': read_error},
+            "good/it's \"quoted\".ion": {'ion-c_abc': write_error, 'ion-java_def': skipped},
+            u'good/ünicode.ion': {'ion-c_abc': ion_test_driver.TestReport()}
+        },
+        'equivs': {
+            'good/equivs/ints.ion': {'ion-c_abc': compare}
+        },
+        'bad': {}
+    }
+
+
+def dumped(results):
+    results_out = BytesIO()
+    ion_test_driver.dump_results(results, results_out)
+    return results_out.getvalue()
+
+
+def previously_dumped(results):
+    # The results file as it was written before reports were serialized one test file at a time.
+    results_out = BytesIO()
+    simpleion.dump({test_type: {test_file: {impl: report.to_ion() for impl, report in six.iteritems(reports)}
+                                for test_file, reports in six.iteritems(test_files)}
+                    for test_type, test_files in six.iteritems(results)}, results_out, binary=False)
+    return results_out.getvalue()
+
+
+def test_dump_results_matches_simpleion_dump(tmp_path):
+    actual = simpleion.loads(dumped(results(tmp_path)))
+    expected = simpleion.loads(previously_dumped(results(tmp_path)))
+    assert ion_equals(actual, expected)
+    assert simpleion.dumps(actual, binary=False) == simpleion.dumps(expected, binary=False)
+
+
+def test_dump_results_schema(tmp_path):
+    actual = simpleion.loads(dumped(results(tmp_path)))
+    errors = simpleion.loads(ERRORS, single_value=False)
+    failures = simpleion.loads(FAILURES, single_value=False)
+    compare = actual['equivs']['good/equivs/ints.ion']['ion-c_abc']
+    assert compare['result'].text == 'FAIL'
+    assert ion_equals(list(compare['read_compare']['failures']), failures)
+    assert compare['read_compare']['failures'].ion_annotations[0].text == 'ComparisonReport'
+    assert ion_equals(list(compare['read_compare']['errors']), errors)
+    assert compare['read_compare']['errors'].ion_annotations[0].text == 'ErrorReport'
+    assert 'errors' not in compare['write_compare']
+    read_error = actual['good']['good/one.ion']['ion-java_def']
+    assert ion_equals(list(read_error['read_error']), errors)
+    assert read_error['read_error'].ion_annotations[0].text == 'ErrorReport'
+    passed = actual['good']['good/one.ion']['ion-c_abc']
+    assert passed['result'].text == 'PASS'
+    assert passed['metrics']['read']['max_rss'] == 4321280
+    assert actual['good']["good/it's \"quoted\".ion"]['ion-java_def']['result'].text == 'SKIPPED'
+    assert actual['good'][u'good/ünicode.ion']['ion-c_abc']['result'].text == 'PASS'
+    assert len(actual['bad']) == 0
+
+
+def test_dump_empty_results():
+    assert ion_equals(simpleion.loads(dumped({})), simpleion.loads(previously_dumped({})))
+
+
+def test_dump_results_with_omitted_failures(tmp_path, monkeypatch):
+    monkeypatch.setitem(ion_test_driver.REPORT_LIMITS, 'max-failures', 1)
+    actual = simpleion.loads(dumped(results(tmp_path)))
+    assert ion_equals(actual, simpleion.loads(previously_dumped(results(tmp_path))))
+    read_error = actual['good']['good/one.ion']['ion-java_def']
+    assert len(read_error['read_error']) == 1
+    assert read_error['omitted']['read_error'] == 1
+    assert actual['equivs']['good/equivs/ints.ion']['ion-c_abc']['omitted']['read_compare']['errors'] == 1
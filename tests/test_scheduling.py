@@ -0,0 +1,149 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import os
+from collections import namedtuple
+
+import pytest
+
+from amazon.iontest.ion_test_driver import CostHistory, schedule_test_files, select_shard, parse_shard
+from amazon.iontest.ion_test_driver_config import COST_ESTIMATE_DEFAULTS, HISTORY_SMOOTHING
+
+# Stand-ins for the attributes of TestFile and IonImplementation that the scheduler uses.
+File = namedtuple('File', ['key', 'size', 'digest', 'invocation_seconds', 'failed_implementations'])
+Impl = namedtuple('Impl', ['name', 'identifier'])
+
+ION_C = Impl('ion-c', 'ion-c_abc')
+ION_JAVA = Impl('ion-java', 'ion-java_def')
+
+
+def measured(key, size=100, digest='d', c=1.0, java=2.0, failed=()):
+    return File(key, size, digest, {ION_C.identifier: c, ION_JAVA.identifier: java}, set(failed))
+
+
+def history_with(tmp_path, *files):
+    location = str(tmp_path / 'history.ion')
+    history = CostHistory(location)
+    for test_file in files:
+        history.record(test_file, [ION_C, ION_JAVA])
+    history.save()
+    return location
+
+
+def test_missing_history_estimates_from_size(tmp_path):
+    history = CostHistory(str(tmp_path / 'missing.ion'))
+    test_file = measured('good/a.ion', size=1000)
+    expected = COST_ESTIMATE_DEFAULTS['per_file'] + COST_ESTIMATE_DEFAULTS['per_byte'] * 1000
+    assert history.estimate(test_file, [ION_C]) == pytest.approx(expected)
+    assert history.is_priority(test_file)
+    assert not history.covers(test_file, [ION_C])
+
+
+def test_record_save_and_reload(tmp_path):
+    location = history_with(tmp_path, measured('good/a.ion', c=1.0, java=2.0),
+                            measured('good/b.ion', failed=[ION_C.identifier]))
+    history = CostHistory(location)
+    assert history.covers(measured('good/a.ion'), [ION_C, ION_JAVA])
+    assert history.estimate(measured('good/a.ion'), [ION_C, ION_JAVA]) == pytest.approx(3.0)
+    assert not history.is_priority(measured('good/a.ion'))
+    # Changed since it was last tested.
+    assert history.is_priority(measured('good/a.ion', digest='changed'))
+    # Failed the last time it was tested.
+    assert history.is_priority(measured('good/b.ion'))
+
+
+def test_record_smooths_costs(tmp_path):
+    location = history_with(tmp_path, measured('good/a.ion', c=1.0))
+    history = CostHistory(location)
+    history.record(measured('good/a.ion', c=3.0), [ION_C])
+    history.save()
+    expected = HISTORY_SMOOTHING * 3.0 + (1 - HISTORY_SMOOTHING) * 1.0
+    assert CostHistory(location).estimate(measured('good/a.ion'), [ION_C]) == pytest.approx(expected)
+
+
+def test_save_preserves_entries_from_other_runs(tmp_path):
+    location = history_with(tmp_path)
+    first = CostHistory(location)
+    second = CostHistory(location)
+    first.record(measured('good/a.ion'), [ION_C, ION_JAVA])
+    second.record(measured('good/b.ion'), [ION_C, ION_JAVA])
+    first.save()
+    second.save()
+    history = CostHistory(location)
+    assert history.covers(measured('good/a.ion'), [ION_C, ION_JAVA])
+    assert history.covers(measured('good/b.ion'), [ION_C, ION_JAVA])
+
+
+def test_save_without_records_writes_nothing(tmp_path):
+    location = str(tmp_path / 'history.ion')
+    CostHistory(location).save()
+    assert not os.path.exists(location)
+
+
+def test_estimate_fits_files_without_history(tmp_path):
+    # Costs of 1 second per file plus 1 millisecond per byte.
+    location = history_with(tmp_path, *[measured('good/%d.ion' % size, size=size, c=1 + size * 1e-3)
+                                        for size in (100, 1000, 5000)])
+    history = CostHistory(location)
+    assert history.estimate(measured('good/new.ion', size=2000), [ION_C]) == pytest.approx(3.0)
+
+
+def test_schedule_orders_priority_files_first_then_by_cost(tmp_path):
+    location = history_with(tmp_path, measured('good/cheap.ion', c=1.0), measured('good/costly.ion', c=5.0),
+                            measured('good/failed.ion', c=0.5, failed=[ION_C.identifier]),
+                            measured('good/changed.ion', c=0.1))
+    history = CostHistory(location)
+    files = [measured('good/cheap.ion'), measured('good/changed.ion', digest='changed'), measured('good/costly.ion'),
+             measured('good/failed.ion')]
+    scheduled = schedule_test_files(files, history, [ION_C])
+    assert [test_file.key for test_file, _ in scheduled] == \
+        ['good/failed.ion', 'good/changed.ion', 'good/costly.ion', 'good/cheap.ion']
+    assert [estimate for _, estimate in scheduled] == pytest.approx([0.5, 0.1, 5.0, 1.0])
+
+
+def test_schedule_breaks_ties_by_key(tmp_path):
+    location = history_with(tmp_path, measured('good/b.ion'), measured('good/a.ion'))
+    scheduled = schedule_test_files([measured('good/b.ion'), measured('good/a.ion')], CostHistory(location), [ION_C])
+    assert [test_file.key for test_file, _ in scheduled] == ['good/a.ion', 'good/b.ion']
+
+
+def test_shards_partition_the_files():
+    scheduled = [(measured('good/%d.ion' % i), float(20 - i)) for i in range(20)]
+    shards = [select_shard(scheduled, index, 3) for index in range(1, 4)]
+    keys = [test_file.key for shard in shards for test_file, _ in shard]
+    assert sorted(keys) == sorted(test_file.key for test_file, _ in scheduled)
+    assert len(set(keys)) == len(keys)
+    # Each shard keeps the schedule's order.
+    for shard in shards:
+        assert [estimate for _, estimate in shard] == sorted((estimate for _, estimate in shard), reverse=True)
+
+
+def test_shards_are_balanced_by_cost():
+    scheduled = [(measured('good/%d.ion' % i), estimate) for i, estimate in enumerate([8.0, 7.0, 6.0, 5.0, 4.0])]
+    loads = [sum(estimate for _, estimate in select_shard(scheduled, index, 2)) for index in (1, 2)]
+    assert loads == [8.0 + 5.0 + 4.0, 7.0 + 6.0]
+
+
+def test_single_shard_selects_everything():
+    scheduled = [(measured('good/%d.ion' % i), 1.0) for i in range(5)]
+    assert select_shard(scheduled, 1, 1) == scheduled
+
+
+@pytest.mark.parametrize('description', ['0/2', '3/2', '1/0', '1', 'a/b', '1/2/3'])
+def test_parse_shard_rejects_invalid_descriptions(description):
+    with pytest.raises(ValueError):
+        parse_shard(description)
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
@@ -0,0 +1,55 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License").
+# You may not use this file except in compliance with the License.
+# A copy of the License is located at:
+#
+#    http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS
+# OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the
+# License.
+import os
+import subprocess
+
+from amazon.iontest.ion_test_driver import source_files, source_snapshot
+
+
+def write(root, *parts):
+    path = os.path.join(str(root), *parts)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write('x')
+    return path
+
+
+def test_walk_skips_ignored_and_excluded_directories(tmp_path):
+    source = write(tmp_path, 'src', 'a.c')
+    for directory in ('.git', 'node_modules', 'build', 'target', 'dist', 'output'):
+        write(tmp_path, directory, 'ignored')
+    assert source_files(str(tmp_path), str(tmp_path / 'output')) == [source]
+
+
+def test_git_working_tree_skips_ignored_files(tmp_path):
+    subprocess.check_call(('git', 'init', '-q', str(tmp_path)))
+    tracked = write(tmp_path, 'src', 'a.c')
+    subprocess.check_call(('git', '-C', str(tmp_path), 'add', 'src'))
+    untracked = write(tmp_path, 'src', 'b.c')
+    with open(str(tmp_path / '.gitignore'), 'w') as f:
+        f.write('cmake-out/\n')
+    write(tmp_path, 'cmake-out', 'a.o')
+    write(tmp_path, 'output', 'results.ion')
+    assert sorted(source_files(str(tmp_path), str(tmp_path / 'output'))) == \
+        sorted([tracked, untracked, str(tmp_path / '.gitignore')])
+
+
+def test_snapshot_changes_when_a_file_is_removed(tmp_path):
+    source = write(tmp_path, 'src', 'a.c')
+    write(tmp_path, 'src', 'b.c')
+    before = source_snapshot(str(tmp_path), str(tmp_path / 'output'))
+    os.remove(source)
+    after = source_snapshot(str(tmp_path), str(tmp_path / 'output'))
+    assert before != after and source not in after